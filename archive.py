@@ -0,0 +1,150 @@
+"""
+Sales archiving.
+
+archive_year() moves one closed year of sales, sale_items and sale_payments
+out of the main database into its own file,
+
+    <database folder>/<ARCHIVE_CONFIG['directory']>/<database name>_<year>.db
+
+and records it in sales_archives. The daily rollups for the year are
+brought up to date first and stay in the main database, so forecasts and
+yearly totals never need the archive. Reporting methods decorated with
+db.spans_archives attach the archives their date range overlaps, so
+reports over old years read the same as before.
+
+Rows are copied in one transaction and deleted from the main database in a
+second, after the counts are checked; if anything stops in between, running
+it again finishes the job. Archive files belong in backups alongside the
+main database.
+
+    python archive.py list [--db PATH]
+    python archive.py archive YEAR [--vacuum] [--db PATH]
+"""
+
+import logging
+import os
+import re
+import sys
+from typing import Dict
+
+from config import DATABASE_PATH
+from db import ARCHIVED_TABLES, POSDatabase, utc_now
+
+logger = logging.getLogger(__name__)
+
+
+def _create_archive_tables(conn):
+    """Create the archived tables in the archive with main's definitions, adding columns it lacks"""
+    for table in ARCHIVED_TABLES:
+        sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        sql = re.sub(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?"?\w+"?',
+                     f'CREATE TABLE IF NOT EXISTS archive.{table}', sql, flags=re.IGNORECASE)
+        conn.execute(sql)
+        present = {row[1] for row in conn.execute(f"PRAGMA archive.table_info({table})").fetchall()}
+        for _, name, col_type, *_ in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+            if name not in present:
+                conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {col_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_sales_created ON sales (created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_sale_items_sale ON sale_items (sale_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_sale_payments_sale ON sale_payments (sale_id)")
+
+
+def archive_year(db: POSDatabase, year: int, vacuum: bool = False) -> Dict:
+    """
+    Move a closed year's sales into its archive file.
+
+    Run it with nothing else writing, e.g. through DatabaseExecutor.exclusive().
+    With vacuum, the main database is rebuilt afterwards to give the space back.
+
+    Returns:
+        Dict: The year's sales_archives row
+    """
+    if year >= utc_now().year:  # created_at is UTC, so a year closes at midnight UTC
+        raise ValueError(f"{year} is not closed yet; only earlier years can be archived")
+    path = db.archive_path(year)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db.refresh_sales_rollups(f"{year}-12-31")
+
+    folder = os.path.dirname(os.path.abspath(db.db_path))
+    bounds = (f"{year}-01-01", f"{year + 1}-01-01")
+    year_sales = "SELECT id FROM main.sales WHERE created_at >= ? AND created_at < ?"
+    conn = db._connect(isolation_level=None)
+    try:
+        conn.execute("PRAGMA foreign_keys = OFF")  # Items and payments leave before their sales
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+
+        conn.execute("BEGIN")
+        _create_archive_tables(conn)
+        for table in ARCHIVED_TABLES:
+            columns = ', '.join(row[1] for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall())
+            where = "created_at >= ? AND created_at < ?" if table == 'sales' else f"sale_id IN ({year_sales})"
+            conn.execute(f"INSERT OR IGNORE INTO archive.{table} ({columns}) "
+                         f"SELECT {columns} FROM main.{table} WHERE {where}", bounds)
+        conn.execute("COMMIT")
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ARCHIVED_TABLES:
+                ids = "id" if table == 'sales' else "sale_id"
+                hot = conn.execute(f"SELECT COUNT(*) FROM main.{table} WHERE {ids} IN ({year_sales})", bounds).fetchone()[0]
+                copied = conn.execute(
+                    f"SELECT COUNT(*) FROM archive.{table} WHERE id IN "
+                    f"(SELECT id FROM main.{table} WHERE {ids} IN ({year_sales}))", bounds
+                ).fetchone()[0]
+                if copied != hot:
+                    raise RuntimeError(f"Archive of {year} is missing {hot - copied} {table} rows; nothing was deleted")
+            conn.execute(f"DELETE FROM main.sale_items WHERE sale_id IN ({year_sales})", bounds)
+            conn.execute(f"DELETE FROM main.sale_payments WHERE sale_id IN ({year_sales})", bounds)
+            conn.execute("DELETE FROM main.sales WHERE created_at >= ? AND created_at < ?", bounds)
+            sales, first_id, last_id = conn.execute(
+                "SELECT COUNT(*), MIN(id), MAX(id) FROM archive.sales").fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO main.sales_archives (year, file, sales, first_sale_id, last_sale_id, archived_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (year, os.path.relpath(path, folder), sales, first_id or 0, last_id or 0, utc_now())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("DETACH DATABASE archive")
+        if vacuum:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    logger.info(f"Archived {sales} sales from {year} to {path}")
+    return next(archive for archive in db.get_sales_archives() if archive['year'] == year)
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    db_path = DATABASE_PATH
+    if '--db' in argv:
+        index = argv.index('--db')
+        db_path = argv[index + 1]
+        del argv[index:index + 2]
+    vacuum = '--vacuum' in argv
+    argv = [arg for arg in argv if arg != '--vacuum']
+
+    if argv == ['list']:
+        db = POSDatabase(db_path)
+        db.init_database()
+        for row in db.get_sales_years():
+            print(f"{row['year']}  {row['sales']:>8} sales  {row['total']:>14.2f}  main database")
+        for archive in db.get_sales_archives():
+            print(f"{archive['year']}  {archive['sales']:>8} sales  {'':>14}  {archive['file']}")
+        return 0
+    if len(argv) == 2 and argv[0] == 'archive' and argv[1].isdigit():
+        db = POSDatabase(db_path)
+        db.init_database()
+        archive = archive_year(db, int(argv[1]), vacuum=vacuum)
+        print(f"Archived {archive['sales']} sales from {archive['year']} to {archive['file']}")
+        return 0
+    print("Usage: python archive.py list [--db PATH]")
+    print("       python archive.py archive YEAR [--vacuum] [--db PATH]")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
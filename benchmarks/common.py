@@ -0,0 +1,208 @@
+"""
+Shared helpers for the benchmark scripts: generated datasets, timing,
+percentile summaries and baseline comparison.
+
+Results are JSON files of the form
+    {"suite": ..., "created_at": ..., "python": ..., "sqlite": ..., "platform": ...,
+     "results": {"<scale>/<case>": {"samples": n, "p50_ms": ..., "p95_ms": ..., "p99_ms": ..., "max_ms": ...}}}
+and a baseline is simply a saved results file.
+"""
+
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from config import LOGS_DIR, QUERY_STATS_CONFIG, TEMP_DIR  # noqa: E402
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(ROOT_DIR, TEMP_DIR, 'benchmarks')
+RESULTS_DIR = os.path.join(ROOT_DIR, LOGS_DIR, 'benchmarks')
+
+# Datasets end on a fixed date so every machine benchmarks identical data
+DATASET_SEED = 42
+DATASET_END = date(2025, 6, 30)
+
+DEFAULT_THRESHOLD = 1.2  # Flag a case when its p95 is 20% slower than the baseline
+MIN_REGRESSION_MS = 1.0  # Ignore differences smaller than this; they are timer noise
+
+
+def dataset_path(scale: str) -> str:
+    """Return the generated database for a scale, building it on first use"""
+    from sample_data import generate_dataset
+
+    path = os.path.join(DATA_DIR, f"{scale}_{DATASET_SEED}_{DATASET_END:%Y%m%d}.db")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"Generating {scale} dataset (one-off)...", flush=True)
+        tmp_path = path + '.part'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        counts = generate_dataset(tmp_path, scale, DATASET_SEED, DATASET_END)
+        os.replace(tmp_path, path)
+        print(f"  {counts['sale_items']:,} sale lines in {counts['elapsed']:.1f}s", flush=True)
+    return path
+
+
+def working_copy(scale: str, directory: str) -> str:
+    """Copy a dataset so write benchmarks never change the cached original"""
+    path = os.path.join(directory, f"{scale}.db")
+    shutil.copyfile(dataset_path(scale), path)
+    return path
+
+
+def open_dataset(scale: str, directory: str, on_disk: bool = False):
+    """
+    Open a private copy of a dataset: cloned into memory by default, so runs
+    measure the code rather than the disk, or as a file in directory with on_disk.
+
+    init_database() runs on it as at app startup, so a dataset cached by an
+    older version gains the tables and triggers added since.
+    """
+    from db import MEMORY_DATABASE, POSDatabase
+
+    if on_disk:
+        db = POSDatabase(working_copy(scale, directory))
+    else:
+        db = POSDatabase(MEMORY_DATABASE, load_from=dataset_path(scale))
+    db.init_database()
+    return db
+
+
+def quiet_query_stats(directory: str):
+    """Keep query timing on, as shipped, but send the slow log to the run directory and skip EXPLAIN"""
+    slow_log = logging.getLogger('pos.slow_queries')
+    for handler in list(slow_log.handlers):
+        slow_log.removeHandler(handler)
+        handler.close()
+    handler = logging.FileHandler(os.path.join(directory, 'slow_queries.jsonl'), encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_log.addHandler(handler)
+    slow_log.setLevel(logging.DEBUG)
+    slow_log.propagate = False
+    QUERY_STATS_CONFIG['explain_slow_queries'] = False
+
+
+def percentile(sorted_samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, min(len(sorted_samples), round(fraction * len(sorted_samples) + 0.5)))
+    return sorted_samples[rank - 1]
+
+
+def summarize(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        'samples': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50), 3),
+        'p95_ms': round(percentile(ordered, 0.95), 3),
+        'p99_ms': round(percentile(ordered, 0.99), 3),
+        'max_ms': round(ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+def measure(func: Callable[[int], object], repeat: int, max_seconds: float, min_samples: int = 3,
+            warmup: int = 1) -> List[float]:
+    """
+    Time func(i) repeatedly and return the samples in ms.
+
+    Stops after `repeat` runs, or once `max_seconds` is spent and at least
+    `min_samples` runs are in, so slow cases on large datasets stay bounded.
+    """
+    for i in range(warmup):
+        func(i)
+    samples = []
+    started = time.perf_counter()
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(warmup + i)
+        samples.append((time.perf_counter() - start) * 1000)
+        if len(samples) >= min_samples and time.perf_counter() - started > max_seconds:
+            break
+    return samples
+
+
+def new_results(suite: str) -> Dict:
+    return {
+        'suite': suite,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'results': {},
+    }
+
+
+def save_results(results: Dict, path: Optional[str] = None) -> str:
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{results['suite']}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def baseline_path(suite: str) -> str:
+    return os.path.join(BENCHMARK_DIR, f"baseline_{suite}.json")
+
+
+def compare(results: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD, metric: str = 'p95_ms') -> List[Dict]:
+    """Return one row per case present in both runs, with regressions flagged"""
+    rows = []
+    for case, current in results['results'].items():
+        previous = baseline['results'].get(case)
+        if not previous:
+            continue
+        ratio = current[metric] / previous[metric] if previous[metric] else float('inf')
+        rows.append({
+            'case': case,
+            'baseline': previous[metric],
+            'current': current[metric],
+            'ratio': ratio,
+            'regressed': ratio > threshold and current[metric] - previous[metric] >= MIN_REGRESSION_MS,
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict], metric: str = 'p95_ms') -> int:
+    """Print a comparison table and return the number of regressions"""
+    if not rows:
+        print("No cases in common with the baseline.")
+        return 0
+    width = max(len(row['case']) for row in rows)
+    print(f"\n{'case':<{width}}  {'baseline ' + metric:>16}  {'current':>10}  {'ratio':>6}")
+    for row in rows:
+        flag = "  REGRESSION" if row['regressed'] else ""
+        print(f"{row['case']:<{width}}  {row['baseline']:16.2f}  {row['current']:10.2f}  {row['ratio']:6.2f}{flag}")
+    regressions = sum(row['regressed'] for row in rows)
+    print(f"\n{regressions} regression(s) in {len(rows)} cases")
+    return regressions
+
+
+def finish(results: Dict, output: Optional[str], save_baseline: bool, baseline: Optional[str],
+           threshold: float) -> int:
+    """Save results, then either store them as the baseline or compare against it; returns an exit code"""
+    path = save_results(results, output)
+    print(f"\nResults written to {path}")
+    suite_baseline = baseline or baseline_path(results['suite'])
+    if save_baseline:
+        save_results(results, suite_baseline)
+        print(f"Baseline saved to {suite_baseline}")
+        return 0
+    if not os.path.exists(suite_baseline):
+        print(f"No baseline at {suite_baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(suite_baseline, encoding='utf-8') as f:
+        rows = compare(results, json.load(f), threshold)
+    return 1 if print_comparison(rows) else 0
@@ -0,0 +1,163 @@
+"""
+Headless benchmarks for the POSDatabase hot paths.
+
+Covers barcode lookup, product search, sale commits of 1, 10 and 50 lines,
+every reporting method over 1, 30 and 365 day ranges, low-stock listing and
+backup. Each scale runs against a copy of a generated dataset (see
+sample_data.py; datasets are cached under temp/benchmarks), loaded into
+memory unless --on-disk is given. The *_archived cases run the reports
+again on a file copy with its closed years moved to archive files (every
+year before the dataset's last; a single-year dataset has that year
+archived), so ranges that attach archives are timed too. Latency
+percentiles are written to JSON and compared with the stored baseline.
+
+    python benchmarks/db_bench.py                      # small and medium, compare with baseline
+    python benchmarks/db_bench.py --scales large --cases _365d commit_sale
+    python benchmarks/db_bench.py --cases _archived
+    python benchmarks/db_bench.py --save-baseline      # record the reference numbers
+
+Exits with status 1 when any case's p95 regresses past the threshold.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (DATA_DIR, DATASET_END, DEFAULT_THRESHOLD, finish, measure, new_results,  # noqa: E402
+                    open_dataset, quiet_query_stats, summarize, working_copy)
+from db import POSDatabase  # noqa: E402
+
+SCALES = ('small', 'medium', 'large')
+RANGES = {'1d': 1, '30d': 30, '365d': 365}
+SALE_SIZES = (1, 10, 50)
+SEARCH_TERMS = ('Rice', 'Premium Milk', 'Golden', '60000000', 'zzz-no-match')
+
+REPORT_METHODS = (
+    'get_sales_summary', 'get_total_sales', 'get_number_of_sales', 'get_items_sold', 'get_total_tax',
+    'get_profit', 'get_sales_by_payment_method', 'get_top_products', 'get_detailed_transactions',
+    'get_shift_summary', 'get_sold_items', 'get_detailed_sales', 'get_report_snapshot',
+    'get_stock_movement_summary', 'get_goods_receipts',
+)
+# Reports over the archived tables (see db.spans_archives)
+ARCHIVED_REPORT_METHODS = tuple(m for m in REPORT_METHODS
+                                if m not in ('get_stock_movement_summary', 'get_goods_receipts'))
+
+
+def build_cases(db: POSDatabase, run_dir: str, rng: random.Random):
+    """Return (name, func) pairs; each func takes the iteration number"""
+    variants = [v for v in db.get_products_with_variants() if v['variant_id']]
+    barcodes = [v['variant_barcode'] for v in variants if v['variant_barcode']]
+    cases = [
+        ('find_by_barcode', lambda i: db.find_by_barcode(barcodes[rng.randrange(len(barcodes))])),
+        ('find_by_barcode_miss', lambda i: db.find_by_barcode('0000000000000')),
+    ]
+    for term in SEARCH_TERMS:
+        cases.append((f"search_products[{term}]", lambda i, term=term: db.search_products(term)))
+
+    cases += report_cases(db, REPORT_METHODS)
+
+    cases.append(('get_low_stock_items', lambda i: db.get_low_stock_items()))
+    cases.append(('get_products_with_variants', lambda i: db.get_products_with_variants()))
+
+    cashier = next((u for u in db.get_all_users() if u['role'] == 'cashier'), None)
+    shift_id = db.start_shift(cashier['id'] if cashier else 1, 5000)
+    for size in SALE_SIZES:
+        def commit(i, size=size):
+            items = []
+            for variant in rng.sample(variants, size):
+                price = float(variant['price'])
+                items.append({'product_id': variant['product_id'], 'variant_id': variant['variant_id'], 'qty': 1,
+                              'price': price, 'subtotal': price, 'name': variant['variant_name']})
+            total = round(sum(item['subtotal'] for item in items), 2)
+            db.commit_sale(shift_id, total, 0, 0, [{'method': 'Cash', 'amount': total}], items)
+        cases.append((f"commit_sale_{size}", commit))
+
+    backup_path = os.path.join(run_dir, 'backup.db')
+
+    def backup(i):
+        db.backup_database(backup_path)
+        os.remove(backup_path)
+    cases.append(('backup_database', backup))
+    return cases
+
+
+def report_cases(db: POSDatabase, methods, suffix: str = ''):
+    cases = []
+    for label, days in RANGES.items():
+        start = (DATASET_END - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        end = DATASET_END.strftime('%Y-%m-%d')
+        for method in methods:
+            cases.append((f"{method}_{label}{suffix}", lambda i, f=getattr(db, method), s=start, e=end: f(s, e)))
+    return cases
+
+
+def build_archived_cases(scale: str, run_dir: str):
+    """Report cases against a file copy of the dataset with its closed years archived"""
+    from archive import archive_year
+
+    directory = os.path.join(run_dir, 'archived')
+    os.makedirs(directory)
+    db = POSDatabase(working_copy(scale, directory))
+    db.init_database()
+    years = [row['year'] for row in db.get_sales_years()]
+    for year in [year for year in years if year < DATASET_END.year] or years[:1]:
+        archive_year(db, year)
+    return report_cases(db, ARCHIVED_REPORT_METHODS, '_archived')
+
+
+def run_scale(scale: str, results: dict, args):
+    run_dir = tempfile.mkdtemp(prefix='db_bench_', dir=DATA_DIR)
+    try:
+        quiet_query_stats(run_dir)
+        db = open_dataset(scale, run_dir, args.on_disk)
+        rng = random.Random(1)
+        cases = build_cases(db, run_dir, rng)
+        if not args.cases or any('_archived' in pattern for pattern in args.cases):
+            cases += build_archived_cases(scale, run_dir)
+        for name, func in cases:
+            if args.cases and not any(pattern in name for pattern in args.cases):
+                continue
+            stats = summarize(measure(func, args.repeat, args.max_seconds))
+            results['results'][f"{scale}/{name}"] = stats
+            print(f"{scale}/{name:<40} p50 {stats['p50_ms']:9.2f}  p95 {stats['p95_ms']:9.2f}  "
+                  f"p99 {stats['p99_ms']:9.2f} ms  (n={stats['samples']})", flush=True)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark POSDatabase operations against generated datasets")
+    parser.add_argument('--scales', default='small,medium',
+                        help=f"comma-separated dataset scales: {', '.join(SCALES)} (default: small,medium)")
+    parser.add_argument('--cases', nargs='*', help="only run cases whose name contains one of these strings")
+    parser.add_argument('--repeat', type=int, default=50, help="maximum runs per case (default: 50)")
+    parser.add_argument('--max-seconds', type=float, default=5.0,
+                        help="stop a case after this long once it has 3 runs (default: 5)")
+    parser.add_argument('--on-disk', action='store_true', help="run against a file copy instead of an in-memory one")
+    parser.add_argument('--output', help="results file (default: logs/benchmarks/db_<timestamp>.json)")
+    parser.add_argument('--baseline', help="baseline file (default: benchmarks/baseline_db.json)")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"p95 ratio that counts as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    results = new_results('db')
+    for scale in scales:
+        run_scale(scale, results, args)
+    return finish(results, args.output, args.save_baseline, args.baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
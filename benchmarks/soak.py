@@ -0,0 +1,247 @@
+"""
+Long-shift memory soak test.
+
+Runs a scripted cashier through many sales on the offscreen Qt platform:
+searches, barcode scans, quantity changes, removals and cash payments, with
+periodic trips to the Products, Reports and Settings tabs. Python allocations
+are tracked with tracemalloc and live QObjects are counted per class. After a
+warm-up period the test fails if either grows past its bound, which is how
+widgets that are dropped without being deleted show up.
+
+    python benchmarks/soak.py                     # 300 sales on the small dataset
+    python benchmarks/soak.py --sales 5000 --report logs/benchmarks/soak.json
+
+Exits with status 1 when a bound is exceeded.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import DATA_DIR, DATASET_END, open_dataset, quiet_query_stats  # noqa: E402
+from ui_bench import ModalResponder  # noqa: E402
+
+from PySide6.QtCore import QDate, QEvent, QObject  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from db import POSDatabase  # noqa: E402
+
+SEARCH_TERMS = ('Rice', 'Milk', 'Premium', 'Golden Tea', 'Soap', 'Fresh', 'Oil', 'Juice')
+DEFAULT_MAX_PYTHON_GROWTH_KB = 4096
+DEFAULT_MAX_OBJECT_GROWTH = 50  # Per class, across the whole run after warm-up
+IDLE_ROUND_S = 0.002  # An event-loop pass this quick had nothing left to do
+
+
+def settle(app: QApplication, executor=None, idle_rounds: int = 3):
+    """
+    Run pending events, including deferred deletes and batched grid fills, until the loop goes idle
+    and the window's database executor has no reads, writes or callbacks outstanding.
+    """
+    idle = 0
+    while idle < idle_rounds:
+        start = time.perf_counter()
+        app.processEvents()
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+        quick = time.perf_counter() - start < IDLE_ROUND_S
+        if executor is not None and executor.busy():
+            quick = False
+            time.sleep(IDLE_ROUND_S)
+        idle = idle + 1 if quick else 0
+
+
+def qobject_census(window) -> Counter:
+    """Count live widgets (parented or not) and the window's other QObjects by class"""
+    counts = Counter(type(widget).__name__ for widget in QApplication.allWidgets())
+    for obj in window.findChildren(QObject):
+        if not obj.isWidgetType():
+            counts[type(obj).__name__] += 1
+    return counts
+
+
+class SoakTest:
+    def __init__(self, app: QApplication, db: POSDatabase, seed: int = 7):
+        from main import POSMainWindow
+
+        self.app = app
+        self.db = db
+        self.rng = random.Random(seed)
+        user = db.authenticate_user('admin', 'admin123')
+        if not db.get_active_shift(user['id']):
+            db.start_shift(user['id'], 5000)
+        products = [p for p in db.get_products_with_variants() if p['variant_id'] and p['variant_barcode']]
+        self.barcodes = [p['variant_barcode'] for p in products]
+        self.responder = ModalResponder()
+        self.window = POSMainWindow(app, db, user)
+        self.window.show()
+        self.tab_index = {self.window.tabs.tabText(i): i for i in range(self.window.tabs.count())}
+        self.settle()
+
+    def settle(self):
+        settle(self.app, self.window.db_executor)
+
+    def ring_up_sale(self):
+        """One customer: a search or two, a few scans, some cart edits, then pay"""
+        window, rng = self.window, self.rng
+        for _ in range(rng.randint(0, 2)):
+            window.search_input.setText(rng.choice(SEARCH_TERMS))
+            self.settle()
+            window.search_input.clear()
+            self.settle()
+        for _ in range(rng.randint(1, 5)):
+            # A scanner types the code in one burst; search_products adds it and clears the box
+            window.search_input.setText(rng.choice(self.barcodes))
+            self.settle()
+        if window.cart_items and rng.random() < 0.3:
+            window.update_cart_qty(rng.randrange(len(window.cart_items)), rng.randint(1, 3))
+        if len(window.cart_items) > 1 and rng.random() < 0.2:
+            window.remove_from_cart(rng.randrange(len(window.cart_items)))
+        self.settle()
+        if window.cart_items:
+            window.cash_payment_btn.click()
+            self.settle()
+
+    def visit_back_office(self):
+        """Open the other tabs the way a supervisor would during a shift"""
+        window = self.window
+        for title in ('Products', 'Reports', 'Settings'):
+            if title in self.tab_index:
+                window.tabs.setCurrentIndex(self.tab_index[title])
+                self.settle()
+        if 'Reports' in self.tab_index:
+            window.custom_rb.setChecked(True)
+            end = QDate(DATASET_END.year, DATASET_END.month, DATASET_END.day)
+            window.from_date.setDate(end.addDays(-1))
+            window.to_date.setDate(end)
+            self.settle()
+        window.tabs.setCurrentIndex(self.tab_index['Sales'])
+        self.settle()
+
+    def run(self, sales: int, check_every: int, warmup: int, back_office_every: int):
+        """Yield a checkpoint dict every check_every sales; the first after warm-up is the reference"""
+        self.responder.timer.start()
+        try:
+            for sale in range(1, sales + 1):
+                self.ring_up_sale()
+                if sale % back_office_every == 0:
+                    self.visit_back_office()
+                if sale % check_every == 0 or sale == sales:
+                    self.settle()
+                    current, peak = tracemalloc.get_traced_memory()
+                    yield {
+                        'sale': sale,
+                        'python_kb': current / 1024,
+                        'python_peak_kb': peak / 1024,
+                        'objects': qobject_census(self.window),
+                        'snapshot': tracemalloc.take_snapshot() if sale >= warmup else None,
+                    }
+        finally:
+            self.responder.timer.stop()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Soak-test the register UI for memory and QObject growth")
+    parser.add_argument('--scale', default='small', help="dataset scale (default: small)")
+    parser.add_argument('--sales', type=int, default=300, help="sales to ring up (default: 300)")
+    parser.add_argument('--check-every', type=int, default=25, help="sales between checkpoints (default: 25)")
+    parser.add_argument('--warmup', type=int, help="sales before the reference checkpoint (default: 10%% of sales, and at least"
+                             " one back-office visit)")
+    parser.add_argument('--back-office-every', type=int, default=50,
+                        help="sales between visits to the other tabs (default: 50)")
+    parser.add_argument('--max-python-growth-kb', type=float, default=DEFAULT_MAX_PYTHON_GROWTH_KB,
+                        help=f"allowed tracemalloc growth after warm-up (default: {DEFAULT_MAX_PYTHON_GROWTH_KB})")
+    parser.add_argument('--max-object-growth', type=int, default=DEFAULT_MAX_OBJECT_GROWTH,
+                        help=f"allowed growth in live objects of any one class (default: {DEFAULT_MAX_OBJECT_GROWTH})")
+    parser.add_argument('--frames', type=int, default=1,
+                        help="traceback depth for tracemalloc; deeper is much slower (default: 1)")
+    parser.add_argument('--on-disk', action='store_true', help="run against a file copy instead of an in-memory one")
+    parser.add_argument('--report', help="write checkpoints and the verdict to this JSON file")
+    args = parser.parse_args(argv)
+    # The reference must come after the first back-office visit, or its tables count as growth
+    warmup = args.warmup if args.warmup is not None else max(args.check_every, args.back_office_every, args.sales // 10)
+    warmup += -warmup % args.check_every  # Line the reference up with a checkpoint
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    run_dir = tempfile.mkdtemp(prefix='soak_', dir=DATA_DIR)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    checkpoints = []
+    try:
+        quiet_query_stats(run_dir)
+        db = open_dataset(args.scale, run_dir, args.on_disk)
+        tracemalloc.start(args.frames)
+        soak = SoakTest(app, db)
+        started = time.perf_counter()
+        reference = None
+        for checkpoint in soak.run(args.sales, args.check_every, warmup, args.back_office_every):
+            if reference is None and checkpoint['sale'] >= warmup:
+                reference = checkpoint
+            if checkpoints and checkpoints[-1] is not reference:
+                checkpoints[-1]['snapshot'] = None  # Only the reference and latest snapshots are compared
+            print(f"sale {checkpoint['sale']:>6}  python {checkpoint['python_kb']:10.0f} KB  "
+                  f"qobjects {sum(checkpoint['objects'].values()):>7}  "
+                  f"{time.perf_counter() - started:7.0f}s", flush=True)
+            checkpoints.append(checkpoint)
+        final = checkpoints[-1]
+    finally:
+        tracemalloc.stop()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    if reference is None or reference is final:
+        print("Not enough checkpoints after warm-up to judge growth; run more sales.")
+        return 0
+
+    failures = []
+    python_growth = final['python_kb'] - reference['python_kb']
+    if python_growth > args.max_python_growth_kb:
+        failures.append(f"Python allocations grew {python_growth:.0f} KB (limit {args.max_python_growth_kb:.0f} KB)")
+    object_growth = {name: final['objects'][name] - reference['objects'].get(name, 0)
+                     for name in final['objects']}
+    for name, growth in sorted(object_growth.items(), key=lambda item: item[1], reverse=True):
+        if growth > args.max_object_growth:
+            failures.append(f"{name} grew by {growth} live objects (limit {args.max_object_growth})")
+
+    print(f"\nAfter warm-up (sale {reference['sale']} -> {final['sale']}): "
+          f"Python {python_growth:+.0f} KB, QObjects {sum(final['objects'].values()) - sum(reference['objects'].values()):+d}")
+    grown = [(name, growth) for name, growth in object_growth.items() if growth > 0]
+    for name, growth in sorted(grown, key=lambda item: item[1], reverse=True)[:10]:
+        print(f"  {name:<30} {growth:+d}")
+    print("Top allocation growth by line:")
+    for stat in final['snapshot'].compare_to(reference['snapshot'], 'lineno')[:10]:
+        print(f"  {stat}")
+
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({
+                'scale': args.scale,
+                'sales': args.sales,
+                'reference_sale': reference['sale'],
+                'checkpoints': [
+                    {'sale': c['sale'], 'python_kb': round(c['python_kb'], 1), 'python_peak_kb': round(c['python_peak_kb'], 1),
+                     'qobjects': sum(c['objects'].values()), 'objects': dict(c['objects'])}
+                    for c in checkpoints
+                ],
+                'failures': failures,
+            }, f, indent=2)
+        print(f"Report written to {args.report}")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nPASSED")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Headless UI responsiveness benchmarks for POSMainWindow.
+
+Drives the real window on Qt's offscreen platform against a generated
+dataset with scripted cashier actions: typing a search, scanning a barcode,
+adding to the cart, paying, and opening and refreshing each tab. Every
+action is started from the event loop, and two things are measured:
+
+    wall   time from the action starting until the UI settles, including
+           deferred work such as batched grid fills
+    block  the longest stretch the event loop went without servicing a
+           1 ms heartbeat timer, i.e. how long the register looked frozen
+
+The dataset is loaded into memory unless --on-disk is given. Results use
+the same JSON and baseline format as db_bench.py, with
+"<scale>/<action>" holding wall times and "<scale>/<action>.block" the
+longest block.
+
+    python benchmarks/ui_bench.py --save-baseline
+    python benchmarks/ui_bench.py --scales medium --repeat 3
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (DATA_DIR, DATASET_END, DEFAULT_THRESHOLD, finish, new_results,  # noqa: E402
+                    open_dataset, quiet_query_stats, summarize)
+
+from PySide6.QtCore import QDate, QEventLoop, Qt, QTimer  # noqa: E402
+from PySide6.QtTest import QTest  # noqa: E402
+from PySide6.QtWidgets import QApplication, QDialog, QPushButton  # noqa: E402
+
+from db import POSDatabase  # noqa: E402
+
+SCALES = ('small', 'medium', 'large')
+HEARTBEAT_MS = 1
+BUSY_GAP_MS = 10  # A heartbeat gap longer than this means the loop was busy
+QUIET_MS = 150  # The UI counts as settled after this long without a busy gap
+ACTION_TIMEOUT_S = 120
+
+
+class LoopMonitor:
+    """Heartbeat timer that measures how long the event loop is unresponsive"""
+
+    def __init__(self):
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(HEARTBEAT_MS)
+        self.timer.timeout.connect(self._tick)
+        self.reset()
+
+    def reset(self):
+        self.last_tick = time.perf_counter()
+        self.last_busy = self.last_tick
+        self.max_gap = 0.0
+
+    def _tick(self):
+        now = time.perf_counter()
+        gap = now - self.last_tick
+        self.max_gap = max(self.max_gap, gap)
+        if gap * 1000 > BUSY_GAP_MS:
+            self.last_busy = now
+        self.last_tick = now
+
+
+class ModalResponder:
+    """Answer modal dialogs the way a cashier would, so payment flows run unattended"""
+
+    def __init__(self):
+        self.timer = QTimer()
+        self.timer.setInterval(1)
+        self.timer.timeout.connect(self._respond)
+
+    def _respond(self):
+        dialog = QApplication.activeModalWidget()
+        if isinstance(dialog, QDialog) and dialog.isVisible():
+            # Skip printing; accept everything else with its default values
+            if type(dialog).__name__ == 'ReceiptPrintDialog':
+                dialog.reject()
+            else:
+                dialog.accept()
+
+
+class UIBenchmark:
+    def __init__(self, app: QApplication, db: POSDatabase):
+        self.app = app
+        self.db = db
+        self.monitor = LoopMonitor()
+        self.responder = ModalResponder()
+        self.window = None
+        self.samples = {}
+        self.user = db.authenticate_user('admin', 'admin123')
+        if not db.get_active_shift(self.user['id']):
+            db.start_shift(self.user['id'], 5000)
+        products = [p for p in db.get_products_with_variants() if p['variant_id'] and p['variant_barcode']]
+        self.barcodes = [p['variant_barcode'] for p in products if p['stock_quantity'] > 0]
+
+    def run_action(self, name: str, action):
+        """Start action from the event loop and wait for the UI to settle"""
+        loop = QEventLoop()
+        state = {'done': None, 'error': None, 'db_busy': 0.0}
+
+        def start():
+            try:
+                action()
+            except Exception as e:
+                state['error'] = e
+            state['done'] = time.perf_counter()
+
+        def check():
+            now = time.perf_counter()
+            # Work handed to the database executor counts until its callback has run
+            executor = getattr(self.window, 'db_executor', None)
+            if executor is not None and executor.busy():
+                state['db_busy'] = now
+            if state['done'] and now - max(state['done'], self.monitor.last_busy, state['db_busy']) > QUIET_MS / 1000:
+                loop.quit()
+            elif now - started > ACTION_TIMEOUT_S:
+                state['error'] = TimeoutError(f"{name} did not settle within {ACTION_TIMEOUT_S}s")
+                loop.quit()
+
+        settle = QTimer()
+        settle.setInterval(10)
+        settle.timeout.connect(check)
+        self.monitor.reset()
+        started = time.perf_counter()
+        self.monitor.last_busy = started
+        QTimer.singleShot(0, start)
+        self.monitor.timer.start()
+        settle.start()
+        loop.exec()
+        settle.stop()
+        self.monitor.timer.stop()
+        if state['error']:
+            raise state['error']
+
+        finished = max(state['done'], self.monitor.last_busy, state['db_busy'])
+        self.samples.setdefault(name, []).append((finished - started) * 1000)
+        self.samples.setdefault(f"{name}.block", []).append(self.monitor.max_gap * 1000)
+
+    def open_tab(self, title: str):
+        tabs = self.window.tabs
+        index = next(i for i in range(tabs.count()) if tabs.tabText(i) == title)
+        tabs.setCurrentIndex(index)
+
+    def set_report_range(self, days: int):
+        window = self.window
+        for widget in (window.custom_rb, window.from_date, window.to_date):
+            widget.blockSignals(True)
+        window.custom_rb.setChecked(True)
+        end = QDate(DATASET_END.year, DATASET_END.month, DATASET_END.day)
+        window.from_date.setDate(end.addDays(-(days - 1)))
+        window.to_date.setDate(end)
+        for widget in (window.custom_rb, window.from_date, window.to_date):
+            widget.blockSignals(False)
+        window.update_reports()
+
+    def scan(self, barcode: str):
+        QTest.keyClicks(self.window.search_input, barcode)
+        QTest.keyClick(self.window.search_input, Qt.Key_Return)
+
+    def force_reload(self, versions_attr: str, refresh):
+        """Call refresh with the view's remembered table versions cleared, so it reloads even with nothing new"""
+        setattr(self.window, versions_attr, None)
+        refresh()
+
+    def first_card_button(self) -> QPushButton:
+        return self.window.grid_layout.itemAt(0).widget().findChild(QPushButton)
+
+    def run_session(self, iteration: int):
+        """One scripted shift, from login to every tab"""
+        from main import POSMainWindow
+
+        def startup():
+            self.window = POSMainWindow(self.app, self.db, self.user)
+            self.window.show()
+        self.run_action('startup', startup)
+        window = self.window
+        self.responder.timer.start()
+        try:
+            self.run_action('type_search', lambda: QTest.keyClicks(window.search_input, "Rice"))
+            self.run_action('clear_search', window.search_input.clear)
+            for n in range(3):
+                barcode = self.barcodes[(iteration * 7 + n) % len(self.barcodes)]
+                self.run_action('scan_barcode', lambda: self.scan(barcode))
+            self.run_action('add_from_grid', lambda: self.first_card_button().click())
+            offset = iteration * 31
+            while len(window.cart_items) < min(20, len(self.barcodes)):
+                window.add_to_cart(self.db.find_by_barcode(self.barcodes[offset % len(self.barcodes)]))
+                offset += 1
+            self.run_action('add_to_20_line_cart', lambda: self.first_card_button().click())
+            self.run_action('pay_cash', window.cash_payment_btn.click)
+
+            self.run_action('open_products_tab', lambda: self.open_tab("Products"))
+            self.run_action('refresh_products_table', lambda: self.force_reload('products_table_versions', window.refresh_products_table))
+            self.run_action('open_reports_tab', lambda: self.open_tab("Reports"))
+            self.run_action('reports_1d', lambda: self.set_report_range(1))
+            self.run_action('reports_30d', lambda: self.set_report_range(30))
+            self.run_action('reports_365d', lambda: self.set_report_range(365))
+            self.run_action('open_settings_tab', lambda: self.open_tab("Settings"))
+            self.run_action('load_users', window.load_users)
+            self.run_action('switch_to_sales_tab', lambda: self.open_tab("Sales"))
+            self.run_action('switch_to_reports_tab', lambda: self.open_tab("Reports"))
+        finally:
+            self.responder.timer.stop()
+            window.close()
+            window.deleteLater()
+            self.window = None
+            QApplication.processEvents()
+
+
+def run_scale(app: QApplication, scale: str, results: dict, args):
+    run_dir = tempfile.mkdtemp(prefix='ui_bench_', dir=DATA_DIR)
+    try:
+        quiet_query_stats(run_dir)
+        bench = UIBenchmark(app, open_dataset(scale, run_dir, args.on_disk))
+        for iteration in range(args.repeat):
+            bench.run_session(iteration)
+        for name, samples in bench.samples.items():
+            if args.actions and not any(pattern in name for pattern in args.actions):
+                continue
+            stats = summarize(samples)
+            results['results'][f"{scale}/{name}"] = stats
+            print(f"{scale}/{name:<32} p50 {stats['p50_ms']:9.1f}  p95 {stats['p95_ms']:9.1f}  "
+                  f"max {stats['max_ms']:9.1f} ms  (n={stats['samples']})", flush=True)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark POS UI actions on the offscreen Qt platform")
+    parser.add_argument('--scales', default='small',
+                        help=f"comma-separated dataset scales: {', '.join(SCALES)} (default: small)")
+    parser.add_argument('--actions', nargs='*', help="only report actions whose name contains one of these strings")
+    parser.add_argument('--repeat', type=int, default=3, help="scripted sessions per scale (default: 3)")
+    parser.add_argument('--on-disk', action='store_true', help="run against a file copy instead of an in-memory one")
+    parser.add_argument('--output', help="results file (default: logs/benchmarks/ui_<timestamp>.json)")
+    parser.add_argument('--baseline', help="baseline file (default: benchmarks/baseline_ui.json)")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"p95 ratio that counts as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = new_results('ui')
+    for scale in scales:
+        run_scale(app, scale, results, args)
+    return finish(results, args.output, args.save_baseline, args.baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Bulk catalogue import from CSV.
+
+The file is streamed in chunks so memory stays flat regardless of its size.
+Brand, category, supplier, product and barcode names are resolved against
+in-memory dictionaries loaded once up front, new rows get ids allocated in
+Python, and each chunk is written with executemany in a single transaction.
+Rows that cannot be imported are written to a rejects file with the reason.
+
+Expected columns (header names are case-insensitive):
+    product, variant, price, purchase_price, barcode, stock_quantity,
+    reorder_level, brand, category, supplier
+
+Rows are matched on barcode: a known barcode updates the variant's prices
+and reorder level, an unknown or empty one adds a new variant. A blank
+purchase_price or reorder_level keeps the variant's current value; new
+variants without a reorder_level get 5. Stock is only set for new variants;
+use a stocktake or goods receipt for existing stock.
+"""
+
+import csv
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import EXPORT_CONFIG
+from db import POSDatabase
+
+CHUNK_SIZE = 5000
+REQUIRED_COLUMNS = ('product', 'variant', 'price')
+
+
+class CatalogueImporter:
+    def __init__(self, db: POSDatabase, chunk_size: int = CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.brands: Dict[str, int] = {}
+        self.categories: Dict[str, int] = {}
+        self.suppliers: Dict[str, int] = {}
+        self.products: Dict[Tuple[str, Optional[int]], int] = {}
+        self.barcodes: Dict[str, int] = {}
+        self.next_ids: Dict[str, int] = {}
+
+    def _load_lookups(self, conn):
+        """Load name -> id dictionaries so rows never need a lookup query"""
+        self.brands = {r['name'].lower(): r['id'] for r in conn.execute("SELECT id, name FROM brands")}
+        self.categories = {r['name'].lower(): r['id'] for r in conn.execute("SELECT id, name FROM categories")}
+        self.suppliers = {}
+        for r in conn.execute("SELECT id, name FROM suppliers ORDER BY id"):
+            self.suppliers.setdefault(r['name'].lower(), r['id'])
+        self.products = {
+            (r['name'].lower(), r['brand_id']): r['id']
+            for r in conn.execute("SELECT id, name, brand_id FROM products")
+        }
+        self.barcodes = {
+            r['barcode']: r['id']
+            for r in conn.execute("SELECT id, barcode FROM variants WHERE barcode IS NOT NULL AND barcode != ''")
+        }
+
+    def _allocate_ids(self, conn):
+        """Reserve ids past the current maximum; called inside each chunk's write lock"""
+        for table in ('brands', 'categories', 'suppliers', 'products', 'variants'):
+            max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            self.next_ids[table] = max(self.next_ids.get(table, 0), max_id + 1)
+
+    def _next_id(self, table: str) -> int:
+        new_id = self.next_ids[table]
+        self.next_ids[table] = new_id + 1
+        return new_id
+
+    def _resolve_name(self, name: str, lookup: Dict[str, int], table: str, inserts: List[Tuple]) -> Optional[int]:
+        """Return the id for a reference name, queueing an insert when it is new"""
+        name = name.strip()
+        if not name:
+            return None
+        key = name.lower()
+        if key not in lookup:
+            lookup[key] = self._next_id(table)
+            inserts.append((lookup[key], name))
+        return lookup[key]
+
+    @staticmethod
+    def _parse_row(row: Dict[str, str]) -> Dict:
+        """Validate and convert one CSV row, raising ValueError with the reject reason"""
+        for column in REQUIRED_COLUMNS:
+            if not row.get(column):
+                raise ValueError(f"Missing {column}")
+        try:
+            price = Decimal(row['price'])
+            purchase_price = Decimal(row['purchase_price']) if row.get('purchase_price') else None
+            stock_quantity = int(row['stock_quantity']) if row.get('stock_quantity') else 0
+            reorder_level = int(row['reorder_level']) if row.get('reorder_level') else None
+            if not price.is_finite() or (purchase_price is not None and not purchase_price.is_finite()):
+                raise ValueError("Not a finite number")  # NaN cannot be compared, Infinity is no price
+        except (InvalidOperation, ValueError):
+            raise ValueError("Invalid number")
+        if price < 0 or (purchase_price is not None and purchase_price < 0):
+            raise ValueError("Negative price")
+        return {
+            'product': row['product'],
+            'variant': row['variant'],
+            'price': str(price),
+            'purchase_price': str(purchase_price) if purchase_price is not None else None,
+            'barcode': row.get('barcode') or None,
+            'stock_quantity': stock_quantity,
+            'reorder_level': reorder_level,
+        }
+
+    def _import_chunk(self, conn, rows: List[Tuple[int, Dict[str, str]]], reject: Callable) -> Tuple[int, int]:
+        """Resolve and write one chunk in a single transaction"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._allocate_ids(conn)
+            brand_inserts, category_inserts, supplier_inserts = [], [], []
+            product_inserts, variant_inserts, variant_updates, movements = [], [], [], []
+
+            for line_no, row in rows:
+                try:
+                    item = self._parse_row(row)
+                except ValueError as e:
+                    reject(line_no, row, str(e))
+                    continue
+
+                variant_id = self.barcodes.get(item['barcode']) if item['barcode'] else None
+                if variant_id is not None:
+                    variant_updates.append((item['price'], item['purchase_price'], item['reorder_level'], variant_id))
+                    continue
+
+                brand_id = self._resolve_name(row.get('brand') or '', self.brands, 'brands', brand_inserts)
+                category_id = self._resolve_name(row.get('category') or '', self.categories, 'categories', category_inserts)
+                supplier_id = self._resolve_name(row.get('supplier') or '', self.suppliers, 'suppliers', supplier_inserts)
+
+                product_key = (item['product'].lower(), brand_id)
+                product_id = self.products.get(product_key)
+                if product_id is None:
+                    product_id = self._next_id('products')
+                    self.products[product_key] = product_id
+                    product_inserts.append((product_id, item['product'], category_id, brand_id, supplier_id))
+
+                variant_id = self._next_id('variants')
+                if item['barcode']:
+                    self.barcodes[item['barcode']] = variant_id
+                variant_inserts.append((
+                    variant_id, product_id, item['variant'], item['price'], item['purchase_price'],
+                    item['barcode'], item['stock_quantity'],
+                    item['reorder_level'] if item['reorder_level'] is not None else 5
+                ))
+                if item['stock_quantity']:
+                    movements.append((variant_id, 'receive', item['stock_quantity'], None, 'Catalogue import'))
+
+            conn.executemany("INSERT INTO brands (id, name) VALUES (?, ?)", brand_inserts)
+            conn.executemany("INSERT INTO categories (id, name) VALUES (?, ?)", category_inserts)
+            conn.executemany("INSERT INTO suppliers (id, name) VALUES (?, ?)", supplier_inserts)
+            conn.executemany(
+                "INSERT INTO products (id, name, category_id, brand_id, supplier_id) VALUES (?, ?, ?, ?, ?)",
+                product_inserts
+            )
+            conn.executemany(
+                """
+                INSERT INTO variants (id, product_id, name, price, purchase_price, barcode, stock_quantity, reorder_level)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                variant_inserts
+            )
+            conn.executemany(
+                "UPDATE variants SET price = ?, purchase_price = COALESCE(?, purchase_price), "
+                "reorder_level = COALESCE(?, reorder_level) WHERE id = ?",
+                variant_updates
+            )
+            self.db._record_stock_movements(conn, movements)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(variant_inserts), len(variant_updates)
+
+    def import_file(self, path: str, rejects_path: str = None,
+                    progress: Callable[[int], bool] = None) -> Dict:
+        """
+        Import a catalogue CSV.
+
+        Args:
+            path: CSV file to import
+            rejects_path: Where to write rejected rows (default: <path>.rejects.csv)
+            progress: Called with the rows processed after each chunk; returning
+                False stops the import after the chunk already written
+
+        Returns:
+            Dict: inserted, updated, rejected and elapsed counts plus rejects_path
+        """
+        start = time.perf_counter()
+        rejects_path = rejects_path or os.path.splitext(path)[0] + '.rejects.csv'
+        summary = {'inserted': 0, 'updated': 0, 'rejected': 0, 'rows': 0, 'rejects_path': None}
+
+        encoding = EXPORT_CONFIG['csv_encoding']
+        with open(path, newline='', encoding=encoding) as f, self.db.get_connection() as conn:
+            # Manage transactions explicitly, one per chunk
+            conn.isolation_level = None
+            reader = csv.DictReader(f, delimiter=EXPORT_CONFIG['csv_delimiter'])
+            reader.fieldnames = [name.strip().lower() for name in (reader.fieldnames or [])]
+            missing = [c for c in REQUIRED_COLUMNS if c not in reader.fieldnames]
+            if missing:
+                raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+            rejects_file = None
+            rejects_writer = None
+
+            def reject(line_no, row, reason):
+                nonlocal rejects_file, rejects_writer
+                if rejects_writer is None:
+                    rejects_file = open(rejects_path, 'w', newline='', encoding=encoding)
+                    rejects_writer = csv.writer(rejects_file)
+                    rejects_writer.writerow(['line', 'reason'] + reader.fieldnames)
+                rejects_writer.writerow([line_no, reason] + [row.get(name, '') for name in reader.fieldnames])
+                summary['rejected'] += 1
+
+            try:
+                self._load_lookups(conn)
+                numbered = enumerate(reader, start=2)
+                while True:
+                    chunk = list(islice(numbered, self.chunk_size))
+                    if not chunk:
+                        break
+                    inserted, updated = self._import_chunk(conn, chunk, reject)
+                    summary['inserted'] += inserted
+                    summary['updated'] += updated
+                    summary['rows'] += len(chunk)
+                    if progress and progress(summary['rows']) is False:
+                        break
+            finally:
+                if rejects_file:
+                    rejects_file.close()
+                    summary['rejects_path'] = rejects_path
+
+        summary['elapsed'] = time.perf_counter() - start
+        return summary
+
+
+def import_catalogue(db: POSDatabase, path: str, rejects_path: str = None,
+                     progress: Callable[[int], bool] = None) -> Dict:
+    """Import a catalogue CSV into the database; see CatalogueImporter.import_file"""
+    return CatalogueImporter(db).import_file(path, rejects_path, progress)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python catalogue_import.py <catalogue.csv> [database]")
+        sys.exit(1)
+    db = POSDatabase(sys.argv[2]) if len(sys.argv) > 2 else POSDatabase()
+    result = import_catalogue(db, sys.argv[1])
+    print(f"Imported {result['inserted']} new and {result['updated']} updated variants, "
+          f"{result['rejected']} rejected in {result['elapsed']:.2f}s.")
+    if result['rejects_path']:
+        print(f"Rejected rows written to {result['rejects_path']}")
@@ -0,0 +1,72 @@
+"""
+Database change detection.
+
+Triggers count every write to the tables in db.VERSIONED_TABLES in the
+table_versions table, in the same transaction as the write, so writes from
+another copy of the app on the same file are counted too. ChangeDetector
+keeps one idle connection on the GUI thread and asks it for
+PRAGMA data_version first: it only changes when some other connection has
+committed, so while nothing is written a check costs one pragma and no
+table read.
+
+A view remembers the versions it last rendered and skips a reload while
+they are unchanged:
+
+    versions = self.changes.versions(CATALOGUE_TABLES)
+    if versions == self.grid_versions:
+        return
+    ... query and render ...
+    self.grid_versions = versions
+"""
+
+import logging
+import sqlite3
+from typing import Dict, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# What each view reads; settings hold the currency symbol and tax rate they format with
+CATALOGUE_TABLES = ('settings', 'categories', 'brands', 'suppliers', 'products', 'variants', 'variant_forecasts')
+REPORT_TABLES = ('settings', 'users', 'shifts', 'sales', 'sale_items', 'sale_payments', 'sales_archives')
+
+
+class ChangeDetector:
+    """Per-table write counters for one POSDatabase, read through a connection of its own"""
+
+    def __init__(self, db):
+        self.db = db
+        self._conn = None
+        self._data_version = None
+        self._versions: Dict[str, int] = {}
+        self._failed = False
+
+    def versions(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        """Current write counters of tables, in order; compare with the ones a view last rendered"""
+        try:
+            self._refresh()
+        except sqlite3.Error as e:
+            if not self._failed:
+                logger.warning(f"Change detection unavailable, views always reload: {e}")
+                self._failed = True
+            self.close()
+            return (object(),)  # Equal to no other snapshot, so the view reloads
+        self._failed = False
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._data_version = None
+
+    def _refresh(self):
+        if self._conn is None:
+            self._conn = self.db._connect()
+            if self.db.in_memory:
+                # Shared-cache table locks fail at once instead of waiting, as for the executor's readers
+                self._conn.execute("PRAGMA read_uncommitted = ON")
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return  # No other connection has committed since the last read
+        self._versions = dict(self._conn.execute("SELECT name, version FROM table_versions").fetchall())
+        self._data_version = data_version
@@ -0,0 +1,158 @@
+"""
+Lightweight report charts painted with QPainter.
+
+Each chart is created once and updated with set_data(), which swaps the
+series and schedules a repaint. Nothing is reallocated on refresh, so the
+reports tab costs the same however many times the date range changes.
+"""
+
+import math
+from typing import List, Sequence
+
+from PySide6.QtCore import QPointF, QRectF, Qt, Signal
+from PySide6.QtGui import QColor, QFont, QPainter, QPen
+from PySide6.QtWidgets import QSizePolicy, QToolTip, QWidget
+
+# Same palette as the matplotlib charts these replace
+PALETTE = [QColor(c) for c in (
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'
+)]
+
+
+class ChartWidget(QWidget):
+    """Base chart: title, empty-state message and data holders"""
+
+    def __init__(self, title: str, empty_text: str, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.empty_text = empty_text
+        self.labels: List[str] = []
+        self.values: List[float] = []
+        self.setMinimumSize(320, 260)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def set_data(self, labels: Sequence[str], values: Sequence[float]):
+        self.labels = list(labels)
+        self.values = [float(v or 0) for v in values]
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), self.palette().base())
+
+        title_font = QFont(self.font())
+        title_font.setBold(True)
+        painter.setFont(title_font)
+        title_height = painter.fontMetrics().height() + 8
+        painter.drawText(QRectF(0, 4, self.width(), title_height), Qt.AlignHCenter | Qt.AlignTop, self.title)
+        painter.setFont(self.font())
+
+        area = QRectF(10, title_height + 4, self.width() - 20, self.height() - title_height - 14)
+        if not self.values or sum(self.values) <= 0:
+            painter.drawText(area, Qt.AlignCenter, self.empty_text)
+        else:
+            self.paint_chart(painter, area)
+        painter.end()
+
+    def paint_chart(self, painter: QPainter, area: QRectF):
+        raise NotImplementedError
+
+
+class PieChart(ChartWidget):
+    def paint_chart(self, painter: QPainter, area: QRectF):
+        metrics = painter.fontMetrics()
+        legend_width = min(max(metrics.horizontalAdvance(label) for label in self.labels) + 30, area.width() / 2)
+        size = min(area.width() - legend_width - 10, area.height())
+        pie = QRectF(area.left(), area.top() + (area.height() - size) / 2, size, size)
+
+        total = sum(self.values)
+        start = 90 * 16  # Start at 12 o'clock like the old chart
+        painter.setPen(QPen(self.palette().base().color(), 1))
+        for i, value in enumerate(self.values):
+            span = -round(value / total * 360 * 16)
+            painter.setBrush(PALETTE[i % len(PALETTE)])
+            painter.drawPie(pie, start, span)
+
+            # Percentage label in the middle of the slice
+            mid = math.radians((start + span / 2) / 16)
+            label_pos = QPointF(pie.center().x() + math.cos(mid) * size * 0.32,
+                                pie.center().y() - math.sin(mid) * size * 0.32)
+            if abs(span) > 12 * 16:
+                painter.setPen(Qt.white)
+                painter.drawText(QRectF(label_pos.x() - 30, label_pos.y() - 10, 60, 20),
+                                 Qt.AlignCenter, f"{value / total * 100:.1f}%")
+                painter.setPen(QPen(self.palette().base().color(), 1))
+            start += span
+
+        painter.setPen(self.palette().text().color())
+        y = area.top() + 4
+        for i, label in enumerate(self.labels):
+            x = pie.right() + 12
+            painter.fillRect(QRectF(x, y + 3, 12, 12), PALETTE[i % len(PALETTE)])
+            painter.drawText(QRectF(x + 18, y, legend_width - 18, 18), Qt.AlignLeft | Qt.AlignVCenter,
+                             metrics.elidedText(label, Qt.ElideRight, int(legend_width - 18)))
+            y += 20
+
+
+class BarChart(ChartWidget):
+    """Vertical bar chart; emits barClicked with the bar index"""
+    barClicked = Signal(int)
+
+    def __init__(self, title: str, empty_text: str, y_label: str = '', parent=None):
+        super().__init__(title, empty_text, parent)
+        self.y_label = y_label
+        self._bar_rects: List[QRectF] = []
+        self.setMouseTracking(True)
+
+    def set_data(self, labels: Sequence[str], values: Sequence[float]):
+        self._bar_rects = []
+        super().set_data(labels, values)
+
+    def paint_chart(self, painter: QPainter, area: QRectF):
+        metrics = painter.fontMetrics()
+        axis_width = metrics.horizontalAdvance(f"{max(self.values):,.0f}") + 10
+        label_height = metrics.height() * 2 + 4
+        plot = QRectF(area.left() + axis_width, area.top(), area.width() - axis_width, area.height() - label_height)
+
+        max_value = max(self.values)
+        painter.setPen(self.palette().mid().color())
+        painter.drawLine(plot.bottomLeft(), plot.bottomRight())
+        painter.drawLine(plot.bottomLeft(), plot.topLeft())
+        painter.setPen(self.palette().text().color())
+        painter.drawText(QRectF(area.left(), plot.top() - 8, axis_width - 4, 16),
+                         Qt.AlignRight | Qt.AlignVCenter, f"{max_value:,.0f}")
+        painter.drawText(QRectF(area.left(), plot.bottom() - 8, axis_width - 4, 16),
+                         Qt.AlignRight | Qt.AlignVCenter, "0")
+
+        slot = plot.width() / len(self.values)
+        self._bar_rects = []
+        for i, (label, value) in enumerate(zip(self.labels, self.values)):
+            height = value / max_value * (plot.height() - 4)
+            rect = QRectF(plot.left() + slot * i + slot * 0.15, plot.bottom() - height, slot * 0.7, height)
+            self._bar_rects.append(rect)
+            painter.fillRect(rect, PALETTE[0])
+            painter.drawText(QRectF(plot.left() + slot * i, plot.bottom() + 2, slot, label_height - 2),
+                             Qt.AlignHCenter | Qt.AlignTop | Qt.TextWordWrap,
+                             metrics.elidedText(label, Qt.ElideRight, int(slot * 2)))
+
+    def _bar_at(self, pos) -> int:
+        for i, rect in enumerate(self._bar_rects):
+            if rect.contains(pos):
+                return i
+        return -1
+
+    def mouseMoveEvent(self, event):
+        index = self._bar_at(event.position())
+        self.setCursor(Qt.PointingHandCursor if index >= 0 else Qt.ArrowCursor)
+        if index >= 0:
+            QToolTip.showText(event.globalPosition().toPoint(),
+                              f"{self.labels[index]}\n{self.y_label}: {self.values[index]:,.0f}", self)
+        super().mouseMoveEvent(event)
+
+    def mousePressEvent(self, event):
+        index = self._bar_at(event.position())
+        if event.button() == Qt.LeftButton and index >= 0:
+            self.barClicked.emit(index)
+        super().mousePressEvent(event)
@@ -3,9 +3,14 @@ Configuration settings for POS System
 Modify these settings to customize the application behavior
 """
 
+import logging
 import os
 from pathlib import Path
 
+import startup_trace
+
+logger = logging.getLogger(__name__)
+
 # Application Settings
 APP_NAME = "POS System"
 APP_VERSION = "1.0.0"
@@ -19,6 +24,7 @@ DATABASE_BACKUP_DIR = "backups"  # Directory for database backups
 WINDOW_TITLE = f"{APP_NAME} v{APP_VERSION}"
 DEFAULT_WINDOW_SIZE = (1400, 800)
 MIN_WINDOW_SIZE = (1200, 700)
+STARTUP_BUDGET_MS = 800  # Warn when login-to-ready takes longer than this
 
 # Grid View Settings
 PRODUCTS_GRID_COLUMNS = 4  # Number of columns in grid view
@@ -49,6 +55,14 @@ DEFAULT_REORDER_LEVEL = 10  # Default reorder level for new products
 LOW_STOCK_THRESHOLD_RATIO = 1.0  # Show as low stock when qty <= reorder_level * ratio
 CRITICAL_STOCK_THRESHOLD_RATIO = 0.5  # Show as critical when qty <= reorder_level * ratio
 
+# Demand Forecasting
+FORECAST_CONFIG = {
+    'history_days': 90,         # Days of history folded in on the first run
+    'alpha': 0.3,               # Level smoothing factor
+    'gamma': 0.1,               # Weekly seasonal smoothing factor
+    'horizon_days': 7,          # Days covered by the stored forecast
+}
+
 # Currency and Formatting
 DEFAULT_CURRENCY_SYMBOL = "$"
 CURRENCY_DECIMAL_PLACES = 2
@@ -76,6 +90,68 @@ ASSETS_DIR = "assets"
 LOGS_DIR = "logs"
 TEMP_DIR = "temp"
 
+# Stocktake
+STOCKTAKE_CONFIG = {
+    'journal_path': os.path.join(TEMP_DIR, "stocktake_journal.jsonl"),  # Crash-safe scan journal
+    'flush_every_scans': 25,        # fsync the journal after this many scans
+    'flush_interval_ms': 2000,      # ...or after this long, whichever comes first
+}
+
+# Query Instrumentation
+QUERY_STATS_CONFIG = {
+    'enabled': True,
+    'slow_query_ms': 100,  # Log queries slower than this, with parameters and query plan
+    'explain_slow_queries': True,
+    'explain_interval_s': 600,  # Reuse a query's plan for this long instead of explaining every slow run
+    'max_slow_entries': 200,  # Slow queries kept in memory for the diagnostics view
+}
+
+# Database Executor (writer thread and read-only connection pool)
+DB_EXECUTOR_CONFIG = {
+    'read_threads': 2,
+    'max_write_batch': 50,  # Queued writes committed together in one transaction
+    'wal': True,            # Write-ahead log, so reports never hold up a sale commit
+}
+
+# Sales Archiving (closed years moved to one database file per year)
+ARCHIVE_CONFIG = {
+    'directory': 'archives',  # Relative to the folder holding the main database
+}
+
+MAINTENANCE_CONFIG = {
+    'enabled': True,
+    'idle_minutes': 10,               # No keyboard or mouse input for this long counts as idle
+    'check_interval_ms': 30000,
+    'interrupt_check_ops': 1000,      # SQLite VM steps between checks for new input
+    'rollup_days_per_step': 31,
+    'analyze_interval_hours': 24,
+    'analysis_limit': 1000,           # Rows sampled per index by ANALYZE / PRAGMA optimize
+    'quick_check_interval_hours': 24,
+    'vacuum_pages_per_step': 1000,
+    'min_free_pages': 1000,           # Free pages worth switching an old database to incremental vacuum
+    'convert_max_mb': 512,            # Larger databases are switched with `python maintenance.py`
+}
+
+# Performance Metrics (hourly latency histograms kept in the database)
+METRICS_CONFIG = {
+    'enabled': True,
+    'flush_interval_ms': 5 * 60 * 1000,  # How often the main window writes pending hours
+    'retention_days': 400,               # Older hours are deleted at the first flush of a session
+}
+
+# Main-thread Stall Watchdog
+WATCHDOG_CONFIG = {
+    'enabled': True,
+    'heartbeat_ms': 50,          # GUI-thread heartbeat interval
+    'stall_threshold_ms': 150,   # Capture the main thread's stack when a heartbeat is this late
+    'hang_log_ms': 5000,         # Log a stall that is still going after this long, before it ends
+    'max_stack_depth': 40,
+    'max_recent_stalls': 200,    # Stalls kept in memory for the diagnostics view
+    'log_path': os.path.join(LOGS_DIR, "stalls.jsonl"),
+    'log_max_bytes': 1024 * 1024,
+    'log_backup_count': 3,
+}
+
 # Ensure directories exist
 def ensure_directories():
     """Create necessary directories if they don't exist"""
@@ -90,7 +166,7 @@ def ensure_directories():
     for directory in dirs:
         Path(directory).mkdir(exist_ok=True)
 
-# Logging Configuration
+# Logging Configuration (applied by logging_setup.setup_logging, which writes from a background thread)
 LOGGING_CONFIG = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -98,6 +174,12 @@ LOGGING_CONFIG = {
         'standard': {
             'format': '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
         },
+        'json': {
+            '()': 'logging_setup.JsonFormatter',
+        },
+        'message': {
+            'format': '%(message)s'
+        },
     },
     'handlers': {
         'default': {
@@ -107,10 +189,21 @@ LOGGING_CONFIG = {
         },
         'file': {
             'level': 'DEBUG',
-            'formatter': 'standard',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(LOGS_DIR, 'pos_system.log'),
-            'mode': 'a',
+            'formatter': 'json',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(LOGS_DIR, 'pos_system.jsonl'),
+            'maxBytes': 5 * 1024 * 1024,  # Rotate at 5 MB...
+            'backupCount': 4,             # ...keeping at most 25 MB on disk
+            'encoding': 'utf-8',
+        },
+        'slow_queries': {
+            'level': 'DEBUG',
+            'formatter': 'message',  # query_stats logs each slow query as one JSON object
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(LOGS_DIR, 'slow_queries.jsonl'),
+            'maxBytes': 5 * 1024 * 1024,
+            'backupCount': 2,
+            'encoding': 'utf-8',
         },
     },
     'loggers': {
@@ -118,7 +211,12 @@ LOGGING_CONFIG = {
             'handlers': ['default', 'file'],
             'level': 'DEBUG',
             'propagate': False
-        }
+        },
+        'pos.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'DEBUG',
+            'propagate': False
+        },
     }
 }
 
@@ -320,7 +418,7 @@ def load_user_config():
                     globals()[key] = value
                     
         except Exception as e:
-            print(f"Error loading user config: {e}")
+            logger.error(f"Error loading user config: {e}")
 
 def save_user_config(config_dict):
     """Save user-specific configuration to file"""
@@ -329,7 +427,7 @@ def save_user_config(config_dict):
         with open("user_config.json", 'w') as f:
             json.dump(config_dict, f, indent=2)
     except Exception as e:
-        print(f"Error saving user config: {e}")
+        logger.error(f"Error saving user config: {e}")
 
 def get_database_url():
     """Get database connection URL"""
@@ -445,10 +543,12 @@ def get_stylesheet():
     """
 
 # Initialize directories on import
-ensure_directories()
+with startup_trace.phase("config.ensure_directories"):
+    ensure_directories()
 
 # Load user configuration if it exists
-load_user_config()
+with startup_trace.phase("config.load_user_config"):
+    load_user_config()
 
 # Version information
 VERSION_INFO = {
@@ -500,7 +600,12 @@ def check_system_requirements():
 # Development and debugging
 DEBUG_MODE = False  # Set to True for development
 VERBOSE_LOGGING = False
-ENABLE_PROFILING = False
+ENABLE_PROFILING = False  # Startup timeline and per-action profiles (see profiling.py)
+PROFILING_CONFIG = {
+    'output_dir': os.path.join(LOGS_DIR, "profiles"),
+    'keep_per_action': 20,   # Older profiles of the same action are deleted
+    'summary_lines': 40,     # Functions listed in each text summary
+}
 
 def set_debug_mode(enabled):
     """Enable/disable debug mode"""
@@ -509,9 +614,9 @@ def set_debug_mode(enabled):
     VERBOSE_LOGGING = enabled
     
     if enabled:
-        print(f"Debug mode enabled - {get_full_version_string()}")
-        print(f"Database: {get_database_url()}")
-        print(f"Python: {sys.version}")
+        logger.info(f"Debug mode enabled - {get_full_version_string()}")
+        logger.info(f"Database: {get_database_url()}")
+        logger.info(f"Python: {sys.version}")
 
 # Configuration summary for troubleshooting
 def get_config_summary():
@@ -1,9 +1,68 @@
 import sqlite3
+import functools
 import hashlib
+import inspect
 import os
+import itertools
 import json
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Iterator, Optional, Tuple
+
+from config import ARCHIVE_CONFIG, QUERY_STATS_CONFIG
+from query_stats import InstrumentedConnection
+
+logger = logging.getLogger(__name__)
+
+MEMORY_DATABASE = ":memory:"
+_memory_ids = itertools.count(1)
+
+# Tables whose closed years are moved to archive databases (see archive.py)
+ARCHIVED_TABLES = ('sales', 'sale_items', 'sale_payments')
+
+# Tables whose writes are counted in table_versions, so views can tell when to reload (see change_detector.py)
+VERSIONED_TABLES = ('users', 'settings', 'categories', 'brands', 'suppliers', 'products', 'variants',
+                    'variant_forecasts', 'shifts', 'sales', 'sale_items', 'sale_payments', 'sales_archives')
+
+
+def utc_now() -> datetime:
+    """The time on created_at's clock: CURRENT_TIMESTAMP is UTC, so DATE(created_at) days are UTC days"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def spans_archives(method):
+    """
+    Let a reporting method read archived years as if they were still in the main database.
+
+    The archives its start_date/end_date range overlaps (every archive when
+    a bound is None), or the one holding its sale_id, are attached to the
+    connections it opens, behind temp views that shadow the hot tables.
+    Ranges inside the hot years attach nothing.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self._local, 'archives', None) is not None:
+            return method(self, *args, **kwargs)  # Called from another reporting method; already attached
+        arguments = signature.bind(self, *args, **kwargs).arguments
+        if 'sale_id' in arguments:
+            archives = self._archives_for_sale(arguments['sale_id'])
+        else:
+            archives = self._archives_for_range(arguments.get('start_date'), arguments.get('end_date'))
+        if not archives:
+            return method(self, *args, **kwargs)
+        self._local.archives = archives
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._local.archives = None
+            pinned = getattr(self._local, 'connection', None)
+            if pinned is not None:
+                self._detach_archives(pinned)
+    return wrapper
+
 
 def check_and_update_schema(conn):
     """
@@ -12,6 +71,10 @@ def check_and_update_schema(conn):
     schema = {
         "sale_items": [
             ("name", "TEXT"),
+            ("unit_cost", "DECIMAL(10,2)"),
+            ("product_name", "TEXT"),
+            ("variant_name", "TEXT"),
+            ("brand_name", "TEXT"),
         ]
     }
 
@@ -20,32 +83,228 @@ def check_and_update_schema(conn):
     for table, columns in schema.items():
         cursor.execute(f"PRAGMA table_info({table})")
         existing_columns = [row[1] for row in cursor.fetchall()]
+        if not existing_columns:
+            # Table not created yet; init_database creates it with all columns
+            continue
 
         for column_name, column_type in columns:
             if column_name not in existing_columns:
                 try:
                     cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_type}")
-                    print(f"Added column '{column_name}' to table '{table}'.")
+                    logger.info(f"Added column '{column_name}' to table '{table}'.")
                 except sqlite3.OperationalError as e:
-                    print(f"Failed to add column '{column_name}' to table '{table}': {e}")
+                    logger.error(f"Failed to add column '{column_name}' to table '{table}': {e}")
     conn.commit()
 
+# Streaming report exports: name -> (columns, query over a [start, end) created_at range)
+REPORT_EXPORT_QUERIES = {
+    'transactions': (
+        ['sale_id', 'sale_date', 'cashier', 'total', 'tax_amount', 'discount_amount', 'payments'],
+        """
+            SELECT s.id, s.created_at, u.username, s.total, s.tax_amount, s.discount_amount,
+                   (SELECT GROUP_CONCAT(sp.method || ': ' || sp.amount, '; ')
+                    FROM sale_payments sp WHERE sp.sale_id = s.id)
+            FROM sales s
+            LEFT JOIN shifts sh ON s.shift_id = sh.id
+            LEFT JOIN users u ON sh.user_id = u.id
+            WHERE s.created_at >= ? AND s.created_at < ?
+            ORDER BY s.id
+        """
+    ),
+    'sold_items': (
+        ['sale_id', 'sale_date', 'cashier', 'product_name', 'variant_name', 'brand_name',
+         'qty', 'price', 'unit_cost', 'subtotal'],
+        """
+            SELECT s.id, s.created_at, u.username, COALESCE(si.product_name, si.name), si.variant_name,
+                   si.brand_name, si.qty, si.price, si.unit_cost, si.subtotal
+            FROM sales s
+            JOIN sale_items si ON si.sale_id = s.id
+            LEFT JOIN shifts sh ON s.shift_id = sh.id
+            LEFT JOIN users u ON sh.user_id = u.id
+            WHERE s.created_at >= ? AND s.created_at < ?
+            ORDER BY s.id, si.id
+        """
+    ),
+    'payments': (
+        ['payment_id', 'sale_id', 'sale_date', 'method', 'amount', 'transaction_reference'],
+        """
+            SELECT sp.id, s.id, s.created_at, sp.method, sp.amount, sp.transaction_reference
+            FROM sales s
+            JOIN sale_payments sp ON sp.sale_id = s.id
+            WHERE s.created_at >= ? AND s.created_at < ?
+            ORDER BY s.id, sp.id
+        """
+    ),
+    'product_sales': (
+        ['variant_id', 'product_name', 'variant_name', 'brand_name', 'qty', 'revenue', 'cost', 'profit'],
+        """
+            SELECT si.variant_id, COALESCE(si.product_name, si.name), si.variant_name, si.brand_name,
+                   SUM(si.qty), SUM(si.subtotal), SUM(si.qty * COALESCE(si.unit_cost, 0)),
+                   SUM(si.subtotal) - SUM(si.qty * COALESCE(si.unit_cost, 0))
+            FROM sales s
+            JOIN sale_items si ON si.sale_id = s.id
+            WHERE s.created_at >= ? AND s.created_at < ?
+            GROUP BY si.variant_id, COALESCE(si.product_name, si.name), si.variant_name, si.brand_name
+            ORDER BY SUM(si.subtotal) DESC
+        """
+    ),
+}
+
 class POSDatabase:
-    def __init__(self, db_path: str = "pos_system.db"):
-        self.db_path = db_path
+    def __init__(self, db_path: str = "pos_system.db", load_from: str = None):
+        """
+        Open the database at db_path.
+
+        ":memory:" opens an in-memory database shared by every connection
+        this POSDatabase opens; it lives until close(). load_from copies a
+        database file into it first, so tests and benchmarks can run a real
+        dataset entirely in RAM.
+        """
+        self._local = threading.local()
+        self._memory_anchor = None
+        self.in_memory = db_path == MEMORY_DATABASE
+        if self.in_memory:
+            # A private name, so two in-memory databases in one process stay apart
+            self.db_path = f"file:pos_memory_{os.getpid()}_{next(_memory_ids)}?mode=memory&cache=shared"
+            self._memory_anchor = self._connect()  # The database is dropped when its last connection closes
+            if load_from:
+                self.load_from_file(load_from)
+        elif load_from:
+            raise ValueError("load_from is only supported for in-memory databases")
+        else:
+            self.db_path = db_path
         with self.get_connection() as conn:
             check_and_update_schema(conn)
     
+    def _connect(self, database: str = None, **kwargs) -> sqlite3.Connection:
+        """Open a raw connection, instrumented when query stats are enabled"""
+        if QUERY_STATS_CONFIG['enabled']:
+            kwargs['factory'] = InstrumentedConnection
+        if database is None:
+            database = self.db_path
+            kwargs.setdefault('uri', self.in_memory)
+        return sqlite3.connect(database, **kwargs)
+
+    def load_from_file(self, path: str):
+        """Replace the in-memory database with a copy of the database file at path, using SQLite's backup API"""
+        if not self.in_memory:
+            raise ValueError("load_from_file is only supported for in-memory databases")
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        source = sqlite3.connect(path)
+        try:
+            source.backup(self._memory_anchor)
+        finally:
+            source.close()
+
+    def close(self):
+        """Release an in-memory database; file databases hold no connection between calls"""
+        if self._memory_anchor is not None:
+            self._memory_anchor.close()
+            self._memory_anchor = None
+
+    def pin_connection(self, conn):
+        """Make get_connection() return conn on the calling thread, or open new connections again with None"""
+        self._local.connection = conn
+
     def get_connection(self):
         """Get database connection with foreign key support"""
-        conn = sqlite3.connect(self.db_path)
+        archives = getattr(self._local, 'archives', None)
+        pinned = getattr(self._local, 'connection', None)
+        if pinned is not None:
+            pinned.row_factory = sqlite3.Row
+            if archives:
+                self._attach_archives(pinned, archives)
+            return pinned
+        conn = self._connect()
         conn.execute("PRAGMA foreign_keys = ON")
         conn.row_factory = sqlite3.Row
+        if archives:
+            self._attach_archives(conn, archives)
         return conn
-    
+
+    # Sales Archives
+    def archive_path(self, year: int) -> str:
+        """Where the archive database for a year lives: ARCHIVE_CONFIG['directory'] next to the main database"""
+        if self.in_memory:
+            raise ValueError("In-memory databases cannot be archived")
+        folder = os.path.dirname(os.path.abspath(self.db_path))
+        stem = os.path.splitext(os.path.basename(self.db_path))[0]
+        return os.path.join(folder, ARCHIVE_CONFIG['directory'], f"{stem}_{year}.db")
+
+    def get_sales_archives(self) -> List[Dict]:
+        """Archived years with their sale count and sale id range, oldest first"""
+        with self.get_connection() as conn:
+            try:
+                return [dict(row) for row in conn.execute("SELECT * FROM sales_archives ORDER BY year").fetchall()]
+            except sqlite3.OperationalError:
+                return []  # Tables not created yet; init_database adds them
+
+    def _usable_archives(self, archives: List[Dict]) -> List[Tuple[int, str]]:
+        usable = []
+        for archive in archives:
+            path = os.path.join(os.path.dirname(os.path.abspath(self.db_path)), archive['file'])
+            if os.path.exists(path):
+                usable.append((archive['year'], path))
+            else:
+                logger.warning(f"Sales archive for {archive['year']} is missing: {path}")
+        return usable
+
+    def _archives_for_range(self, start_date: Optional[str], end_date: Optional[str]) -> List[Tuple[int, str]]:
+        if self.in_memory:
+            return []
+        first = int(start_date[:4]) if start_date else None
+        last = int(end_date[:4]) if end_date else None
+        return self._usable_archives([
+            archive for archive in self.get_sales_archives()
+            if (first is None or archive['year'] >= first) and (last is None or archive['year'] <= last)
+        ])
+
+    def _archives_for_sale(self, sale_id: int) -> List[Tuple[int, str]]:
+        if self.in_memory:
+            return []
+        return self._usable_archives([
+            archive for archive in self.get_sales_archives()
+            if archive['first_sale_id'] <= sale_id <= archive['last_sale_id']
+        ])
+
+    @staticmethod
+    def _attach_archives(conn, archives: List[Tuple[int, str]]):
+        """Attach archives and point temp views named after the archived tables at the hot rows plus theirs"""
+        attached = {row[1] for row in conn.execute("PRAGMA database_list").fetchall()}
+        missing = [(year, path) for year, path in archives if f"archive_{year}" not in attached]
+        if not missing:
+            return
+        for year, path in missing:
+            conn.execute(f"ATTACH DATABASE ? AS archive_{year}", (path,))
+        schemas = sorted(name for name in attached | {f"archive_{year}" for year, _ in missing}
+                         if name.startswith('archive_'))
+        for table in ARCHIVED_TABLES:
+            columns = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall()]
+            selects = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+            for schema in schemas:
+                # Archives keep the columns their table had when they were written
+                present = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()}
+                values = ', '.join(column if column in present else f"NULL AS {column}" for column in columns)
+                selects.append(f"SELECT {values} FROM {schema}.{table}")
+            conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+            conn.execute(f"CREATE TEMP VIEW {table} AS {' UNION ALL '.join(selects)}")
+
+    @staticmethod
+    def _detach_archives(conn):
+        """Drop the archive views and detach every archive; used on connections that outlive one call"""
+        for table in ARCHIVED_TABLES:
+            conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+        for row in conn.execute("PRAGMA database_list").fetchall():
+            if row[1].startswith('archive_'):
+                conn.execute(f"DETACH DATABASE {row[1]}")
+
     def init_database(self):
         """Initialize database with all required tables"""
         with self.get_connection() as conn:
+            # Lets idle maintenance give free pages back in small steps; only new databases pick it up here
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
             # Users table
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS users (
@@ -180,15 +439,181 @@ class POSDatabase:
                     qty INTEGER NOT NULL,
                     price DECIMAL(10,2) NOT NULL,
                     subtotal DECIMAL(10,2) NOT NULL,
+                    -- Catalogue snapshot taken when the sale is committed
+                    unit_cost DECIMAL(10,2),
+                    product_name TEXT,
+                    variant_name TEXT,
+                    brand_name TEXT,
                     FOREIGN KEY (sale_id) REFERENCES sales (id),
                     FOREIGN KEY (product_id) REFERENCES products (id),
                     FOREIGN KEY (variant_id) REFERENCES variants (id)
                 )
             ''')
+
+            # Variant demand forecasts (smoothing state plus latest forecast)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS variant_forecasts (
+                    variant_id INTEGER PRIMARY KEY,
+                    simple_level REAL NOT NULL DEFAULT 0,
+                    seasonal_level REAL NOT NULL DEFAULT 0,
+                    seasonal_factors TEXT,  -- JSON list indexed by weekday (Mon=0)
+                    forecast_daily REAL NOT NULL DEFAULT 0,
+                    forecast_week REAL NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (variant_id) REFERENCES variants (id) ON DELETE CASCADE
+                )
+            ''')
             
+            # Stock movement ledger (append-only; outlives deleted variants)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS stock_movements (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    variant_id INTEGER NOT NULL,
+                    movement_type TEXT NOT NULL CHECK(movement_type IN ('sale', 'receive', 'adjustment', 'edit', 'return')),
+                    quantity INTEGER NOT NULL,  -- signed change in stock
+                    reference_id INTEGER,       -- e.g. sale ID for sale movements
+                    note TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_created ON sales (created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items (sale_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_payments_sale ON sale_payments (sale_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_variant ON stock_movements (variant_id, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_created ON stock_movements (created_at)")
+
+            # Periodic per-variant stock snapshots for stock-as-of queries
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS stock_snapshots (
+                    snapshot_at TIMESTAMP NOT NULL,
+                    variant_id INTEGER NOT NULL,
+                    stock_quantity INTEGER NOT NULL,
+                    last_movement_id INTEGER NOT NULL,  -- ledger position the snapshot includes
+                    PRIMARY KEY (snapshot_at, variant_id)
+                )
+            ''')
+
+            # Goods received notes (supplier deliveries)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS goods_receipts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    supplier_id INTEGER,
+                    reference TEXT,  -- supplier delivery note / invoice number
+                    user_id INTEGER,
+                    line_count INTEGER NOT NULL DEFAULT 0,
+                    total_cost DECIMAL(10,2) NOT NULL DEFAULT 0,
+                    notes TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (supplier_id) REFERENCES suppliers (id),
+                    FOREIGN KEY (user_id) REFERENCES users (id)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS goods_receipt_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    receipt_id INTEGER NOT NULL,
+                    variant_id INTEGER NOT NULL,
+                    qty INTEGER NOT NULL,
+                    unit_cost DECIMAL(10,2),
+                    FOREIGN KEY (receipt_id) REFERENCES goods_receipts (id)
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_goods_receipt_items_receipt ON goods_receipt_items (receipt_id)")
+
+            # Hourly latency histograms (see metrics.py)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS perf_metrics (
+                    metric TEXT NOT NULL,
+                    hour TEXT NOT NULL,  -- local time, 'YYYY-MM-DD HH:00'
+                    count INTEGER NOT NULL,
+                    total_ms REAL NOT NULL,
+                    max_ms REAL NOT NULL,
+                    histogram TEXT NOT NULL,  -- JSON counts per metrics.METRIC_BUCKETS_MS bucket
+                    PRIMARY KEY (metric, hour)
+                )
+            ''')
+
+            # Closed years of sales moved to archive databases, and the daily rollups that stay here
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sales_archives (
+                    year INTEGER PRIMARY KEY,
+                    file TEXT NOT NULL,  -- relative to the main database's folder
+                    sales INTEGER NOT NULL,
+                    first_sale_id INTEGER NOT NULL,
+                    last_sale_id INTEGER NOT NULL,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+                    day TEXT PRIMARY KEY,
+                    num_sales INTEGER NOT NULL,
+                    total_sales REAL NOT NULL,
+                    total_tax REAL NOT NULL,
+                    total_discounts REAL NOT NULL,
+                    items_sold INTEGER NOT NULL,
+                    cost REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sales_daily_variant_rollup (
+                    day TEXT NOT NULL,
+                    variant_id INTEGER NOT NULL,  -- 0 for custom items
+                    qty INTEGER NOT NULL,
+                    revenue REAL NOT NULL,
+                    cost REAL NOT NULL,
+                    PRIMARY KEY (day, variant_id)
+                )
+            ''')
+
+            # Write counters bumped by triggers in the writing transaction, whichever process writes
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS table_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            for table in VERSIONED_TABLES:
+                conn.execute("INSERT OR IGNORE INTO table_versions (name) VALUES (?)", (table,))
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version AFTER {event} ON {table}
+                        BEGIN UPDATE table_versions SET version = version + 1 WHERE name = '{table}'; END
+                    ''')
+
             conn.commit()
+            self.backfill_sale_item_snapshots(conn)
             self.init_default_data()
     
+    def backfill_sale_item_snapshots(self, conn: sqlite3.Connection):
+        """
+        Fill catalogue snapshot columns for sale lines recorded before they existed.
+
+        Cost is taken from the variant's current purchase price, which is the
+        best information available for historical lines. Runs once per
+        database; the sale_item_snapshots_backfilled setting records that it has.
+        """
+        if conn.execute("SELECT 1 FROM settings WHERE key = 'sale_item_snapshots_backfilled'").fetchone():
+            return
+        conn.execute('''
+            UPDATE sale_items SET
+                unit_cost = (SELECT v.purchase_price FROM variants v WHERE v.id = sale_items.variant_id),
+                variant_name = (SELECT v.name FROM variants v WHERE v.id = sale_items.variant_id),
+                brand_name = (
+                    SELECT b.name FROM products p JOIN brands b ON p.brand_id = b.id
+                    WHERE p.id = sale_items.product_id
+                ),
+                product_name = COALESCE(
+                    (SELECT p.name FROM products p WHERE p.id = sale_items.product_id), name, ''
+                )
+            WHERE product_name IS NULL
+        ''')
+        conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, ?)",
+            ('sale_item_snapshots_backfilled', '1', datetime.now())
+        )
+        conn.commit()
+
     def init_default_data(self):
         """Initialize default admin user and settings"""
         with self.get_connection() as conn:
@@ -221,6 +646,16 @@ class POSDatabase:
             
             conn.commit()
     
+    def backup_database(self, path: str):
+        """Copy the database to path with SQLite's online backup, which stays consistent during writes"""
+        source = self._connect()
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
     # User Management
     def authenticate_user(self, username: str, password: str) -> Optional[Dict]:
         """Authenticate user and return user info"""
@@ -478,6 +913,8 @@ class POSDatabase:
                 (product_id, name, price, purchase_price, barcode, stock_quantity, reorder_level)
             )
             variant_id = cursor.lastrowid
+            if stock_quantity:
+                self._record_stock_movements(conn, [(variant_id, 'receive', stock_quantity, None, 'Initial stock')])
             if close_conn:
                 conn.commit()
             return variant_id
@@ -497,12 +934,14 @@ class POSDatabase:
                     v.stock_quantity, v.reorder_level,
                     s.name as supplier_name, s.phone as supplier_phone, s.email as supplier_email,
                     b.name as brand_name,
-                    c.name as category_name
+                    c.name as category_name,
+                    f.forecast_daily, f.forecast_week
                 FROM products p
                 LEFT JOIN variants v ON p.id = v.product_id
                 LEFT JOIN suppliers s ON p.supplier_id = s.id
                 LEFT JOIN brands b ON p.brand_id = b.id
                 LEFT JOIN categories c ON p.category_id = c.id
+                LEFT JOIN variant_forecasts f ON v.id = f.variant_id
                 ORDER BY p.name, v.name
             '''
             results = conn.execute(query).fetchall()
@@ -573,13 +1012,15 @@ class POSDatabase:
                 return dict(result)
             return None
     
-    def update_stock(self, variant_id: int, quantity_change: int):
-        """Update stock quantity for a variant"""
+    def update_stock(self, variant_id: int, quantity_change: int,
+                     movement_type: str = 'adjustment', note: str = None):
+        """Update stock quantity for a variant and record the movement"""
         with self.get_connection() as conn:
             conn.execute(
                 "UPDATE variants SET stock_quantity = stock_quantity + ? WHERE id = ?",
                 (quantity_change, variant_id)
             )
+            self._record_stock_movements(conn, [(variant_id, movement_type, quantity_change, None, note)])
             conn.commit()
     
     def get_low_stock_items(self) -> List[Dict]:
@@ -592,12 +1033,14 @@ class POSDatabase:
                     v.stock_quantity, v.reorder_level,
                     s.name as supplier_name, s.phone as supplier_phone, s.email as supplier_email,
                     b.name as brand_name,
-                    c.name as category_name
+                    c.name as category_name,
+                    f.forecast_daily, f.forecast_week
                 FROM products p
                 JOIN variants v ON p.id = v.product_id
                 LEFT JOIN suppliers s ON p.supplier_id = s.id
                 LEFT JOIN brands b ON p.brand_id = b.id
                 LEFT JOIN categories c ON p.category_id = c.id
+                LEFT JOIN variant_forecasts f ON v.id = f.variant_id
                 WHERE v.stock_quantity <= v.reorder_level
                 ORDER BY v.stock_quantity ASC
             '''
@@ -640,6 +1083,8 @@ class POSDatabase:
             # Get existing variants
             existing_variants = self.get_variants_for_product(product_id, conn=conn)
             existing_variant_ids = {v['id'] for v in existing_variants}
+            existing_stock = {v['id']: v['stock_quantity'] or 0 for v in existing_variants}
+            movements = []
 
             # Update or add variants
             for variant in variants:
@@ -654,6 +1099,8 @@ class POSDatabase:
                         """,
                         (variant['name'], variant['price'], variant['purchase_price'], variant['barcode'], variant['stock'], variant['reorder_level'], variant_id)
                     )
+                    if variant['stock'] != existing_stock[variant_id]:
+                        movements.append((variant_id, 'edit', variant['stock'] - existing_stock[variant_id], None, None))
                     existing_variant_ids.remove(variant_id)
                 else:
                     # Add new variant
@@ -671,7 +1118,10 @@ class POSDatabase:
             # Remove old variants
             for variant_id in existing_variant_ids:
                 conn.execute("DELETE FROM variants WHERE id = ?", (variant_id,))
+                if existing_stock[variant_id]:
+                    movements.append((variant_id, 'edit', -existing_stock[variant_id], None, 'Variant deleted'))
 
+            self._record_stock_movements(conn, movements)
             conn.commit()
     
     # Shift Management
@@ -727,20 +1177,96 @@ class POSDatabase:
     
     def add_sale_item(self, sale_id: int, product_id: int, variant_id: int, 
                      qty: int, price: float, subtotal: float, name: str = None):
-        """Add item to sale"""
+        """Add item to sale, snapshotting its cost and catalogue names"""
+        item = {
+            'product_id': product_id, 'variant_id': variant_id, 'qty': qty,
+            'price': price, 'subtotal': subtotal, 'name': name
+        }
         with self.get_connection() as conn:
-            conn.execute(
-                "INSERT INTO sale_items (sale_id, product_id, variant_id, qty, price, subtotal, name) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (sale_id, product_id, variant_id, qty, price, subtotal, name)
+            self._insert_sale_items(conn, sale_id, [item])
+            conn.commit()
+
+    def commit_sale(self, shift_id: int, total: float, tax_amount: float, discount_amount: float,
+                    payments: List[Dict], items: List[Dict]) -> int:
+        """
+        Record a complete sale in a single transaction.
+
+        Args:
+            shift_id: ID of the current shift
+            total: Sale total
+            tax_amount: Tax included in the total
+            discount_amount: Discount applied to the sale
+            payments: Dicts with method, amount and optional reference
+            items: Dicts with product_id, variant_id, qty, price, subtotal and optional name
+
+        Returns:
+            int: The ID of the new sale
+        """
+        with self.get_connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO sales (shift_id, total, tax_amount, discount_amount) VALUES (?, ?, ?, ?)",
+                (shift_id, total, tax_amount, discount_amount)
             )
-            # Update stock
-            if variant_id:
-                conn.execute(
-                    "UPDATE variants SET stock_quantity = stock_quantity - ? WHERE id = ?",
-                    (qty, variant_id)
-                )
+            sale_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO sale_payments (sale_id, method, amount, transaction_reference) VALUES (?, ?, ?, ?)",
+                [(sale_id, p['method'], float(p['amount']), p.get('reference')) for p in payments]
+            )
+            self._insert_sale_items(conn, sale_id, items)
             conn.commit()
+            return sale_id
+
+    def _insert_sale_items(self, conn: sqlite3.Connection, sale_id: int, items: List[Dict]):
+        """Insert sale lines with catalogue snapshots, deduct stock and record sale movements"""
+        variant_ids = [item['variant_id'] for item in items if item.get('variant_id')]
+        snapshots = {}
+        if variant_ids:
+            placeholders = ','.join('?' * len(variant_ids))
+            rows = conn.execute(
+                f"""
+                SELECT v.id, v.purchase_price, p.name as product_name, v.name as variant_name, b.name as brand_name
+                FROM variants v
+                JOIN products p ON v.product_id = p.id
+                LEFT JOIN brands b ON p.brand_id = b.id
+                WHERE v.id IN ({placeholders})
+                """,
+                variant_ids
+            ).fetchall()
+            snapshots = {row['id']: row for row in rows}
+
+        item_rows = []
+        for item in items:
+            snapshot = snapshots.get(item.get('variant_id'))
+            if snapshot:
+                unit_cost, product_name = snapshot['purchase_price'], snapshot['product_name']
+                variant_name, brand_name = snapshot['variant_name'], snapshot['brand_name']
+            else:
+                unit_cost, product_name, variant_name, brand_name = None, item.get('name'), None, None
+            item_rows.append((
+                sale_id, item.get('product_id'), item.get('variant_id'), item['qty'], item['price'],
+                item['subtotal'], item.get('name'), unit_cost, product_name or '', variant_name, brand_name
+            ))
+        conn.executemany(
+            """
+            INSERT INTO sale_items
+                (sale_id, product_id, variant_id, qty, price, subtotal, name,
+                 unit_cost, product_name, variant_name, brand_name)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            item_rows
+        )
+
+        # Update stock
+        stock_items = [item for item in items if item.get('variant_id')]
+        conn.executemany(
+            "UPDATE variants SET stock_quantity = stock_quantity - ? WHERE id = ?",
+            [(item['qty'], item['variant_id']) for item in stock_items]
+        )
+        self._record_stock_movements(
+            conn, [(item['variant_id'], 'sale', -item['qty'], sale_id, None) for item in stock_items]
+        )
     
+    @spans_archives
     def get_sale_with_items(self, sale_id: int) -> Dict:
         """Get sale with all items and payments"""
         with self.get_connection() as conn:
@@ -751,13 +1277,10 @@ class POSDatabase:
             items_query = '''
                 SELECT 
                     si.qty, si.price, si.subtotal,
-                    COALESCE(p.name, si.name) as product_name, 
-                    b.name as brand_name,
-                    v.name as variant_name
+                    COALESCE(si.product_name, si.name) as product_name, 
+                    si.brand_name,
+                    si.variant_name
                 FROM sale_items si
-                LEFT JOIN products p ON si.product_id = p.id
-                LEFT JOIN variants v ON si.variant_id = v.id
-                LEFT JOIN brands b ON p.brand_id = b.id
                 WHERE si.sale_id = ?
             '''
             items = conn.execute(items_query, (sale_id,)).fetchall()
@@ -773,6 +1296,7 @@ class POSDatabase:
             }
     
     # Reporting
+    @spans_archives
     def get_sales_summary(self, start_date: str = None, end_date: str = None) -> Dict:
         """Get sales summary for date range"""
         with self.get_connection() as conn:
@@ -803,13 +1327,11 @@ class POSDatabase:
             # Top products
             top_products_query = f'''
                 SELECT 
-                    p.name as product_name, v.name as variant_name,
+                    MAX(si.product_name) as product_name, MAX(si.variant_name) as variant_name,
                     SUM(si.qty) as total_qty, SUM(si.subtotal) as total_revenue
                 FROM sale_items si
-                JOIN products p ON si.product_id = p.id
-                JOIN variants v ON si.variant_id = v.id
                 JOIN sales s ON si.sale_id = s.id
-                {where_clause}
+                {where_clause}{" AND" if where_clause else " WHERE"} si.variant_id IS NOT NULL
                 GROUP BY si.product_id, si.variant_id
                 ORDER BY total_qty DESC
                 LIMIT 10
@@ -822,53 +1344,57 @@ class POSDatabase:
                 'top_products': [dict(product) for product in top_products]
             }
 
+    @spans_archives
     def get_total_sales(self, start_date: str, end_date: str) -> float:
         with self.get_connection() as conn:
             query = "SELECT SUM(amount) FROM sale_payments sp JOIN sales s ON sp.sale_id = s.id WHERE DATE(s.created_at) BETWEEN ? AND ?"
             result = conn.execute(query, (start_date, end_date)).fetchone()
             return result[0] or 0
 
+    @spans_archives
     def get_number_of_sales(self, start_date: str, end_date: str) -> int:
         with self.get_connection() as conn:
             query = "SELECT COUNT(DISTINCT sale_id) FROM sale_payments sp JOIN sales s ON sp.sale_id = s.id WHERE DATE(s.created_at) BETWEEN ? AND ?"
             result = conn.execute(query, (start_date, end_date)).fetchone()
             return result[0] or 0
 
+    @spans_archives
     def get_items_sold(self, start_date: str, end_date: str) -> int:
         with self.get_connection() as conn:
             query = "SELECT SUM(qty) FROM sale_items si JOIN sales s ON si.sale_id = s.id WHERE DATE(s.created_at) BETWEEN ? AND ?"
             result = conn.execute(query, (start_date, end_date)).fetchone()
             return result[0] or 0
 
+    @spans_archives
     def get_total_tax(self, start_date: str, end_date: str) -> float:
         with self.get_connection() as conn:
             query = "SELECT SUM(tax_amount) FROM sales WHERE DATE(created_at) BETWEEN ? AND ?"
             result = conn.execute(query, (start_date, end_date)).fetchone()
             return result[0] or 0
 
+    @spans_archives
     def get_profit(self, start_date: str, end_date: str, include_tax: bool = False) -> float:
         with self.get_connection() as conn:
             if include_tax:
                 # Profit including tax (Sales with tax - Cost of Goods)
                 query = """
-                    SELECT SUM(si.subtotal + s.tax_amount - (v.purchase_price * si.qty))
+                    SELECT SUM(si.subtotal + s.tax_amount - (si.unit_cost * si.qty))
                     FROM sale_items si
-                    JOIN variants v ON si.variant_id = v.id
                     JOIN sales s ON si.sale_id = s.id
-                    WHERE v.purchase_price IS NOT NULL AND DATE(s.created_at) BETWEEN ? AND ?
+                    WHERE si.unit_cost IS NOT NULL AND DATE(s.created_at) BETWEEN ? AND ?
                 """
             else:
                 # Profit excluding tax (Sales without tax - Cost of Goods)
                 query = """
-                    SELECT SUM(si.subtotal - (v.purchase_price * si.qty))
+                    SELECT SUM(si.subtotal - (si.unit_cost * si.qty))
                     FROM sale_items si
-                    JOIN variants v ON si.variant_id = v.id
                     JOIN sales s ON si.sale_id = s.id
-                    WHERE v.purchase_price IS NOT NULL AND DATE(s.created_at) BETWEEN ? AND ?
+                    WHERE si.unit_cost IS NOT NULL AND DATE(s.created_at) BETWEEN ? AND ?
                 """
             result = conn.execute(query, (start_date, end_date)).fetchone()
             return result[0] or 0
 
+    @spans_archives
     def get_sales_by_payment_method(self, start_date: str, end_date: str) -> List[Dict]:
         with self.get_connection() as conn:
             query = """
@@ -881,22 +1407,21 @@ class POSDatabase:
             results = conn.execute(query, (start_date, end_date)).fetchall()
             return [dict(row) for row in results]
 
+    @spans_archives
     def get_top_products(self, start_date: str, end_date: str) -> List[Dict]:
         with self.get_connection() as conn:
             query = """
                 SELECT
-                    p.id as product_id,
-                    v.id as variant_id,
-                    p.name as product_name,
-                    v.name as variant_name,
+                    si.product_id,
+                    si.variant_id,
+                    MAX(si.product_name) as product_name,
+                    MAX(si.variant_name) as variant_name,
                     SUM(si.qty) as total_qty,
                     SUM(si.subtotal) as total_revenue,
-                    SUM(si.subtotal - (v.purchase_price * si.qty)) as total_profit
+                    SUM(si.subtotal - (si.unit_cost * si.qty)) as total_profit
                 FROM sale_items si
-                JOIN products p ON si.product_id = p.id
-                JOIN variants v ON si.variant_id = v.id
                 JOIN sales s ON si.sale_id = s.id
-                WHERE v.purchase_price IS NOT NULL AND DATE(s.created_at) BETWEEN ? AND ?
+                WHERE si.variant_id IS NOT NULL AND si.unit_cost IS NOT NULL AND DATE(s.created_at) BETWEEN ? AND ?
                 GROUP BY si.product_id, si.variant_id
                 ORDER BY total_qty DESC
                 LIMIT 10
@@ -904,6 +1429,7 @@ class POSDatabase:
             results = conn.execute(query, (start_date, end_date)).fetchall()
             return [dict(row) for row in results]
 
+    @spans_archives
     def get_detailed_transactions(self, start_date: str, end_date: str) -> List[Dict]:
         """Get detailed transactions for a given date range."""
         with self.get_connection() as conn:
@@ -927,23 +1453,35 @@ class POSDatabase:
             results = conn.execute(query, (start_date, end_date)).fetchall()
             return [dict(row) for row in results]
 
+    @spans_archives
     def get_shift_summary(self, start_date: str, end_date: str) -> List[Dict]:
         """Get shift summary for a given date range."""
         with self.get_connection() as conn:
+            # One pass over the shifts' cash payments; a correlated subquery per shift rescans
+            # the archive views for every row
             query = """
                 SELECT
                     u.username as cashier,
                     sh.opening_cash,
                     sh.closing_cash,
-                    (SELECT SUM(amount) FROM sale_payments WHERE sale_id IN (SELECT id FROM sales WHERE shift_id = sh.id) AND method = 'Cash') as expected_cash_sales
+                    cash.total as expected_cash_sales
                 FROM shifts sh
                 JOIN users u ON sh.user_id = u.id
+                LEFT JOIN (
+                    SELECT s.shift_id, SUM(sp.amount) as total
+                    FROM sale_payments sp
+                    JOIN sales s ON sp.sale_id = s.id
+                    WHERE sp.method = 'Cash'
+                      AND s.shift_id IN (SELECT id FROM shifts WHERE DATE(start_time) BETWEEN ? AND ?)
+                    GROUP BY s.shift_id
+                ) cash ON cash.shift_id = sh.id
                 WHERE DATE(sh.start_time) BETWEEN ? AND ?
                 ORDER BY sh.start_time DESC
             """
-            results = conn.execute(query, (start_date, end_date)).fetchall()
+            results = conn.execute(query, (start_date, end_date, start_date, end_date)).fetchall()
             return [dict(row) for row in results]
 
+    @spans_archives
     def get_sales_for_product(self, product_id: int, variant_id: int, start_date: str, end_date: str) -> List[Dict]:
         """Get all sales for a specific product variant in a date range."""
         with self.get_connection() as conn:
@@ -961,6 +1499,7 @@ class POSDatabase:
             results = conn.execute(query, (product_id, variant_id, start_date, end_date)).fetchall()
             return [dict(row) for row in results]
 
+    @spans_archives
     def get_sold_items(self, start_date: str, end_date: str) -> List[Dict]:
         """Get all sold items in a date range."""
         with self.get_connection() as conn:
@@ -969,8 +1508,8 @@ class POSDatabase:
                     s.created_at as sale_date,
                     s.id as sale_id,
                     u.username as cashier,
-                    CASE WHEN p.name IS NOT NULL THEN p.name ELSE si.name END as product_name,
-                    v.name as variant_name,
+                    COALESCE(si.product_name, si.name) as product_name,
+                    si.variant_name,
                     si.qty,
                     si.price,
                     si.subtotal
@@ -978,14 +1517,13 @@ class POSDatabase:
                 LEFT JOIN sales s ON si.sale_id = s.id
                 LEFT JOIN shifts sh ON s.shift_id = sh.id
                 LEFT JOIN users u ON sh.user_id = u.id
-                LEFT JOIN products p ON si.product_id = p.id
-                LEFT JOIN variants v ON si.variant_id = v.id
                 WHERE DATE(s.created_at) BETWEEN ? AND ?
-                ORDER BY s.id DESC, p.name
+                ORDER BY s.id DESC, si.product_name
             """
             results = conn.execute(query, (start_date, end_date)).fetchall()
             return [dict(row) for row in results]
 
+    @spans_archives
     def get_detailed_sales(self, start_date: str, end_date: str) -> List[Dict]:
         with self.get_connection() as conn:
             query = """
@@ -1004,8 +1542,606 @@ class POSDatabase:
             results = conn.execute(query, (start_date, end_date)).fetchall()
             return [dict(row) for row in results]
 
+    @spans_archives
     def get_items_sold_for_sale(self, sale_id: int) -> int:
         with self.get_connection() as conn:
             query = "SELECT SUM(qty) FROM sale_items WHERE sale_id = ?"
             result = conn.execute(query, (sale_id,)).fetchone()
             return result[0] or 0
+
+    # Report Exports
+    @staticmethod
+    def _export_range(start_date: str, end_date: str) -> Tuple[str, str]:
+        """Turn an inclusive date range into created_at bounds that can use the index"""
+        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+        return start_date, end.strftime("%Y-%m-%d")
+
+    @spans_archives
+    def count_report_rows(self, report: str, start_date: str, end_date: str) -> int:
+        """Count the rows a report export will produce, for progress reporting"""
+        _, query = REPORT_EXPORT_QUERIES[report]
+        with self.get_connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM ({query})", self._export_range(start_date, end_date)).fetchone()[0]
+
+    def iter_report_rows(self, report: str, start_date: str, end_date: str,
+                         batch_size: int = 1000) -> Iterator[Tuple]:
+        """
+        Stream a report export as plain tuples straight off the cursor.
+
+        Rows are fetched in batches so memory use does not depend on the
+        size of the range. Column names are in REPORT_EXPORT_QUERIES.
+        """
+        _, query = REPORT_EXPORT_QUERIES[report]
+        conn = self._connect()
+        try:
+            archives = self._archives_for_range(start_date, end_date)
+            if archives:
+                self._attach_archives(conn, archives)
+            cursor = conn.execute(query, self._export_range(start_date, end_date))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    @spans_archives
+    def get_report_snapshot(self, start_date: str, end_date: str) -> Dict:
+        """
+        Get the summary sections of a sales report from one consistent read.
+
+        The highest sale id in range is captured with the aggregates, and
+        get_transactions_page takes it as an upper bound, so pages fetched
+        later line up with the summary even while sales keep coming in.
+        """
+        bounds = self._export_range(start_date, end_date)
+        with self.get_connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                max_sale_id = conn.execute(
+                    "SELECT COALESCE(MAX(id), 0) FROM sales WHERE created_at >= ? AND created_at < ?", bounds
+                ).fetchone()[0]
+                params = bounds + (max_sale_id,)
+                sales_filter = "s.created_at >= ? AND s.created_at < ? AND s.id <= ?"
+
+                totals = conn.execute(f"""
+                    SELECT COUNT(*) as num_sales, COALESCE(SUM(s.total), 0) as total_sales,
+                           COALESCE(SUM(s.tax_amount), 0) as total_tax,
+                           COALESCE(SUM(s.discount_amount), 0) as total_discounts
+                    FROM sales s WHERE {sales_filter}
+                """, params).fetchone()
+                items = conn.execute(f"""
+                    SELECT COALESCE(SUM(si.qty), 0) as items_sold,
+                           COALESCE(SUM(CASE WHEN si.unit_cost IS NOT NULL
+                                             THEN si.subtotal - si.unit_cost * si.qty END), 0) as profit
+                    FROM sale_items si JOIN sales s ON si.sale_id = s.id
+                    WHERE {sales_filter}
+                """, params).fetchone()
+                payment_methods = conn.execute(f"""
+                    SELECT sp.method, SUM(sp.amount) as total, COUNT(*) as count
+                    FROM sale_payments sp JOIN sales s ON sp.sale_id = s.id
+                    WHERE {sales_filter}
+                    GROUP BY sp.method ORDER BY total DESC
+                """, params).fetchall()
+                top_products = conn.execute(f"""
+                    SELECT MAX(si.product_name) as product_name, MAX(si.variant_name) as variant_name,
+                           SUM(si.qty) as total_qty, SUM(si.subtotal) as total_revenue
+                    FROM sale_items si JOIN sales s ON si.sale_id = s.id
+                    WHERE {sales_filter} AND si.variant_id IS NOT NULL
+                    GROUP BY si.product_id, si.variant_id
+                    ORDER BY total_qty DESC
+                    LIMIT 10
+                """, params).fetchall()
+            finally:
+                conn.rollback()
+
+        return {
+            'max_sale_id': max_sale_id,
+            **dict(totals),
+            **dict(items),
+            'payment_methods': [dict(row) for row in payment_methods],
+            'top_products': [dict(row) for row in top_products],
+        }
+
+    @spans_archives
+    def get_transactions_page(self, start_date: str, end_date: str, max_sale_id: int,
+                              after_id: int = 0, limit: int = 500) -> List[Tuple]:
+        """
+        Get one page of transactions with id in (after_id, max_sale_id].
+
+        Keyset pagination keeps each query short, so no read lock is held
+        between pages while a long report is rendered.
+        Rows are (sale_id, sale_date, cashier, payments, transaction_codes, total).
+        """
+        with self.get_connection() as conn:
+            query = """
+                SELECT s.id, s.created_at, u.username,
+                       (SELECT GROUP_CONCAT(sp.method || ': ' || sp.amount, ', ')
+                        FROM sale_payments sp WHERE sp.sale_id = s.id),
+                       (SELECT GROUP_CONCAT(sp.transaction_reference, ', ')
+                        FROM sale_payments sp WHERE sp.sale_id = s.id AND sp.method != 'Cash'),
+                       s.total
+                FROM sales s
+                LEFT JOIN shifts sh ON s.shift_id = sh.id
+                LEFT JOIN users u ON sh.user_id = u.id
+                WHERE s.created_at >= ? AND s.created_at < ? AND s.id > ? AND s.id <= ?
+                ORDER BY s.id
+                LIMIT ?
+            """
+            params = self._export_range(start_date, end_date) + (after_id, max_sale_id, limit)
+            return [tuple(row) for row in conn.execute(query, params).fetchall()]
+
+    # Forecasting
+    def get_daily_variant_demand(self, start_date: str, end_date: str) -> List[Tuple[int, str, int]]:
+        """
+        Get (variant_id, day, qty) rows of units sold per variant per day.
+
+        Days already rolled up come from sales_daily_variant_rollup, so
+        archived years count without attaching their archives.
+        """
+        with self.get_connection() as conn:
+            rolled_through = self._sales_rollup_through(conn) or ''
+            rows = []
+            if rolled_through >= start_date:
+                rows += conn.execute("""
+                    SELECT variant_id, day, qty FROM sales_daily_variant_rollup
+                    WHERE variant_id != 0 AND day BETWEEN ? AND ?
+                """, (start_date, min(end_date, rolled_through))).fetchall()
+            query = """
+                SELECT si.variant_id, DATE(s.created_at) as day, SUM(si.qty) as qty
+                FROM sale_items si
+                JOIN sales s ON si.sale_id = s.id
+                WHERE si.variant_id IS NOT NULL AND DATE(s.created_at) BETWEEN ? AND ?
+                GROUP BY si.variant_id, day
+            """
+            if end_date > rolled_through:
+                rows += conn.execute(query, (max(start_date, self._next_day(rolled_through)), end_date)).fetchall()
+            return [tuple(row) for row in rows]
+
+    # Sales Rollups
+    @staticmethod
+    def _next_day(day: str) -> str:
+        if not day:
+            return ''
+        return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    @staticmethod
+    def _sales_rollup_through(conn) -> Optional[str]:
+        try:
+            row = conn.execute("SELECT value FROM settings WHERE key = 'sales_rollup_through'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+
+    def refresh_sales_rollups(self, through_day: str = None) -> int:
+        """
+        Summarise closed days of sales into the daily rollup tables.
+
+        Days after the last one rolled up, through through_day (default
+        yesterday in UTC, the last day no sale can still fall on), are read
+        from the hot tables. The rollups of archived years were made before
+        they were moved and are never rebuilt.
+
+        Returns:
+            int: Number of days with sales that were rolled up
+        """
+        through_day = through_day or (utc_now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        with self.get_connection() as conn:
+            start_day = self._next_day(self._sales_rollup_through(conn)) or '0000-01-01'
+            if start_day > through_day:
+                return 0
+            bounds = (start_day, self._next_day(through_day))
+            conn.execute("""
+                INSERT OR REPLACE INTO sales_daily_variant_rollup (day, variant_id, qty, revenue, cost)
+                SELECT DATE(s.created_at), COALESCE(si.variant_id, 0), SUM(si.qty), SUM(si.subtotal),
+                       SUM(si.qty * COALESCE(si.unit_cost, 0))
+                FROM sale_items si JOIN sales s ON si.sale_id = s.id
+                WHERE s.created_at >= ? AND s.created_at < ?
+                GROUP BY DATE(s.created_at), COALESCE(si.variant_id, 0)
+            """, bounds)
+            days = conn.execute("""
+                INSERT OR REPLACE INTO sales_daily_rollup
+                    (day, num_sales, total_sales, total_tax, total_discounts, items_sold, cost)
+                SELECT d.day, d.num_sales, d.total_sales, d.total_tax, d.total_discounts,
+                       COALESCE(v.qty, 0), COALESCE(v.cost, 0)
+                FROM (
+                    SELECT DATE(created_at) as day, COUNT(*) as num_sales, COALESCE(SUM(total), 0) as total_sales,
+                           COALESCE(SUM(tax_amount), 0) as total_tax, COALESCE(SUM(discount_amount), 0) as total_discounts
+                    FROM sales WHERE created_at >= ? AND created_at < ?
+                    GROUP BY DATE(created_at)
+                ) d
+                LEFT JOIN (
+                    SELECT day, SUM(qty) as qty, SUM(cost) as cost FROM sales_daily_variant_rollup
+                    WHERE day >= ? AND day < ? GROUP BY day
+                ) v ON v.day = d.day
+            """, bounds + bounds).rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES ('sales_rollup_through', ?, ?)",
+                (through_day, datetime.now())
+            )
+            conn.commit()
+            return days
+
+    def get_sales_rollup(self, start_date: str, end_date: str) -> List[Dict]:
+        """Rolled-up daily totals in an inclusive date range, including archived years"""
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM sales_daily_rollup WHERE day BETWEEN ? AND ? ORDER BY day", (start_date, end_date)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    def get_sales_years(self) -> List[Dict]:
+        """Years that still have sales in the main database, with their sale count, total and id range"""
+        with self.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT CAST(SUBSTR(created_at, 1, 4) AS INTEGER) as year, COUNT(*) as sales,
+                       COALESCE(SUM(total), 0) as total, MIN(id) as first_sale_id, MAX(id) as last_sale_id
+                FROM sales GROUP BY SUBSTR(created_at, 1, 4) ORDER BY year
+            """).fetchall()
+            return [dict(row) for row in rows]
+
+    def get_forecast_states(self) -> Dict[int, Dict]:
+        """Get stored smoothing state for every forecasted variant, keyed by variant ID"""
+        with self.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT f.variant_id, f.simple_level, f.seasonal_level, f.seasonal_factors
+                FROM variant_forecasts f
+                JOIN variants v ON f.variant_id = v.id
+            """).fetchall()
+            states = {}
+            for row in rows:
+                state = dict(row)
+                state['seasonal_factors'] = json.loads(state['seasonal_factors']) if state['seasonal_factors'] else None
+                states[row['variant_id']] = state
+            return states
+
+    def save_forecasts(self, forecasts: List[Dict], last_date: str):
+        """Persist forecast rows and the last folded-in day in one transaction"""
+        now = datetime.now()
+        with self.get_connection() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO variant_forecasts
+                    (variant_id, simple_level, seasonal_level, seasonal_factors, forecast_daily, forecast_week, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (f['variant_id'], f['simple_level'], f['seasonal_level'], json.dumps(f['seasonal_factors']),
+                     f['forecast_daily'], f['forecast_week'], now)
+                    for f in forecasts
+                ]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, ?)",
+                ('forecast_last_date', last_date, now)
+            )
+            conn.commit()
+
+    # Stock Ledger
+    def _record_stock_movements(self, conn: sqlite3.Connection, movements: List[Tuple]):
+        """
+        Append movements to the stock ledger on the caller's connection.
+
+        Each movement is (variant_id, movement_type, quantity, reference_id, note).
+        The caller owns the transaction, so ledger rows commit with the stock change.
+        """
+        if movements:
+            conn.executemany(
+                "INSERT INTO stock_movements (variant_id, movement_type, quantity, reference_id, note) VALUES (?, ?, ?, ?, ?)",
+                movements
+            )
+
+    def create_stock_snapshot(self) -> str:
+        """Snapshot current stock for every variant and return the snapshot timestamp"""
+        with self.get_connection() as conn:
+            snapshot_at = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO stock_snapshots (snapshot_at, variant_id, stock_quantity, last_movement_id)
+                SELECT ?, id, COALESCE(stock_quantity, 0), (SELECT COALESCE(MAX(id), 0) FROM stock_movements)
+                FROM variants
+                """,
+                (snapshot_at,)
+            )
+            conn.commit()
+            return snapshot_at
+
+    def maybe_create_stock_snapshot(self, interval_hours: int = 24) -> Optional[str]:
+        """Create a stock snapshot if the latest one is older than the interval"""
+        with self.get_connection() as conn:
+            due = conn.execute(
+                "SELECT MAX(snapshot_at) IS NULL OR MAX(snapshot_at) <= DATETIME('now', ?) FROM stock_snapshots",
+                (f"-{interval_hours} hours",)
+            ).fetchone()[0]
+        return self.create_stock_snapshot() if due else None
+
+    def get_stock_as_of(self, as_of: str, variant_id: int = None) -> Dict[int, int]:
+        """
+        Get stock levels at a point in time, keyed by variant ID.
+
+        Starts from the nearest snapshot and applies only the ledger rows between
+        it and the requested time. A bare date means the end of that day.
+        """
+        if len(as_of) == 10:
+            as_of += " 23:59:59"
+        variant_filter = " AND variant_id = ?" if variant_id else ""
+        variant_params = [variant_id] if variant_id else []
+
+        with self.get_connection() as conn:
+            before = conn.execute(
+                "SELECT MAX(snapshot_at) FROM stock_snapshots WHERE snapshot_at <= ?", (as_of,)
+            ).fetchone()[0]
+            after = None
+            if not before:
+                after = conn.execute(
+                    "SELECT MIN(snapshot_at) FROM stock_snapshots WHERE snapshot_at > ?", (as_of,)
+                ).fetchone()[0]
+
+            if before or after:
+                snapshot_at = before or after
+                levels = dict(conn.execute(
+                    f"SELECT variant_id, stock_quantity FROM stock_snapshots WHERE snapshot_at = ?{variant_filter}",
+                    [snapshot_at] + variant_params
+                ).fetchall())
+                last_movement_id = conn.execute(
+                    "SELECT MAX(last_movement_id) FROM stock_snapshots WHERE snapshot_at = ?", (snapshot_at,)
+                ).fetchone()[0]
+            else:
+                # No snapshots yet: walk back from the live stock level
+                levels = dict(conn.execute(
+                    f"SELECT id, COALESCE(stock_quantity, 0) FROM variants{' WHERE id = ?' if variant_id else ''}",
+                    variant_params
+                ).fetchall())
+                last_movement_id = None
+
+            if before:
+                # Roll forward over movements after the snapshot
+                tail_query = f"""
+                    SELECT variant_id, SUM(quantity) FROM stock_movements
+                    WHERE id > ? AND created_at <= ?{variant_filter}
+                    GROUP BY variant_id
+                """
+                tail_params, sign = [last_movement_id, as_of] + variant_params, 1
+            elif after:
+                # Roll back over movements between the requested time and the snapshot
+                tail_query = f"""
+                    SELECT variant_id, SUM(quantity) FROM stock_movements
+                    WHERE id <= ? AND created_at > ?{variant_filter}
+                    GROUP BY variant_id
+                """
+                tail_params, sign = [last_movement_id, as_of] + variant_params, -1
+            else:
+                tail_query = f"""
+                    SELECT variant_id, SUM(quantity) FROM stock_movements
+                    WHERE created_at > ?{variant_filter}
+                    GROUP BY variant_id
+                """
+                tail_params, sign = [as_of] + variant_params, -1
+
+            for movement_variant_id, quantity in conn.execute(tail_query, tail_params).fetchall():
+                levels[movement_variant_id] = levels.get(movement_variant_id, 0) + sign * quantity
+            return levels
+
+    def get_stock_movements(self, start_date: str, end_date: str, variant_id: int = None) -> List[Dict]:
+        """Get ledger rows in a date range, newest first"""
+        with self.get_connection() as conn:
+            query = """
+                SELECT
+                    sm.id, sm.created_at, sm.variant_id, sm.movement_type, sm.quantity, sm.reference_id, sm.note,
+                    p.name as product_name, v.name as variant_name
+                FROM stock_movements sm
+                LEFT JOIN variants v ON sm.variant_id = v.id
+                LEFT JOIN products p ON v.product_id = p.id
+                WHERE sm.created_at BETWEEN ? AND ?
+            """
+            params = [f"{start_date} 00:00:00", f"{end_date} 23:59:59"]
+            if variant_id:
+                query += " AND sm.variant_id = ?"
+                params.append(variant_id)
+            query += " ORDER BY sm.id DESC"
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def get_stock_movement_summary(self, start_date: str, end_date: str) -> List[Dict]:
+        """Get opening stock, movements by type and closing stock per variant for a date range"""
+        opening_as_of = (datetime.strptime(start_date, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+        opening = self.get_stock_as_of(opening_as_of)
+        closing = self.get_stock_as_of(end_date)
+
+        with self.get_connection() as conn:
+            movement_rows = conn.execute(
+                """
+                SELECT variant_id, movement_type, SUM(quantity) as quantity
+                FROM stock_movements
+                WHERE created_at BETWEEN ? AND ?
+                GROUP BY variant_id, movement_type
+                """,
+                (f"{start_date} 00:00:00", f"{end_date} 23:59:59")
+            ).fetchall()
+            names = {
+                row['id']: row for row in conn.execute(
+                    "SELECT v.id, p.name as product_name, v.name as variant_name FROM variants v JOIN products p ON v.product_id = p.id"
+                ).fetchall()
+            }
+
+        movements = {}
+        for row in movement_rows:
+            movements.setdefault(row['variant_id'], {})[row['movement_type']] = row['quantity']
+
+        summary = []
+        for variant_id in sorted(set(opening) | set(closing) | set(movements)):
+            by_type = movements.get(variant_id, {})
+            if not by_type and opening.get(variant_id, 0) == closing.get(variant_id, 0) == 0:
+                continue
+            name_row = names.get(variant_id)
+            summary.append({
+                'variant_id': variant_id,
+                'product_name': name_row['product_name'] if name_row else '(deleted)',
+                'variant_name': name_row['variant_name'] if name_row else '',
+                'opening': opening.get(variant_id, 0),
+                'received': by_type.get('receive', 0),
+                'sold': -by_type.get('sale', 0),
+                'returned': by_type.get('return', 0),
+                'adjusted': by_type.get('adjustment', 0) + by_type.get('edit', 0),
+                'closing': closing.get(variant_id, 0),
+            })
+        return summary
+
+    # Stocktake
+    def get_variant_lookup(self) -> List[Dict]:
+        """Get every variant with the fields needed to resolve scans in memory"""
+        with self.get_connection() as conn:
+            query = """
+                SELECT
+                    v.id as variant_id, v.barcode, v.name as variant_name, v.stock_quantity, v.purchase_price,
+                    p.name as product_name
+                FROM variants v
+                JOIN products p ON v.product_id = p.id
+            """
+            return [dict(row) for row in conn.execute(query).fetchall()]
+
+    def apply_stocktake(self, counts: Dict[int, int], note: str = "Stocktake") -> int:
+        """
+        Set counted stock levels and record the differences as adjustments.
+
+        All counts are loaded with executemany into a temporary table and applied
+        with set-based statements in one transaction.
+
+        Returns:
+            int: Number of variants whose stock changed
+        """
+        with self.get_connection() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS stocktake_counts (variant_id INTEGER PRIMARY KEY, counted INTEGER NOT NULL)")
+            conn.execute("DELETE FROM stocktake_counts")
+            conn.executemany("INSERT INTO stocktake_counts (variant_id, counted) VALUES (?, ?)", counts.items())
+
+            cursor = conn.execute(
+                """
+                INSERT INTO stock_movements (variant_id, movement_type, quantity, note)
+                SELECT v.id, 'adjustment', sc.counted - COALESCE(v.stock_quantity, 0), ?
+                FROM stocktake_counts sc
+                JOIN variants v ON sc.variant_id = v.id
+                WHERE sc.counted != COALESCE(v.stock_quantity, 0)
+                """,
+                (note,)
+            )
+            changed = cursor.rowcount
+            conn.execute(
+                """
+                UPDATE variants
+                SET stock_quantity = (SELECT counted FROM stocktake_counts WHERE variant_id = variants.id)
+                WHERE id IN (SELECT variant_id FROM stocktake_counts)
+                """
+            )
+            conn.execute("DROP TABLE stocktake_counts")
+            conn.commit()
+            return changed
+
+    # Goods Received
+    def post_goods_receipt(self, supplier_id: Optional[int], lines: List[Dict], reference: str = None,
+                           user_id: int = None, notes: str = None) -> int:
+        """
+        Receive a supplier delivery in a single transaction.
+
+        Args:
+            supplier_id: ID of the delivering supplier
+            lines: Dicts with variant_id, qty and optional unit_cost
+            reference: Supplier delivery note or invoice number
+            user_id: ID of the user posting the receipt
+            notes: Free-text notes
+
+        Returns:
+            int: The ID of the new goods receipt
+        """
+        total_cost = sum(line['qty'] * float(line.get('unit_cost') or 0) for line in lines)
+        with self.get_connection() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO goods_receipts (supplier_id, reference, user_id, line_count, total_cost, notes)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (supplier_id, reference, user_id, len(lines), total_cost, notes)
+            )
+            receipt_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO goods_receipt_items (receipt_id, variant_id, qty, unit_cost) VALUES (?, ?, ?, ?)",
+                [(receipt_id, line['variant_id'], line['qty'], line.get('unit_cost')) for line in lines]
+            )
+            # A missing unit cost keeps the variant's current purchase price
+            conn.executemany(
+                """
+                UPDATE variants
+                SET stock_quantity = COALESCE(stock_quantity, 0) + ?, purchase_price = COALESCE(?, purchase_price)
+                WHERE id = ?
+                """,
+                [(line['qty'], line.get('unit_cost'), line['variant_id']) for line in lines]
+            )
+            self._record_stock_movements(
+                conn, [(line['variant_id'], 'receive', line['qty'], receipt_id, reference) for line in lines]
+            )
+            conn.commit()
+            return receipt_id
+
+    def get_goods_receipts(self, start_date: str, end_date: str) -> List[Dict]:
+        """Get goods receipts in a date range, newest first"""
+        with self.get_connection() as conn:
+            query = """
+                SELECT gr.*, s.name as supplier_name, u.username as received_by
+                FROM goods_receipts gr
+                LEFT JOIN suppliers s ON gr.supplier_id = s.id
+                LEFT JOIN users u ON gr.user_id = u.id
+                WHERE DATE(gr.created_at) BETWEEN ? AND ?
+                ORDER BY gr.id DESC
+            """
+            return [dict(row) for row in conn.execute(query, (start_date, end_date)).fetchall()]
+
+    def get_goods_receipt_items(self, receipt_id: int) -> List[Dict]:
+        """Get the lines of a goods receipt"""
+        with self.get_connection() as conn:
+            query = """
+                SELECT gri.*, p.name as product_name, v.name as variant_name, v.barcode
+                FROM goods_receipt_items gri
+                LEFT JOIN variants v ON gri.variant_id = v.id
+                LEFT JOIN products p ON v.product_id = p.id
+                WHERE gri.receipt_id = ?
+                ORDER BY gri.id
+            """
+            return [dict(row) for row in conn.execute(query, (receipt_id,)).fetchall()]
+
+    # Performance Metrics
+    def merge_perf_metrics(self, rows: List[Dict]):
+        """Add hourly metric aggregates to the stored ones, in one transaction"""
+        with self.get_connection() as conn:
+            for row in rows:
+                stored = conn.execute(
+                    "SELECT count, total_ms, max_ms, histogram FROM perf_metrics WHERE metric = ? AND hour = ?",
+                    (row['metric'], row['hour'])
+                ).fetchone()
+                count, total_ms, max_ms, histogram = row['count'], row['total_ms'], row['max_ms'], row['histogram']
+                if stored:
+                    stored_histogram = json.loads(stored['histogram'])
+                    stored_histogram += [0] * (len(histogram) - len(stored_histogram))
+                    histogram = [a + b for a, b in zip(stored_histogram, histogram)]
+                    count += stored['count']
+                    total_ms += stored['total_ms']
+                    max_ms = max(max_ms, stored['max_ms'])
+                conn.execute(
+                    "INSERT OR REPLACE INTO perf_metrics (metric, hour, count, total_ms, max_ms, histogram) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (row['metric'], row['hour'], count, total_ms, max_ms, json.dumps(histogram))
+                )
+            conn.commit()
+
+    def get_perf_metrics(self, metric: str, since_hour: str) -> List[Dict]:
+        """Stored hourly aggregates for a metric from since_hour on, oldest first"""
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM perf_metrics WHERE metric = ? AND hour >= ? ORDER BY hour",
+                (metric, since_hour)
+            ).fetchall()
+            return [dict(row, histogram=json.loads(row['histogram'])) for row in rows]
+
+    def delete_perf_metrics_before(self, hour: str):
+        with self.get_connection() as conn:
+            conn.execute("DELETE FROM perf_metrics WHERE hour < ?", (hour,))
+            conn.commit()
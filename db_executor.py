@@ -0,0 +1,289 @@
+"""
+Database executor.
+
+POSDatabase methods are plain blocking calls. DatabaseExecutor runs them off
+the GUI thread: writes go to a single writer thread that owns the one
+read-write connection, and reads go to a small pool of threads with
+read-only connections. Both return a concurrent.futures.Future, and then()
+hands the result (or the exception) back to a callback on the GUI thread:
+
+    future = executor.read(db.get_report_snapshot, start, end)
+    executor.then(future, self.show_snapshot, self.show_error)
+
+The writer takes everything queued when it wakes up, up to
+DB_EXECUTOR_CONFIG['max_write_batch'] jobs, and commits it as one
+transaction with each job in its own savepoint. A burst of edits costs one
+commit, and a job that fails is rolled back without losing the others.
+Futures resolve only after the commit. The database is switched to WAL so
+readers and the writer do not wait for each other. exclusive() runs a job on
+the writer thread outside any batch, for work that manages its own
+transactions or cannot run inside one (archiving, ATTACH, VACUUM).
+
+While a job runs, get_connection() on its thread returns the thread's
+pinned connection, so existing `with self.get_connection() as conn: ...
+conn.commit()` methods run unchanged: on the writer, commit() and close()
+leave the transaction to the executor.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from urllib.request import pathname2url
+
+from PySide6.QtCore import QObject, Qt, Signal
+
+from config import DB_EXECUTOR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class PinnedConnection:
+    """Connection owned by an executor thread; the executor, not the job, ends its transactions"""
+
+    def __init__(self, conn: sqlite3.Connection, writer: bool):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_writer', writer)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._writer:
+            return self._conn.__exit__(exc_type, exc_value, traceback)
+        return False  # The job's savepoint is released or rolled back by the writer
+
+    def commit(self):
+        if not self._writer:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._writer:
+            self._conn.execute("ROLLBACK TO SAVEPOINT job")
+        else:
+            self._conn.rollback()
+
+    def close(self):
+        pass
+
+
+class _Relay(QObject):
+    """Lives on the GUI thread; calls queued to it from worker threads run there"""
+
+    call = Signal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.call.connect(self._run, Qt.QueuedConnection)
+
+    def _run(self, callback):
+        callback()
+
+
+class DatabaseExecutor:
+    """One writer thread and a pool of read-only connections for a POSDatabase; create it on the GUI thread"""
+
+    def __init__(self, db, read_threads: int = None, max_write_batch: int = None):
+        self.db = db
+        self.max_write_batch = max_write_batch or DB_EXECUTOR_CONFIG['max_write_batch']
+        self._relay = _Relay()
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._closed = False
+        self._reader_connections = []
+
+        self._writes = queue.SimpleQueue()
+        self._writer_ready = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name='db-writer', daemon=True)
+        self._writer.start()
+        self._writer_ready.wait()  # WAL must be on before the readers open
+        self._readers = ThreadPoolExecutor(
+            max_workers=read_threads or DB_EXECUTOR_CONFIG['read_threads'],
+            thread_name_prefix='db-reader',
+            initializer=self._open_reader,
+        )
+
+    def read(self, fn: Callable, *args, **kwargs) -> Future:
+        """Run fn on a read-only connection; fn must not write"""
+        future = self._readers.submit(fn, *args, **kwargs)
+        self._track(future)
+        return future
+
+    def write(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn for the writer thread; the future resolves once its transaction has committed"""
+        if self._closed or not self._writer.is_alive():
+            raise RuntimeError("Database writer is not running")
+        future = Future()
+        self._track(future)
+        self._writes.put((future, fn, args, kwargs, False))
+        return future
+
+    def exclusive(self, fn: Callable, *args, **kwargs) -> Future:
+        """Run fn alone on the writer thread, outside a transaction; get_connection() opens its own connections"""
+        if self._closed or not self._writer.is_alive():
+            raise RuntimeError("Database writer is not running")
+        future = Future()
+        self._track(future)
+        self._writes.put((future, fn, args, kwargs, True))
+        return future
+
+    def then(self, future: Future, on_result: Callable, on_error: Optional[Callable] = None):
+        """Call on_result(result), or on_error(exception), on the GUI thread once future is done"""
+        with self._lock:
+            self._outstanding += 1
+
+        def deliver():
+            try:
+                if future.cancelled():
+                    return
+                error = future.exception()
+                if error is None:
+                    on_result(future.result())
+                elif on_error is not None:
+                    on_error(error)
+                else:
+                    logger.error("Database job failed", exc_info=error)
+            finally:
+                with self._lock:
+                    self._outstanding -= 1
+
+        future.add_done_callback(lambda _: self._relay.call.emit(deliver))
+
+    def busy(self) -> int:
+        """Jobs and callbacks not finished yet"""
+        with self._lock:
+            return self._outstanding
+
+    def shutdown(self):
+        """Finish queued writes and reads, then close every connection; safe to call twice"""
+        if self._closed:
+            return
+        self._closed = True
+        self._writes.put(_STOP)
+        self._writer.join()
+        self._readers.shutdown(wait=True)
+        for conn in self._reader_connections:
+            conn.close()
+        self._reader_connections.clear()
+
+    def _track(self, future: Future):
+        with self._lock:
+            self._outstanding += 1
+
+        def finished(_):
+            with self._lock:
+                self._outstanding -= 1
+        future.add_done_callback(finished)
+
+    def _open_reader(self):
+        if self.db.in_memory:
+            # A shared-cache database cannot be opened read-only, and its table locks fail
+            # at once instead of waiting; readers skip them and may see uncommitted writes
+            conn = self.db._connect(check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            conn.execute("PRAGMA read_uncommitted = ON")
+        else:
+            uri = f"file:{pathname2url(os.path.abspath(self.db.db_path))}?mode=ro"
+            conn = self.db._connect(uri, uri=True, check_same_thread=False)
+        with self._lock:
+            self._reader_connections.append(conn)
+        self.db.pin_connection(PinnedConnection(conn, writer=False))
+
+    def _write_loop(self):
+        try:
+            conn = self.db._connect(isolation_level=None)
+            if DB_EXECUTOR_CONFIG['wal'] and not self.db.in_memory:
+                conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+        finally:
+            self._writer_ready.set()
+        pinned = PinnedConnection(conn, writer=True)
+        self.db.pin_connection(pinned)
+        try:
+            stop = False
+            while not stop:
+                batch = []
+                job = self._writes.get()
+                while True:
+                    if job is _STOP:
+                        stop = True
+                        break
+                    if job[-1]:  # Exclusive: commit what is queued ahead of it, then run it alone
+                        if batch:
+                            self._run_batch(conn, batch)
+                            batch = []
+                        self.db.pin_connection(None)
+                        try:
+                            self._run_exclusive(job)
+                        finally:
+                            self.db.pin_connection(pinned)
+                    else:
+                        batch.append(job)
+                        if len(batch) >= self.max_write_batch:
+                            break
+                    try:
+                        job = self._writes.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._run_batch(conn, batch)
+        finally:
+            self.db.pin_connection(None)
+            conn.close()
+
+    def _run_batch(self, conn: sqlite3.Connection, batch: list):
+        """Run queued writes in one transaction, each in a savepoint; resolve their futures after COMMIT"""
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, fn, args, kwargs, _ in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO SAVEPOINT job")
+                    conn.execute("RELEASE SAVEPOINT job")
+                    future.set_exception(e)
+                else:
+                    conn.execute("RELEASE SAVEPOINT job")
+                    results.append((future, result))
+            conn.execute("COMMIT")
+        except Exception as e:
+            # The transaction as a whole failed (locked, disk full...); nothing in the batch was written
+            logger.error(f"Write batch of {len(batch)} failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for future, *_ in batch:
+                if not future.done():
+                    if future.running() or future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+            return
+        if len(batch) > 1:
+            logger.debug(f"Committed {len(batch)} queued writes in one transaction")
+        for future, result in results:
+            future.set_result(result)
+
+    @staticmethod
+    def _run_exclusive(job: tuple):
+        future, fn, args, kwargs, _ = job
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
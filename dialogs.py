@@ -1,9 +1,10 @@
 import os
+import time
 from PySide6.QtWidgets import *
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtPrintSupport import QPrinterInfo, QPrinter, QPrintDialog
-from db import POSDatabase
+from db import POSDatabase, utc_now
 from decimal import Decimal, InvalidOperation
 
 class BaseDialog(QDialog):
@@ -131,6 +132,720 @@ class TransactionItemsDialog(BaseDialog):
             self.table.setItem(i, 3, QTableWidgetItem(f"{self.parent().currency_symbol}{vat_amount:.2f}"))
             self.table.setItem(i, 4, QTableWidgetItem(f"{self.parent().currency_symbol}{gross_price:.2f}"))
 
+class StockMovementsDialog(BaseDialog):
+    def __init__(self, db: POSDatabase, start_date: str, end_date: str, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.start_date = start_date
+        self.end_date = end_date
+        self.setWindowTitle(f"Stock Movements {start_date} to {end_date}")
+        self.setMinimumSize(800, 500)
+
+        layout = QVBoxLayout(self)
+        tabs = QTabWidget()
+        layout.addWidget(tabs)
+
+        self.summary_table = QTableWidget()
+        self.summary_table.setColumnCount(7)
+        self.summary_table.setHorizontalHeaderLabels(["Product", "Opening", "Received", "Sold", "Returned", "Adjusted", "Closing"])
+        tabs.addTab(self.summary_table, "Summary")
+
+        self.ledger_table = QTableWidget()
+        self.ledger_table.setColumnCount(5)
+        self.ledger_table.setHorizontalHeaderLabels(["Date", "Product", "Type", "Quantity", "Reference"])
+        tabs.addTab(self.ledger_table, "Ledger")
+
+        self.load_data()
+
+    def load_data(self):
+        summary = self.db.get_stock_movement_summary(self.start_date, self.end_date)
+        self.summary_table.setRowCount(len(summary))
+        for i, row in enumerate(summary):
+            self.summary_table.setItem(i, 0, QTableWidgetItem(f"{row['product_name']} ({row['variant_name']})"))
+            for col, key in enumerate(['opening', 'received', 'sold', 'returned', 'adjusted', 'closing'], start=1):
+                self.summary_table.setItem(i, col, QTableWidgetItem(str(row[key])))
+
+        movements = self.db.get_stock_movements(self.start_date, self.end_date)
+        self.ledger_table.setRowCount(len(movements))
+        for i, movement in enumerate(movements):
+            reference = movement['note'] or ''
+            if movement['reference_id']:
+                prefix = "Sale" if movement['movement_type'] == 'sale' else "Receipt"
+                reference = f"{prefix} #{movement['reference_id']}" + (f" ({reference})" if reference else '')
+            self.ledger_table.setItem(i, 0, QTableWidgetItem(movement['created_at']))
+            self.ledger_table.setItem(i, 1, QTableWidgetItem(f"{movement['product_name'] or '(deleted)'} ({movement['variant_name'] or ''})"))
+            self.ledger_table.setItem(i, 2, QTableWidgetItem(movement['movement_type'].title()))
+            self.ledger_table.setItem(i, 3, QTableWidgetItem(str(movement['quantity'])))
+            self.ledger_table.setItem(i, 4, QTableWidgetItem(reference))
+
+class StocktakeDialog(BaseDialog):
+    RECENT_SCANS_LIMIT = 50
+
+    def __init__(self, db: POSDatabase, parent=None):
+        super().__init__(parent)
+        from stocktake import StocktakeSession
+        from config import STOCKTAKE_CONFIG
+        self.db = db
+        self.setWindowTitle("Stocktake")
+        self.setMinimumSize(800, 600)
+
+        resume = False
+        if StocktakeSession.has_pending_journal():
+            reply = QMessageBox.question(self, "Resume Stocktake",
+                                         "An unfinished stocktake was found. Do you want to resume it?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            resume = reply == QMessageBox.Yes
+        self.session = StocktakeSession(db)
+        self.session.start(resume=resume)
+
+        self.init_ui()
+        self.update_counters()
+
+        # Flush the journal even when scanning pauses
+        self.checkpoint_timer = QTimer(self)
+        self.checkpoint_timer.timeout.connect(self.session.checkpoint)
+        self.checkpoint_timer.start(STOCKTAKE_CONFIG['flush_interval_ms'])
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.counters_label = QLabel()
+        layout.addWidget(self.counters_label)
+
+        scan_layout = QHBoxLayout()
+        self.barcode_input = QLineEdit()
+        self.barcode_input.setPlaceholderText("Scan barcode...")
+        self.barcode_input.returnPressed.connect(self.handle_scan)
+        self.qty_input = QSpinBox()
+        self.qty_input.setRange(1, 9999)
+        scan_layout.addWidget(self.barcode_input)
+        scan_layout.addWidget(QLabel("Qty:"))
+        scan_layout.addWidget(self.qty_input)
+        layout.addLayout(scan_layout)
+
+        self.last_scan_label = QLabel("")
+        layout.addWidget(self.last_scan_label)
+
+        self.recent_scans = QListWidget()
+        self.recent_scans.setMaximumHeight(150)
+        layout.addWidget(self.recent_scans)
+
+        self.zero_uncounted_cb = QCheckBox("Set uncounted items to zero")
+        layout.addWidget(self.zero_uncounted_cb)
+
+        self.variance_table = QTableWidget()
+        self.variance_table.setColumnCount(6)
+        self.variance_table.setHorizontalHeaderLabels(["Product", "Barcode", "Expected", "Counted", "Difference", "Cost Difference"])
+        self.variance_table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.variance_table)
+
+        button_layout = QHBoxLayout()
+        preview_btn = QPushButton("Preview Variances")
+        preview_btn.clicked.connect(self.preview_variances)
+        commit_btn = QPushButton("Commit Stocktake")
+        commit_btn.clicked.connect(self.commit_stocktake)
+        discard_btn = QPushButton("Discard")
+        discard_btn.setStyleSheet("background-color: #dc3545;")
+        discard_btn.clicked.connect(self.discard_stocktake)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        for btn in (preview_btn, commit_btn, discard_btn, close_btn):
+            # Scanner Enter keys must not trigger a default button
+            btn.setAutoDefault(False)
+        button_layout.addWidget(preview_btn)
+        button_layout.addWidget(commit_btn)
+        button_layout.addWidget(discard_btn)
+        button_layout.addStretch()
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.barcode_input.setFocus()
+
+    def handle_scan(self):
+        barcode = self.barcode_input.text().strip()
+        self.barcode_input.clear()
+        if not barcode:
+            return
+        qty = self.qty_input.value()
+        self.qty_input.setValue(1)
+
+        item = self.session.scan(barcode, qty)
+        if item:
+            text = f"{item['product_name']} ({item['variant_name']}) x{qty} - counted {self.session.counts[item['variant_id']]}"
+            self.last_scan_label.setStyleSheet("color: #28a745;")
+        else:
+            text = f"Unknown barcode: {barcode}"
+            self.last_scan_label.setStyleSheet("color: #dc3545;")
+        self.last_scan_label.setText(text)
+
+        self.recent_scans.insertItem(0, text)
+        if self.recent_scans.count() > self.RECENT_SCANS_LIMIT:
+            self.recent_scans.takeItem(self.recent_scans.count() - 1)
+        self.update_counters()
+
+    def update_counters(self):
+        self.counters_label.setText(
+            f"Scans: {self.session.scan_count} | Items counted: {len(self.session.counts)} "
+            f"of {len(self.session.items)} | Unknown barcodes: {len(self.session.unknown_barcodes)}"
+            + (f" | Deleted products skipped: {len(self.session.removed_variants)}"
+               if self.session.removed_variants else "")
+        )
+
+    def preview_variances(self):
+        variances = self.session.get_variances(self.zero_uncounted_cb.isChecked())
+        self.variance_table.setRowCount(len(variances))
+        for i, v in enumerate(variances):
+            self.variance_table.setItem(i, 0, QTableWidgetItem(f"{v['product_name']} ({v['variant_name']})"))
+            self.variance_table.setItem(i, 1, QTableWidgetItem(v['barcode'] or ''))
+            self.variance_table.setItem(i, 2, QTableWidgetItem(str(v['expected'])))
+            self.variance_table.setItem(i, 3, QTableWidgetItem(str(v['counted'])))
+            diff_item = QTableWidgetItem(f"{v['difference']:+d}")
+            diff_item.setForeground(QColor("#dc3545" if v['difference'] < 0 else "#28a745"))
+            self.variance_table.setItem(i, 4, diff_item)
+            self.variance_table.setItem(i, 5, QTableWidgetItem(f"{v['cost_difference']:.2f}"))
+
+    def commit_stocktake(self):
+        zero_uncounted = self.zero_uncounted_cb.isChecked()
+        variances = self.session.get_variances(zero_uncounted)
+        reply = QMessageBox.question(self, "Commit Stocktake",
+                                     f"Apply stock adjustments for {len(variances)} items?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        try:
+            changed = self.session.commit(zero_uncounted)
+            self.checkpoint_timer.stop()
+            QMessageBox.information(self, "Stocktake", f"Stocktake committed. {changed} items adjusted.")
+            self.accept()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to commit stocktake: {str(e)}")
+
+    def discard_stocktake(self):
+        reply = QMessageBox.question(self, "Discard Stocktake",
+                                     "Discard all counts from this stocktake?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.checkpoint_timer.stop()
+            self.session.discard()
+            self.reject()
+
+    def done(self, result):
+        # Keep the journal on close so the count can be resumed later
+        self.session.close()
+        super().done(result)
+
+class GoodsReceivedDialog(BaseDialog):
+    def __init__(self, db: POSDatabase, user: dict, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.user = user
+        self.setWindowTitle("Goods Received")
+        self.setMinimumSize(800, 600)
+
+        # Resolve scans and imports in memory instead of one query per line
+        self.items = {item['variant_id']: item for item in db.get_variant_lookup()}
+        self.barcodes = {item['barcode']: item['variant_id'] for item in self.items.values() if item['barcode']}
+        self.line_rows = {}  # variant_id -> table row
+
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        form_layout = QFormLayout()
+        self.supplier_combo = QComboBox()
+        self.supplier_combo.addItem("Select Supplier", None)
+        for supplier in self.db.get_all_suppliers():
+            self.supplier_combo.addItem(supplier['name'], supplier['id'])
+        self.reference_input = QLineEdit()
+        self.reference_input.setPlaceholderText("Delivery note / invoice number")
+        form_layout.addRow("Supplier:", self.supplier_combo)
+        form_layout.addRow("Reference:", self.reference_input)
+        layout.addLayout(form_layout)
+
+        scan_layout = QHBoxLayout()
+        self.barcode_input = QLineEdit()
+        self.barcode_input.setPlaceholderText("Scan barcode...")
+        self.barcode_input.returnPressed.connect(self.handle_scan)
+        import_btn = QPushButton("Import CSV")
+        import_btn.clicked.connect(self.import_csv)
+        scan_layout.addWidget(self.barcode_input)
+        scan_layout.addWidget(import_btn)
+        layout.addLayout(scan_layout)
+
+        self.lines_table = QTableWidget()
+        self.lines_table.setColumnCount(4)
+        self.lines_table.setHorizontalHeaderLabels(["Product", "Barcode", "Qty", "Unit Cost"])
+        self.lines_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.lines_table)
+
+        self.summary_label = QLabel("Lines: 0")
+        layout.addWidget(self.summary_label)
+
+        button_layout = QHBoxLayout()
+        remove_btn = QPushButton("Remove Selected")
+        remove_btn.clicked.connect(self.remove_selected_lines)
+        post_btn = QPushButton("Post Receipt")
+        post_btn.setStyleSheet("background-color: #28a745;")
+        post_btn.clicked.connect(self.post_receipt)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.reject)
+        for btn in (import_btn, remove_btn, post_btn, cancel_btn):
+            # Scanner Enter keys must not trigger a default button
+            btn.setAutoDefault(False)
+        button_layout.addWidget(remove_btn)
+        button_layout.addStretch()
+        button_layout.addWidget(post_btn)
+        button_layout.addWidget(cancel_btn)
+        layout.addLayout(button_layout)
+
+        self.barcode_input.setFocus()
+
+    def add_line(self, variant_id: int, qty: int, unit_cost=None):
+        """Add a line, or add to the quantity of an existing line for the variant"""
+        if variant_id in self.line_rows:
+            row = self.line_rows[variant_id]
+            qty_item = self.lines_table.item(row, 2)
+            qty_item.setText(str(int(qty_item.text() or 0) + qty))
+            if unit_cost is not None:
+                self.lines_table.item(row, 3).setText(f"{unit_cost:.2f}")
+            return
+
+        item = self.items[variant_id]
+        if unit_cost is None:
+            unit_cost = float(item['purchase_price'] or 0)
+        row = self.lines_table.rowCount()
+        self.lines_table.insertRow(row)
+        name_item = QTableWidgetItem(f"{item['product_name']} ({item['variant_name']})")
+        name_item.setData(Qt.UserRole, variant_id)
+        name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)
+        barcode_item = QTableWidgetItem(item['barcode'] or '')
+        barcode_item.setFlags(barcode_item.flags() & ~Qt.ItemIsEditable)
+        self.lines_table.setItem(row, 0, name_item)
+        self.lines_table.setItem(row, 1, barcode_item)
+        self.lines_table.setItem(row, 2, QTableWidgetItem(str(qty)))
+        self.lines_table.setItem(row, 3, QTableWidgetItem(f"{unit_cost:.2f}"))
+        self.line_rows[variant_id] = row
+        self.summary_label.setText(f"Lines: {self.lines_table.rowCount()}")
+
+    def handle_scan(self):
+        barcode = self.barcode_input.text().strip()
+        self.barcode_input.clear()
+        if not barcode:
+            return
+        variant_id = self.barcodes.get(barcode)
+        if variant_id is None:
+            QMessageBox.warning(self, "Unknown Barcode", f"No product found for barcode {barcode}.")
+            return
+        self.add_line(variant_id, 1)
+
+    def import_csv(self):
+        """Import lines from a CSV with barcode, qty and optional unit_cost columns"""
+        import csv
+        from config import EXPORT_CONFIG
+        filename, _ = QFileDialog.getOpenFileName(self, "Import Delivery", "", "CSV Files (*.csv)")
+        if not filename:
+            return
+
+        rejects = []
+        self.lines_table.setUpdatesEnabled(False)
+        try:
+            with open(filename, newline='', encoding=EXPORT_CONFIG['csv_encoding']) as f:
+                for line_no, row in enumerate(csv.DictReader(f, delimiter=EXPORT_CONFIG['csv_delimiter']), start=2):
+                    barcode = (row.get('barcode') or '').strip()
+                    variant_id = self.barcodes.get(barcode)
+                    try:
+                        qty = int(row.get('qty') or 0)
+                        unit_cost = float(row['unit_cost']) if (row.get('unit_cost') or '').strip() else None
+                    except ValueError:
+                        rejects.append(f"Line {line_no}: invalid number")
+                        continue
+                    if variant_id is None:
+                        rejects.append(f"Line {line_no}: unknown barcode {barcode}")
+                    elif qty <= 0:
+                        rejects.append(f"Line {line_no}: quantity must be positive")
+                    else:
+                        self.add_line(variant_id, qty, unit_cost)
+        except (OSError, csv.Error) as e:
+            QMessageBox.critical(self, "Import Error", f"Could not read file: {str(e)}")
+        finally:
+            self.lines_table.setUpdatesEnabled(True)
+
+        if rejects:
+            QMessageBox.warning(self, "Import", f"{len(rejects)} lines rejected:\n" + "\n".join(rejects[:20]))
+
+    def remove_selected_lines(self):
+        rows = sorted({index.row() for index in self.lines_table.selectedIndexes()}, reverse=True)
+        for row in rows:
+            self.lines_table.removeRow(row)
+        self.line_rows = {
+            self.lines_table.item(row, 0).data(Qt.UserRole): row for row in range(self.lines_table.rowCount())
+        }
+        self.summary_label.setText(f"Lines: {self.lines_table.rowCount()}")
+
+    def post_receipt(self):
+        if self.lines_table.rowCount() == 0:
+            QMessageBox.warning(self, "Validation Error", "Add at least one line to receive.")
+            return
+
+        lines = []
+        for row in range(self.lines_table.rowCount()):
+            try:
+                qty = int(self.lines_table.item(row, 2).text())
+                unit_cost = float(self.lines_table.item(row, 3).text())
+                if qty <= 0 or unit_cost < 0:
+                    raise ValueError("Invalid quantity or cost")
+            except (ValueError, AttributeError):
+                QMessageBox.warning(self, "Validation Error", f"Invalid quantity or unit cost in row {row + 1}")
+                return
+            lines.append({
+                'variant_id': self.lines_table.item(row, 0).data(Qt.UserRole),
+                'qty': qty,
+                'unit_cost': unit_cost
+            })
+
+        try:
+            receipt_id = self.db.post_goods_receipt(
+                self.supplier_combo.currentData(), lines,
+                reference=self.reference_input.text().strip() or None,
+                user_id=self.user['id']
+            )
+            QMessageBox.information(self, "Goods Received", f"Receipt #{receipt_id} posted with {len(lines)} lines.")
+            self.accept()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to post receipt: {str(e)}")
+
+class DiagnosticsDialog(BaseDialog):
+    def __init__(self, db: POSDatabase, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("Diagnostics")
+        self.setMinimumSize(900, 600)
+
+        layout = QVBoxLayout(self)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        tabs = QTabWidget()
+        layout.addWidget(tabs)
+
+        self.queries_table = QTableWidget()
+        self.queries_table.setColumnCount(7)
+        self.queries_table.setHorizontalHeaderLabels(["Method", "Calls", "Total ms", "Avg ms", "p95 ms", "Max ms", "SQL"])
+        self.queries_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.queries_table.horizontalHeader().setStretchLastSection(True)
+        tabs.addTab(self.queries_table, "Queries")
+
+        slow_tab = QWidget()
+        slow_layout = QVBoxLayout(slow_tab)
+        self.slow_table = QTableWidget()
+        self.slow_table.setColumnCount(4)
+        self.slow_table.setHorizontalHeaderLabels(["Time", "Method", "ms", "SQL"])
+        self.slow_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.slow_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.slow_table.horizontalHeader().setStretchLastSection(True)
+        self.slow_table.currentCellChanged.connect(self.show_slow_query)
+        slow_layout.addWidget(self.slow_table, 2)
+        self.slow_detail = QTextEdit()
+        self.slow_detail.setReadOnly(True)
+        slow_layout.addWidget(self.slow_detail, 1)
+        tabs.addTab(slow_tab, "Slow Queries")
+
+        stalls_tab = QWidget()
+        stalls_layout = QVBoxLayout(stalls_tab)
+        stalls_layout.addWidget(QLabel("Offenders (where the GUI thread was when it stopped responding):"))
+        self.offenders_table = QTableWidget()
+        self.offenders_table.setColumnCount(6)
+        self.offenders_table.setHorizontalHeaderLabels(["Offender", "Stalls", "Total ms", "Max ms", "Last action", "Last seen"])
+        self.offenders_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.offenders_table.horizontalHeader().setStretchLastSection(True)
+        stalls_layout.addWidget(self.offenders_table, 1)
+        stalls_layout.addWidget(QLabel("Recent stalls:"))
+        self.stalls_table = QTableWidget()
+        self.stalls_table.setColumnCount(4)
+        self.stalls_table.setHorizontalHeaderLabels(["Time", "Blocked ms", "Offender", "Action"])
+        self.stalls_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.stalls_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.stalls_table.horizontalHeader().setStretchLastSection(True)
+        self.stalls_table.currentCellChanged.connect(self.show_stall)
+        stalls_layout.addWidget(self.stalls_table, 1)
+        self.stall_detail = QTextEdit()
+        self.stall_detail.setReadOnly(True)
+        stalls_layout.addWidget(self.stall_detail, 1)
+        tabs.addTab(stalls_tab, "Stalls")
+
+        from charts import BarChart
+        from metrics import METRIC_LABELS
+
+        trends_tab = QWidget()
+        trends_layout = QVBoxLayout(trends_tab)
+        trends_controls = QHBoxLayout()
+        self.metric_combo = QComboBox()
+        for metric, label in METRIC_LABELS.items():
+            self.metric_combo.addItem(label, metric)
+        self.metric_combo.currentIndexChanged.connect(self.load_trends)
+        self.trend_days = QSpinBox()
+        self.trend_days.setRange(1, 400)
+        self.trend_days.setValue(30)
+        self.trend_days.setSuffix(" days")
+        self.trend_days.valueChanged.connect(self.load_trends)
+        trends_controls.addWidget(QLabel("Metric:"))
+        trends_controls.addWidget(self.metric_combo)
+        trends_controls.addWidget(QLabel("Last:"))
+        trends_controls.addWidget(self.trend_days)
+        trends_controls.addStretch()
+        trends_layout.addLayout(trends_controls)
+        self.trend_chart = BarChart("Daily p95 (ms)", "No measurements yet", "ms")
+        trends_layout.addWidget(self.trend_chart, 1)
+        self.trends_table = QTableWidget()
+        self.trends_table.setColumnCount(6)
+        self.trends_table.setHorizontalHeaderLabels(["Day", "Count", "p50 ms", "p95 ms", "Max ms", "Avg ms"])
+        self.trends_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.trends_table.horizontalHeader().setStretchLastSection(True)
+        trends_layout.addWidget(self.trends_table, 1)
+        tabs.addTab(trends_tab, "Trends")
+
+        button_layout = QHBoxLayout()
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.load_data)
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset_stats)
+        export_button = QPushButton("Export")
+        export_button.clicked.connect(self.export_stats)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(refresh_button)
+        button_layout.addWidget(reset_button)
+        button_layout.addWidget(export_button)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+        self.load_data()
+
+    def load_data(self):
+        from query_stats import QUERY_STATS
+        from stall_watchdog import STALLS
+        from config import QUERY_STATS_CONFIG
+
+        summary = QUERY_STATS.summary()
+        self.queries_table.setRowCount(len(summary))
+        for i, row in enumerate(summary):
+            values = [row['method'], str(row['count']), f"{row['total_ms']:.1f}", f"{row['avg_ms']:.2f}",
+                      f"≤{row['p95_ms']:g}" if row['p95_ms'] != float('inf') else "> 1000", f"{row['max_ms']:.1f}", row['sql']]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col == 6:
+                    item.setToolTip(row['sql'])
+                self.queries_table.setItem(i, col, item)
+        self.queries_table.resizeColumnsToContents()
+
+        self.slow_queries = QUERY_STATS.get_slow_queries()
+        self.slow_table.setRowCount(len(self.slow_queries))
+        for i, entry in enumerate(self.slow_queries):
+            self.slow_table.setItem(i, 0, QTableWidgetItem(entry['at']))
+            self.slow_table.setItem(i, 1, QTableWidgetItem(entry['method']))
+            self.slow_table.setItem(i, 2, QTableWidgetItem(f"{entry['elapsed_ms']:.1f}"))
+            self.slow_table.setItem(i, 3, QTableWidgetItem(' '.join(entry['sql'].split())))
+        self.slow_table.resizeColumnsToContents()
+        self.slow_detail.clear()
+
+        offenders = STALLS.summary()
+        self.offenders_table.setRowCount(len(offenders))
+        for i, row in enumerate(offenders):
+            values = [row['offender'], str(row['count']), f"{row['total_ms']:.0f}", f"{row['max_ms']:.0f}",
+                      row['last_action'] or '', row['last_at']]
+            for col, value in enumerate(values):
+                self.offenders_table.setItem(i, col, QTableWidgetItem(value))
+        self.offenders_table.resizeColumnsToContents()
+
+        self.stalls = STALLS.get_recent()
+        self.stalls_table.setRowCount(len(self.stalls))
+        for i, entry in enumerate(self.stalls):
+            self.stalls_table.setItem(i, 0, QTableWidgetItem(entry['at']))
+            self.stalls_table.setItem(i, 1, QTableWidgetItem(f"{entry['blocked_ms']:.0f}"))
+            self.stalls_table.setItem(i, 2, QTableWidgetItem(entry['offender']))
+            self.stalls_table.setItem(i, 3, QTableWidgetItem(entry['action'] or ''))
+        self.stalls_table.resizeColumnsToContents()
+        self.stall_detail.clear()
+
+        self.load_trends()
+
+        total_ms = sum(row['total_ms'] for row in summary)
+        calls = sum(row['count'] for row in summary)
+        self.status_label.setText(
+            f"{calls} queries, {total_ms:.0f} ms since {QUERY_STATS.started_at:%Y-%m-%d %H:%M:%S}. "
+            f"Slow threshold: {QUERY_STATS_CONFIG['slow_query_ms']} ms. "
+            f"{len(self.stalls)} recent GUI stalls."
+        )
+
+    def load_trends(self):
+        from datetime import datetime, timedelta
+        from metrics import METRICS, daily_summary, hour_key
+
+        try:
+            METRICS.flush(self.db)  # Include the current hour
+        except Exception as e:
+            QMessageBox.warning(self, "Metrics", f"Could not save pending metrics: {str(e)}")
+        since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=self.trend_days.value() - 1)
+        days = daily_summary(self.db.get_perf_metrics(self.metric_combo.currentData(), hour_key(since)))
+
+        self.trend_chart.set_data([day['day'][5:] for day in days], [day['p95_ms'] for day in days])
+        self.trends_table.setRowCount(len(days))
+        for i, day in enumerate(reversed(days)):
+            values = [day['day'], str(day['count']), f"{day['p50_ms']:.1f}", f"{day['p95_ms']:.1f}",
+                      f"{day['max_ms']:.1f}", f"{day['avg_ms']:.1f}"]
+            for col, value in enumerate(values):
+                self.trends_table.setItem(i, col, QTableWidgetItem(value))
+        self.trends_table.resizeColumnsToContents()
+
+    def show_slow_query(self, row, column, previous_row, previous_column):
+        if row < 0 or row >= len(self.slow_queries):
+            self.slow_detail.clear()
+            return
+        entry = self.slow_queries[row]
+        plan = "\n".join(entry['plan']) if entry['plan'] else "(not available)"
+        self.slow_detail.setPlainText(
+            f"{entry['sql']}\n\nParameters: {entry['params']}\nRows: {entry['rows']}\n\nQuery plan:\n{plan}"
+        )
+
+    def show_stall(self, row, column, previous_row, previous_column):
+        if row < 0 or row >= len(self.stalls):
+            self.stall_detail.clear()
+            return
+        entry = self.stalls[row]
+        self.stall_detail.setPlainText(
+            f"Blocked {entry['blocked_ms']:.0f} ms at {entry['at']}\nAction: {entry['action'] or '(unknown)'}\n\n"
+            "Main thread stack (most recent call last):\n" + "\n".join(entry['stack'])
+        )
+
+    def reset_stats(self):
+        from query_stats import QUERY_STATS
+        from stall_watchdog import STALLS
+        QUERY_STATS.reset()
+        STALLS.reset()
+        self.load_data()
+
+    def export_stats(self):
+        from datetime import datetime
+        from query_stats import QUERY_STATS
+        from config import LOGS_DIR
+
+        default_path = os.path.join(LOGS_DIR, f"query_stats_{datetime.now():%Y%m%d_%H%M%S}.json")
+        filename, _ = QFileDialog.getSaveFileName(self, "Export Query Stats", default_path, "JSON Files (*.json)")
+        if not filename:
+            return
+        try:
+            QUERY_STATS.export(filename)
+            QMessageBox.information(self, "Export Complete", f"Query stats saved to {filename}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to export query stats: {str(e)}")
+
+class ArchiveDialog(BaseDialog):
+    """Closed years of sales, where they are stored, and a button to move one to its archive file"""
+    def __init__(self, db: POSDatabase, executor, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.executor = executor
+        self.years = []
+        self.setWindowTitle("Archive Sales")
+        self.setMinimumSize(600, 400)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(
+            "Archiving moves a closed year of sales into its own file next to the database. "
+            "Reports still include archived years; back up the archive files with the database."
+        ))
+        self.years_table = QTableWidget()
+        self.years_table.setColumnCount(4)
+        self.years_table.setHorizontalHeaderLabels(["Year", "Sales", "Revenue", "Stored in"])
+        self.years_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.years_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.years_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.years_table.horizontalHeader().setStretchLastSection(True)
+        self.years_table.itemSelectionChanged.connect(self.update_buttons)
+        layout.addWidget(self.years_table)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        button_layout = QHBoxLayout()
+        self.archive_button = QPushButton("Archive Year")
+        self.archive_button.clicked.connect(self.archive_selected)
+        self.vacuum_check = QCheckBox("Compact database afterwards")
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(self.archive_button)
+        button_layout.addWidget(self.vacuum_check)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+        self.load_data()
+
+    def load_data(self):
+        self.status_label.setText("Loading...")
+        self.archive_button.setEnabled(False)
+        future = self.executor.read(self.read_years)
+        self.executor.then(future, self.show_years, self.show_error)
+
+    def read_years(self):
+        archives = self.db.get_sales_archives()
+        for archive in archives:
+            # Archived years are totalled from the rollups kept in the main database
+            days = self.db.get_sales_rollup(f"{archive['year']}-01-01", f"{archive['year']}-12-31")
+            archive['total'] = sum(day['total_sales'] for day in days)
+        return self.db.get_sales_years(), archives
+
+    def show_years(self, result):
+        hot_years, archives = result
+        current_year = utc_now().year
+        self.years = sorted(
+            [(row['year'], row['sales'], row['total'], "Main database", row['year'] < current_year) for row in hot_years]
+            + [(a['year'], a['sales'], a['total'], a['file'], False) for a in archives]
+        )
+        symbol = self.db.get_setting('currency_symbol') or '$'
+        self.years_table.setRowCount(len(self.years))
+        for i, (year, sales, total, stored_in, _) in enumerate(self.years):
+            values = [str(year), str(sales), f"{symbol}{total:,.2f}", stored_in]
+            for col, value in enumerate(values):
+                self.years_table.setItem(i, col, QTableWidgetItem(value))
+        self.years_table.resizeColumnsToContents()
+        self.status_label.setText(f"{sum(1 for year in self.years if year[4])} closed years can be archived.")
+        self.update_buttons()
+
+    def update_buttons(self):
+        row = self.years_table.currentRow()
+        self.archive_button.setEnabled(0 <= row < len(self.years) and self.years[row][4])
+
+    def archive_selected(self):
+        from archive import archive_year
+
+        row = self.years_table.currentRow()
+        if not (0 <= row < len(self.years) and self.years[row][4]):
+            return
+        year = self.years[row][0]
+        reply = QMessageBox.question(
+            self, "Archive Sales",
+            f"Move the {self.years[row][1]} sales from {year} to an archive file?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        self.archive_button.setEnabled(False)
+        self.status_label.setText(f"Archiving {year}...")
+        future = self.executor.exclusive(archive_year, self.db, year, self.vacuum_check.isChecked())
+        self.executor.then(future, self.archived, self.show_error)
+
+    def archived(self, archive):
+        QMessageBox.information(self, "Archive Sales",
+                                f"Archived {archive['sales']} sales from {archive['year']} to {archive['file']}.")
+        self.load_data()
+
+    def show_error(self, error):
+        self.status_label.setText("")
+        QMessageBox.critical(self, "Error", f"Failed to archive sales: {str(error)}")
+        self.update_buttons()
+
 class AddSupplierDialog(BaseDialog):
     def __init__(self, db: POSDatabase, parent=None):
         super().__init__(parent)
@@ -589,7 +1304,10 @@ Payments:
     def print_receipt(self):
         """Print receipt to system printer"""
         try:
+            from metrics import METRICS
+
             # Create a simple text document for printing
+            started = time.perf_counter()
             document = QTextDocument()
             document.setPlainText(self.receipt_preview.toPlainText())
             
@@ -608,6 +1326,7 @@ Payments:
             printer.setPageLayout(page_layout)
             
             document.print_(printer)
+            METRICS.record('print_receipt', (time.perf_counter() - started) * 1000)
             QMessageBox.information(self, "Print", "Receipt sent to printer!")
             self.accept()
             self.accept()
@@ -0,0 +1,139 @@
+"""
+Demand forecasting for product variants.
+
+Builds a variants x days demand matrix from sale history and fits simple and
+weekly-seasonal exponential smoothing for every variant at once with NumPy.
+The smoothing state is stored in the variant_forecasts table, so each run only
+folds in the days closed since the previous run.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import FORECAST_CONFIG
+from db import POSDatabase
+
+SEASON_LENGTH = 7  # Weekly seasonality, indexed by weekday (Mon=0)
+
+
+def build_demand_matrix(rows, variant_index: Dict[int, int], start: date, days: int) -> np.ndarray:
+    """Scatter (variant_id, day, qty) rows into a variants x days matrix"""
+    matrix = np.zeros((len(variant_index), days), dtype=np.float32)
+    if not rows:
+        return matrix
+
+    row_idx = np.fromiter((variant_index[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+    day_idx = np.fromiter(
+        ((datetime.strptime(r[1], "%Y-%m-%d").date() - start).days for r in rows),
+        dtype=np.int64, count=len(rows)
+    )
+    matrix[row_idx, day_idx] = np.fromiter((r[2] for r in rows), dtype=np.float32, count=len(rows))
+    return matrix
+
+
+def simple_smoothing(matrix: np.ndarray, level: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Fold every column of the matrix into the simple smoothing level.
+
+    The recursion level = alpha * y + (1 - alpha) * level unrolls into a
+    weighted sum, so the whole update is one matrix-vector product.
+    """
+    days = matrix.shape[1]
+    decay = (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    return matrix @ (alpha * decay) + level * (1 - alpha) ** days
+
+
+def seasonal_smoothing(matrix: np.ndarray, level: np.ndarray, factors: np.ndarray,
+                       start_weekday: int, alpha: float, gamma: float):
+    """
+    Additive weekly seasonal smoothing for all variants at once.
+
+    Days are processed in order because each step depends on the previous one,
+    but every step updates all variants with a single vector operation.
+    """
+    level = level.copy()
+    factors = factors.copy()
+    for t in range(matrix.shape[1]):
+        weekday = (start_weekday + t) % SEASON_LENGTH
+        demand = matrix[:, t]
+        season = factors[:, weekday]
+        new_level = alpha * (demand - season) + (1 - alpha) * level
+        factors[:, weekday] = gamma * (demand - new_level) + (1 - gamma) * season
+        level = new_level
+    return level, factors
+
+
+def run_forecast(db: POSDatabase, today: Optional[date] = None) -> int:
+    """
+    Update forecasts with the days closed since the last run.
+
+    Returns:
+        int: Number of variants whose forecast was written
+    """
+    today = today or date.today()
+    end = today - timedelta(days=1)  # Only fold in closed days
+
+    last_date = db.get_setting('forecast_last_date')
+    if last_date:
+        start = datetime.strptime(last_date, "%Y-%m-%d").date() + timedelta(days=1)
+    else:
+        start = end - timedelta(days=FORECAST_CONFIG['history_days'] - 1)
+    if start > end:
+        return 0
+
+    days = (end - start).days + 1
+    rows = db.get_daily_variant_demand(start.isoformat(), end.isoformat())
+    states = db.get_forecast_states()
+
+    variant_ids = sorted(set(states) | {r[0] for r in rows})
+    if not variant_ids:
+        db.save_forecasts([], end.isoformat())
+        return 0
+    variant_index = {variant_id: i for i, variant_id in enumerate(variant_ids)}
+
+    matrix = build_demand_matrix(rows, variant_index, start, days)
+
+    # Seed variants without stored state from their mean demand in this window
+    window_mean = matrix.mean(axis=1, dtype=np.float64)
+    has_state = np.array([variant_id in states for variant_id in variant_ids])
+    simple_level = np.array([states[v]['simple_level'] if v in states else 0.0 for v in variant_ids])
+    seasonal_level = np.array([states[v]['seasonal_level'] if v in states else 0.0 for v in variant_ids])
+    simple_level = np.where(has_state, simple_level, window_mean)
+    seasonal_level = np.where(has_state, seasonal_level, window_mean)
+
+    factors = np.zeros((len(variant_ids), SEASON_LENGTH))
+    for variant_id, state in states.items():
+        if state['seasonal_factors']:
+            factors[variant_index[variant_id]] = state['seasonal_factors']
+
+    alpha = FORECAST_CONFIG['alpha']
+    simple_level = simple_smoothing(matrix, simple_level, alpha)
+    seasonal_level, factors = seasonal_smoothing(
+        matrix, seasonal_level, factors, start.weekday(), alpha, FORECAST_CONFIG['gamma']
+    )
+
+    # Project the seasonal model over the horizon starting today
+    horizon_weekdays = [(today.weekday() + h) % SEASON_LENGTH for h in range(FORECAST_CONFIG['horizon_days'])]
+    forecast_week = np.clip(seasonal_level[:, None] + factors[:, horizon_weekdays], 0, None).sum(axis=1)
+    forecast_daily = np.clip(simple_level, 0, None)
+
+    forecasts: List[Dict] = [
+        {
+            'variant_id': variant_id,
+            'simple_level': float(simple_level[i]),
+            'seasonal_level': float(seasonal_level[i]),
+            'seasonal_factors': [round(float(x), 4) for x in factors[i]],
+            'forecast_daily': float(forecast_daily[i]),
+            'forecast_week': float(forecast_week[i]),
+        }
+        for i, variant_id in enumerate(variant_ids)
+    ]
+    db.save_forecasts(forecasts, end.isoformat())
+    return len(forecasts)
+
+
+if __name__ == "__main__":
+    count = run_forecast(POSDatabase())
+    print(f"Forecasts updated for {count} variants.")
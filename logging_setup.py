@@ -0,0 +1,134 @@
+"""
+Application logging.
+
+setup_logging() applies config.LOGGING_CONFIG, then moves the handlers it
+built behind a QueueListener: loggers only put records on a queue through a
+QueueHandler, and the console and rotating file handlers write them out on a
+background thread, so a slow disk never blocks the register. Loggers
+configured with handlers of their own, like pos.slow_queries, get a queue
+and writer thread each. The file handler writes JSON lines, one object per
+record, tagged with the current action, user and shift, plus duration_ms
+where the caller passes one:
+
+    logger.info("Sale committed", extra={'duration_ms': 42.0})
+"""
+
+import atexit
+import json
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime
+from typing import List
+
+from config import LOGGING_CONFIG, LOGS_DIR
+
+CONTEXT_FIELDS = ('action', 'user', 'shift', 'duration_ms')
+
+_context = {}
+_listeners: List[logging.handlers.QueueListener] = []
+
+
+def set_log_context(**fields):
+    """Set (or clear, with None) fields added to every record, e.g. user and shift"""
+    for key, value in fields.items():
+        if value is None:
+            _context.pop(key, None)
+        else:
+            _context[key] = value
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current action, user and shift in the thread that logs them"""
+
+    def filter(self, record):
+        from stall_watchdog import current_action
+
+        if getattr(record, 'action', None) is None:
+            record.action = current_action()
+        for key, value in _context.items():
+            if getattr(record, key, None) is None:
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; empty context fields are left out"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the message, traceback and context fields separate for the JSON formatter"""
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks cannot be pickled or outlive their frames; format them here
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _log_unhandled(exc_type, exc_value, exc_traceback):
+    if not issubclass(exc_type, KeyboardInterrupt):
+        logging.getLogger('pos').critical("Unhandled exception", exc_info=(exc_type, exc_value, exc_traceback))
+    sys.__excepthook__(exc_type, exc_value, exc_traceback)
+
+
+def _queue_handlers(logger: logging.Logger) -> logging.handlers.QueueListener:
+    """Replace logger's handlers with a queue, and return the started listener that writes to them"""
+    # A windowed build has no stderr; drop console handlers that have nowhere to write
+    handlers = [h for h in logger.handlers
+                if not (type(h) is logging.StreamHandler and h.stream is None)]
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def setup_logging() -> List[logging.handlers.QueueListener]:
+    """Apply LOGGING_CONFIG with its handlers moved onto background threads; safe to call twice"""
+    if _listeners:
+        return _listeners
+
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    logging.config.dictConfig(LOGGING_CONFIG)
+    for name, options in LOGGING_CONFIG['loggers'].items():
+        if options.get('handlers'):
+            _listeners.append(_queue_handlers(logging.getLogger(name or None)))
+    atexit.register(stop_logging)
+    sys.excepthook = _log_unhandled
+    return _listeners
+
+
+def stop_logging():
+    """Flush queued records and stop the writer threads"""
+    while _listeners:
+        _listeners.pop().stop()
@@ -1,20 +1,54 @@
+import startup_trace  # First, so it can time the imports below
 import sys
 import os
+import logging
+import multiprocessing
+import time
 from datetime import datetime
 from PySide6.QtWidgets import *
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from db import POSDatabase
-from config import TAX_INCLUSIVE, REPORTS_EXPORT_DIR
+from db_executor import DatabaseExecutor
+from maintenance import MaintenanceScheduler
+from change_detector import ChangeDetector, CATALOGUE_TABLES, REPORT_TABLES
+from config import TAX_INCLUSIVE, REPORTS_EXPORT_DIR, STARTUP_BUDGET_MS, ENABLE_PROFILING
 from payment_dialog import SplitPaymentDialog
-from dialogs import AddUserDialog, EditUserDialog, ProductSalesDialog, TransactionItemsDialog, SettingsDialog, ReceiptPrintDialog, EndOfDayDialog
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+from dialogs import AddUserDialog, EditUserDialog, ProductSalesDialog, TransactionItemsDialog, SettingsDialog, ReceiptPrintDialog, EndOfDayDialog, StockMovementsDialog, StocktakeDialog, GoodsReceivedDialog, DiagnosticsDialog, ArchiveDialog
+from charts import PieChart, BarChart
 import user_auth
 from dialogs import FirstTimeSetupDialog, VerifyOTPDialog, CreateUserDialog, ResetPasswordDialog
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
+from stall_watchdog import start_watchdog
+from profiling import profiled_action
+from logging_setup import set_log_context, setup_logging
+from metrics import METRICS
+from config import METRICS_CONFIG
+
+if ENABLE_PROFILING:
+    startup_trace.enable()
+
+logger = logging.getLogger(__name__)
+
+GRID_FILL_BATCH = 40  # Product cards added per event-loop pass
+
+
+def fetch_report_data(db: POSDatabase, start_date: str, end_date: str) -> dict:
+    """Run every query behind the Reports tab; called on a database reader thread"""
+    profit_includes_tax = db.get_setting('profit_includes_tax') == 'True'
+    return {
+        'currency_symbol': db.get_setting('currency_symbol') or '$',
+        'show_total_tax_card': db.get_setting('show_total_tax_card') == 'True',
+        'total_sales': db.get_total_sales(start_date, end_date),
+        'num_sales': db.get_number_of_sales(start_date, end_date),
+        'items_sold': db.get_items_sold(start_date, end_date),
+        'profit': db.get_profit(start_date, end_date, profit_includes_tax),
+        'total_tax': db.get_total_tax(start_date, end_date),
+        'shift_summary': db.get_shift_summary(start_date, end_date),
+        'payment_data': db.get_sales_by_payment_method(start_date, end_date),
+        'top_products': db.get_top_products(start_date, end_date),
+        'detailed_transactions': db.get_detailed_transactions(start_date, end_date),
+        'sold_items': db.get_sold_items(start_date, end_date),
+    }
 
 class LoginDialog(QDialog):
     def __init__(self, db: POSDatabase):
@@ -370,6 +404,16 @@ class POSMainWindow(QMainWindow):
         self.should_logout = False
         self.current_shift = None
         self.cart_items = []
+        self.checkout_pending = False  # A sale is being saved on the writer thread
+        self.pending_scans = []  # Products scanned meanwhile, added once it is saved
+        self.db_executor = DatabaseExecutor(db)
+        self.maintenance = MaintenanceScheduler(db, self.db_executor, self)
+        self.maintenance.start()
+        # Table versions each view last loaded, so refreshes with nothing new are skipped
+        self.changes = ChangeDetector(db)
+        self.grid_versions = None
+        self.products_table_versions = None
+        self.report_versions = None
         
         # Set window icon if not already set by the application
         if self.windowIcon().isNull():
@@ -378,10 +422,54 @@ class POSMainWindow(QMainWindow):
                 self.setWindowIcon(QIcon(icon_path))
         
         # Check for active shift or start new one
-        self.check_shift()
-        
-        self.init_ui()
+        with startup_trace.phase("POSMainWindow.check_shift"):
+            self.check_shift()
         
+        self.ui_started = time.perf_counter()
+        with startup_trace.phase("POSMainWindow.init_ui"):
+            self.init_ui()
+        # Fires once the window is shown and the event loop is idle
+        QTimer.singleShot(0, self.report_startup_time)
+
+        # Write recorded performance metrics to the database now and then, and at exit
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.flush_metrics)
+        self.metrics_timer.start(METRICS_CONFIG['flush_interval_ms'])
+
+    def report_startup_time(self):
+        """Warn when building the window overran the startup budget"""
+        elapsed_ms = (time.perf_counter() - self.ui_started) * 1000
+        if elapsed_ms > STARTUP_BUDGET_MS:
+            logger.warning(f"Startup took {elapsed_ms:.0f} ms, over the {STARTUP_BUDGET_MS} ms budget")
+        startup_trace.stop_tracing_imports()  # Later imports are not startup; don't pay the hook for them
+        paths = startup_trace.write_report()
+        if paths:
+            logger.info(f"Startup profile written to {paths[0]} and {paths[1]}")
+        
+    def flush_metrics(self):
+        """Save recorded metrics on the writer thread; the hours are kept for the next flush if it fails"""
+        try:
+            future = self.db_executor.write(METRICS.flush, self.db)
+        except RuntimeError:
+            return  # Shutting down; close_database() flushes what is left
+        self.db_executor.then(future, lambda _: None,
+                              lambda e: logger.warning(f"Could not save performance metrics: {e}"))
+
+    def close_database(self):
+        """Finish queued writes, then save the last metrics directly; safe to call twice"""
+        self.metrics_timer.stop()
+        self.maintenance.stop()  # Interrupts a running step so shutdown does not wait for it
+        self.changes.close()
+        self.db_executor.shutdown()  # Waits for queued writes, such as a sale being saved
+        try:
+            METRICS.flush(self.db)
+        except Exception as e:
+            logger.warning(f"Could not save performance metrics: {e}")
+
+    def closeEvent(self, event):
+        self.close_database()
+        super().closeEvent(event)
+
     def check_shift(self):
         """Check for active shift or prompt to start new one"""
         active_shift = self.db.get_active_shift(self.user['id'])
@@ -395,6 +483,7 @@ class POSMainWindow(QMainWindow):
                 self.current_shift = self.db.get_active_shift(self.user['id'])
             else:
                 sys.exit()
+        set_log_context(user=self.user['username'], shift=self.current_shift['id'])
                 
     def init_ui(self):
         store_name = self.db.get_setting('store_name')
@@ -436,20 +525,30 @@ class POSMainWindow(QMainWindow):
             }
         """)
         
+        # Apply the font size before any tab widgets exist, so it is cheap
+        self.set_font_size(self.db.get_setting('font_size') or 'Medium')
+
         # Central widget with tabs
         self.tabs = QTabWidget()
         self.setCentralWidget(self.tabs)
         
-        # Create tabs
+        # Create tabs. Only the sales tab is built at login; the others are
+        # built the first time they are opened.
+        self.tab_placeholders = {}
+        self.tab_builders = {}
         permissions = self.user.get('permissions', [])
         if self.user['role'] == 'admin' or 'Can access sales tab' in permissions:
-            self.create_sales_tab()
+            with startup_trace.phase("create_sales_tab"):
+                self.create_sales_tab()
         if self.user['role'] == 'admin' or 'Can access products tab' in permissions:
-            self.create_products_tab()
+            self.add_deferred_tab("Products", self.create_products_tab)
         if self.user['role'] == 'admin' or 'Can access reports tab' in permissions:
-            self.create_reports_tab()
+            self.add_deferred_tab("Reports", self.create_reports_tab)
         if self.user['role'] == 'admin' or 'Can access settings tab' in permissions:
-            self.create_settings_tab()
+            self.add_deferred_tab("Settings", self.create_settings_tab)
+        self.tabs.currentChanged.connect(self.build_deferred_tab)
+        self.tabs.currentChanged.connect(self.refresh_current_tab)
+        self.build_deferred_tab(self.tabs.currentIndex())
         
         # Status bar
         self.status_bar = self.statusBar()
@@ -460,6 +559,50 @@ class POSMainWindow(QMainWindow):
 
         self.apply_font_to_tables()
 
+    def add_deferred_tab(self, title, builder):
+        """Add a placeholder tab that is replaced by builder() on first activation"""
+        placeholder = QWidget()
+        self.tab_placeholders[title] = placeholder
+        self.tab_builders[placeholder] = builder
+        self.tabs.addTab(placeholder, title)
+
+    def build_deferred_tab(self, index):
+        builder = self.tab_builders.pop(self.tabs.widget(index), None)
+        if builder:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                with startup_trace.phase(builder.__name__):
+                    builder()
+                    self.apply_font_to_tables()
+            finally:
+                QApplication.restoreOverrideCursor()
+            # Deferred tabs build after the first report; refresh it to include them
+            startup_trace.write_report()
+
+    def refresh_current_tab(self, index):
+        """Bring the tab being opened up to date; each refresh skips itself when nothing it shows has changed"""
+        title = self.tabs.tabText(index)
+        if title == "Reports":
+            self.update_reports()
+        elif title == "Products":
+            self.refresh_products_table()
+        elif title == "Sales" and not self.search_input.text().strip():
+            self.load_products()
+
+    def add_tab(self, widget, title):
+        """Add a tab, swapping it in for its deferred placeholder if there is one"""
+        placeholder = self.tab_placeholders.pop(title, None)
+        if placeholder is None:
+            self.tabs.addTab(widget, title)
+            return
+        index = self.tabs.indexOf(placeholder)
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, widget, title)
+        self.tabs.setCurrentIndex(index)
+        self.tabs.blockSignals(False)
+        placeholder.deleteLater()
+
     def apply_font_to_tables(self):
         """Apply the application font to all table headers."""
         font = self.app.font()
@@ -522,6 +665,34 @@ class POSMainWindow(QMainWindow):
         close_shift_action = QAction('Close Shift', self)
         close_shift_action.triggered.connect(self.close_shift)
         shift_menu.addAction(close_shift_action)
+
+        # Inventory menu
+        if self.user['role'] == 'admin':
+            inventory_menu = menubar.addMenu('Inventory')
+
+            goods_received_action = QAction('Goods Received', self)
+            goods_received_action.triggered.connect(self.open_goods_received)
+            inventory_menu.addAction(goods_received_action)
+
+            stocktake_action = QAction('Stocktake', self)
+            stocktake_action.triggered.connect(self.open_stocktake)
+            inventory_menu.addAction(stocktake_action)
+
+            inventory_menu.addSeparator()
+            import_catalogue_action = QAction('Import Catalogue...', self)
+            import_catalogue_action.triggered.connect(self.import_catalogue)
+            inventory_menu.addAction(import_catalogue_action)
+
+            # Tools menu
+            tools_menu = menubar.addMenu('Tools')
+
+            diagnostics_action = QAction('Diagnostics', self)
+            diagnostics_action.triggered.connect(self.show_diagnostics)
+            tools_menu.addAction(diagnostics_action)
+
+            archive_action = QAction('Archive Sales...', self)
+            archive_action.triggered.connect(self.show_archive)
+            tools_menu.addAction(archive_action)
         
     def create_sales_tab(self):
         """Create the main sales interface"""
@@ -639,7 +810,7 @@ class POSMainWindow(QMainWindow):
         layout.addLayout(right_panel, 1)
         
         sales_widget.setLayout(layout)
-        self.tabs.addTab(sales_widget, "Sales")
+        self.add_tab(sales_widget, "Sales")
         
         # Load products
         self.load_products()
@@ -661,10 +832,19 @@ class POSMainWindow(QMainWindow):
             add_supplier_btn = QPushButton("Add Supplier")
             add_supplier_btn.clicked.connect(self.show_add_supplier_dialog)
             toolbar.addWidget(add_supplier_btn)
+
+            receive_btn = QPushButton("Receive Stock")
+            receive_btn.clicked.connect(self.open_goods_received)
+            toolbar.addWidget(receive_btn)
         
         refresh_btn = QPushButton("Refresh")
         refresh_btn.clicked.connect(self.refresh_products_table)
         toolbar.addWidget(refresh_btn)
+
+        if self.user['role'] == 'admin':
+            forecast_btn = QPushButton("Update Forecasts")
+            forecast_btn.clicked.connect(self.update_forecasts)
+            toolbar.addWidget(forecast_btn)
         
         toolbar.addStretch()
         
@@ -677,15 +857,15 @@ class POSMainWindow(QMainWindow):
         
         # Products table
         self.products_mgmt_table = QTableWidget()
-        self.products_mgmt_table.setColumnCount(11)
-        headers = ['Product', 'Brand', 'Variant', 'Barcode', 'Purchase Price', 'Price', 'Stock', 'Reorder Level', 'Supplier', 'Status', 'Actions']
+        self.products_mgmt_table.setColumnCount(12)
+        headers = ['Product', 'Brand', 'Variant', 'Barcode', 'Purchase Price', 'Price', 'Stock', 'Reorder Level', 'Supplier', 'Status', 'Forecast (7d)', 'Actions']
         self.products_mgmt_table.setHorizontalHeaderLabels(headers)
         self.products_mgmt_table.horizontalHeader().setStretchLastSection(True)
         
         layout.addWidget(self.products_mgmt_table)
         
         products_widget.setLayout(layout)
-        self.tabs.addTab(products_widget, "Products")
+        self.add_tab(products_widget, "Products")
         
         self.refresh_products_table()
         
@@ -714,6 +894,7 @@ class POSMainWindow(QMainWindow):
         card.setLayout(layout)
         return card
 
+    @profiled_action('open_reports')
     def create_reports_tab(self):
         """Create reports tab"""
         scroll_area = QScrollArea()
@@ -796,17 +977,14 @@ class POSMainWindow(QMainWindow):
         charts_layout = QHBoxLayout()
         charts_group.setLayout(charts_layout)
         
-        # Payment method chart
-        self.payment_chart_widget = QWidget()
-        self.payment_chart_layout = QVBoxLayout()
-        self.payment_chart_widget.setLayout(self.payment_chart_layout)
-        charts_layout.addWidget(self.payment_chart_widget)
-
-        # Top products chart
-        self.top_products_chart_widget = QWidget()
-        self.top_products_chart_layout = QVBoxLayout()
-        self.top_products_chart_widget.setLayout(self.top_products_chart_layout)
-        charts_layout.addWidget(self.top_products_chart_widget)
+        # Charts are created once and updated in place on every refresh
+        self.payment_chart = PieChart("Sales by Payment Method", "No payment data for this period.")
+        charts_layout.addWidget(self.payment_chart)
+
+        self.top_products_data = []
+        self.top_products_chart = BarChart("Top Selling Products", "No product data for this period.", "Quantity Sold")
+        self.top_products_chart.barClicked.connect(self.on_top_product_clicked)
+        charts_layout.addWidget(self.top_products_chart)
         reports_content_layout.addWidget(charts_group)
 
         # --- Detailed Tables (in a new Tab widget) ---
@@ -834,13 +1012,19 @@ class POSMainWindow(QMainWindow):
 
         # Footer
         footer_layout = QHBoxLayout()
+        stock_movements_btn = QPushButton("Stock Movements")
+        stock_movements_btn.clicked.connect(self.show_stock_movements)
+        export_btn = QPushButton("Export Data")
+        export_btn.clicked.connect(self.export_report_csv)
         download_btn = QPushButton("Download Report")
         download_btn.clicked.connect(self.download_report)
         footer_layout.addStretch()
+        footer_layout.addWidget(stock_movements_btn)
+        footer_layout.addWidget(export_btn)
         footer_layout.addWidget(download_btn)
         layout.addLayout(footer_layout)
 
-        self.tabs.addTab(scroll_area, "Reports")
+        self.add_tab(scroll_area, "Reports")
 
         # Connect signals
         self.today_rb.toggled.connect(self.update_reports)
@@ -855,7 +1039,8 @@ class POSMainWindow(QMainWindow):
     def currency_symbol(self):
         return self.db.get_setting('currency_symbol') or '$'
 
-    def update_reports(self):
+    def get_report_date_range(self):
+        """Get (start_date, end_date) for the selected report range"""
         start_date = self.from_date.date().toString("yyyy-MM-dd")
         end_date = self.to_date.date().toString("yyyy-MM-dd")
 
@@ -865,62 +1050,82 @@ class POSMainWindow(QMainWindow):
         elif self.week_rb.isChecked():
             start_date = QDate.currentDate().addDays(-7).toString("yyyy-MM-dd")
             end_date = QDate.currentDate().toString("yyyy-MM-dd")
+        return start_date, end_date
 
-        # Sales Summary
-        total_sales = self.db.get_total_sales(start_date, end_date)
-        num_sales = self.db.get_number_of_sales(start_date, end_date)
-        items_sold = self.db.get_items_sold(start_date, end_date)
-        
-        profit_includes_tax = self.db.get_setting('profit_includes_tax') == 'True'
-        profit = self.db.get_profit(start_date, end_date, profit_includes_tax)
-        
-        total_tax = self.db.get_total_tax(start_date, end_date)
+    def update_reports(self):
+        """Fetch the selected range on a reader thread; show_report_data fills the tab when it arrives"""
+        if not hasattr(self, 'today_rb'):
+            return  # Reports tab not built yet
+        start_date, end_date = self.get_report_date_range()
+        versions = (start_date, end_date, self.changes.versions(REPORT_TABLES))
+        if versions == self.report_versions:
+            return  # Showing (or loading) this range already, and no sale has been written since
+        self.report_versions = versions
+        # Only the latest request is shown; results for a range changed mid-query are dropped
+        self.report_generation = getattr(self, 'report_generation', 0) + 1
+        generation = self.report_generation
+        requested = time.perf_counter()
+        future = self.db_executor.read(fetch_report_data, self.db, start_date, end_date)
+        self.db_executor.then(
+            future,
+            lambda data: self.show_report_data(generation, requested, data),
+            lambda error: self.report_failed(generation, error)
+        )
+
+    def report_failed(self, generation, error):
+        logger.error(f"Loading the report failed: {error}", exc_info=error)
+        if generation == self.report_generation:
+            self.report_versions = None  # Try again on the next refresh
+            QMessageBox.warning(self, "Reports", f"Could not load the report: {error}")
 
-        self.total_sales_card.findChildren(QLabel)[1].setText(f"{self.currency_symbol}{total_sales:.2f}")
-        self.num_sales_card.findChildren(QLabel)[1].setText(str(num_sales))
-        self.items_sold_card.findChildren(QLabel)[1].setText(str(items_sold))
-        self.profit_card.findChildren(QLabel)[1].setText(f"{self.currency_symbol}{profit:.2f}")
-        self.total_tax_card.findChildren(QLabel)[1].setText(f"{self.currency_symbol}{total_tax:.2f}")
+    @profiled_action('refresh_reports')
+    def show_report_data(self, generation, requested, data):
+        if generation != self.report_generation:
+            return
+        currency_symbol = data['currency_symbol']
 
-        show_total_tax_card = self.db.get_setting('show_total_tax_card') == 'True'
-        self.total_tax_card.setVisible(show_total_tax_card)
+        # Sales Summary
+        self.total_sales_card.findChildren(QLabel)[1].setText(f"{currency_symbol}{data['total_sales']:.2f}")
+        self.num_sales_card.findChildren(QLabel)[1].setText(str(data['num_sales']))
+        self.items_sold_card.findChildren(QLabel)[1].setText(str(data['items_sold']))
+        self.profit_card.findChildren(QLabel)[1].setText(f"{currency_symbol}{data['profit']:.2f}")
+        self.total_tax_card.findChildren(QLabel)[1].setText(f"{currency_symbol}{data['total_tax']:.2f}")
+        self.total_tax_card.setVisible(data['show_total_tax_card'])
 
         # Cash Drawer Summary
-        shift_summary = self.db.get_shift_summary(start_date, end_date)
+        shift_summary = data['shift_summary']
         self.cash_drawer_table.setRowCount(len(shift_summary))
         for i, shift in enumerate(shift_summary):
             self.cash_drawer_table.setItem(i, 0, QTableWidgetItem(shift['cashier']))
-            self.cash_drawer_table.setItem(i, 1, QTableWidgetItem(f"{self.currency_symbol}{shift['opening_cash'] or 0:.2f}"))
+            self.cash_drawer_table.setItem(i, 1, QTableWidgetItem(f"{currency_symbol}{shift['opening_cash'] or 0:.2f}"))
             
             closing_cash = shift['closing_cash'] or 0
             expected_cash = shift['expected_cash_sales'] or 0
             opening_cash = shift['opening_cash'] or 0
 
-            self.cash_drawer_table.setItem(i, 2, QTableWidgetItem(f"{self.currency_symbol}{closing_cash:.2f}"))
+            self.cash_drawer_table.setItem(i, 2, QTableWidgetItem(f"{currency_symbol}{closing_cash:.2f}"))
             expected_in_drawer = opening_cash + expected_cash
-            self.cash_drawer_table.setItem(i, 3, QTableWidgetItem(f"{self.currency_symbol}{expected_in_drawer:.2f}"))
+            self.cash_drawer_table.setItem(i, 3, QTableWidgetItem(f"{currency_symbol}{expected_in_drawer:.2f}"))
             actual_cash = closing_cash
             over_short = actual_cash - expected_in_drawer
             
-            self.cash_drawer_table.setItem(i, 4, QTableWidgetItem(f"{self.currency_symbol}{actual_cash:.2f}"))
-            self.cash_drawer_table.setItem(i, 5, QTableWidgetItem(f"{self.currency_symbol}{over_short:.2f}"))
+            self.cash_drawer_table.setItem(i, 4, QTableWidgetItem(f"{currency_symbol}{actual_cash:.2f}"))
+            self.cash_drawer_table.setItem(i, 5, QTableWidgetItem(f"{currency_symbol}{over_short:.2f}"))
 
         # Payment Breakdown
-        payment_data = self.db.get_sales_by_payment_method(start_date, end_date)
-        self.update_payment_chart(payment_data)
+        self.update_payment_chart(data['payment_data'])
 
         # Top Products Sold
-        top_products_data = self.db.get_top_products(start_date, end_date)
-        self.update_top_products_chart(top_products_data)
+        self.update_top_products_chart(data['top_products'])
 
         # Detailed Transactions
-        detailed_transactions = self.db.get_detailed_transactions(start_date, end_date)
+        detailed_transactions = data['detailed_transactions']
         self.transactions_table.setRowCount(len(detailed_transactions))
         for i, trans in enumerate(detailed_transactions):
             self.transactions_table.setItem(i, 0, QTableWidgetItem(trans['sale_date']))
             self.transactions_table.setItem(i, 1, QTableWidgetItem(trans['cashier']))
             self.transactions_table.setItem(i, 2, QTableWidgetItem(trans['payments']))
-            self.transactions_table.setItem(i, 3, QTableWidgetItem(f"{self.currency_symbol}{trans['total_amount']:.2f}"))
+            self.transactions_table.setItem(i, 3, QTableWidgetItem(f"{currency_symbol}{trans['total_amount']:.2f}"))
             self.transactions_table.setItem(i, 4, QTableWidgetItem(trans['transaction_codes']))
             self.transactions_table.setItem(i, 5, QTableWidgetItem(trans['status']))
             
@@ -929,7 +1134,7 @@ class POSMainWindow(QMainWindow):
             self.transactions_table.setCellWidget(i, 6, view_btn)
 
         # Sold Items
-        sold_items = self.db.get_sold_items(start_date, end_date)
+        sold_items = data['sold_items']
         self.sold_items_table.setRowCount(len(sold_items))
         for i, item in enumerate(sold_items):
             self.sold_items_table.setItem(i, 0, QTableWidgetItem(item['sale_date']))
@@ -937,144 +1142,106 @@ class POSMainWindow(QMainWindow):
             self.sold_items_table.setItem(i, 2, QTableWidgetItem(item['cashier']))
             self.sold_items_table.setItem(i, 3, QTableWidgetItem(f"{item['product_name']} ({item['variant_name']})"))
             self.sold_items_table.setItem(i, 4, QTableWidgetItem(str(item['qty'])))
-            self.sold_items_table.setItem(i, 5, QTableWidgetItem(f"{self.currency_symbol}{item['price']:.2f}"))
-            self.sold_items_table.setItem(i, 6, QTableWidgetItem(f"{self.currency_symbol}{item['subtotal']:.2f}"))
+            self.sold_items_table.setItem(i, 5, QTableWidgetItem(f"{currency_symbol}{item['price']:.2f}"))
+            self.sold_items_table.setItem(i, 6, QTableWidgetItem(f"{currency_symbol}{item['subtotal']:.2f}"))
+
+        # From the request to a filled tab, including time queued behind other reads
+        METRICS.record('report_refresh', (time.perf_counter() - requested) * 1000)
+
+    def show_stock_movements(self):
+        start_date, end_date = self.get_report_date_range()
+        dialog = StockMovementsDialog(self.db, start_date, end_date, self)
+        dialog.exec()
 
     def show_transaction_items(self, sale_id):
         dialog = TransactionItemsDialog(self.db, sale_id, self)
         dialog.exec()
 
     def update_payment_chart(self, data):
-        for i in reversed(range(self.payment_chart_layout.count())):
-            self.payment_chart_layout.itemAt(i).widget().setParent(None)
-
-        if not data:
-            self.payment_chart_layout.addWidget(QLabel("No payment data for this period."))
-            return
-
-        fig = Figure(figsize=(5, 4), dpi=100)
-        canvas = FigureCanvas(fig)
-        self.payment_chart_layout.addWidget(canvas)
-        ax = fig.add_subplot(111)
-
-        labels = [d['method'] for d in data]
-        sizes = [d['total'] for d in data]
-        
-        ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-        ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-        ax.set_title("Sales by Payment Method")
+        self.payment_chart.set_data([d['method'] for d in data], [d['total'] for d in data])
 
     def show_product_sales(self, product_id, variant_id):
-        start_date = self.from_date.date().toString("yyyy-MM-dd")
-        end_date = self.to_date.date().toString("yyyy-MM-dd")
+        start_date, end_date = self.get_report_date_range()
         dialog = ProductSalesDialog(self.db, product_id, variant_id, start_date, end_date, self)
         dialog.exec()
 
     def update_top_products_chart(self, data):
-        for i in reversed(range(self.top_products_chart_layout.count())):
-            self.top_products_chart_layout.itemAt(i).widget().setParent(None)
-
-        if not data:
-            self.top_products_chart_layout.addWidget(QLabel("No product data for this period."))
-            return
-            
-        fig = Figure(figsize=(5, 4), dpi=100)
-        canvas = FigureCanvas(fig)
-        self.top_products_chart_layout.addWidget(canvas)
-        ax = fig.add_subplot(111)
-
-        product_names = [f"{d['product_name']} ({d['variant_name']})" for d in data]
-        quantities = [d['total_qty'] for d in data]
-
-        bars = ax.bar(product_names, quantities)
-        for i, bar in enumerate(bars):
-            bar.set_picker(True)
-            bar.set_gid(i)
-
-        def on_pick(event):
-            bar_index = event.artist.get_gid()
-            product = data[bar_index]
-            self.show_product_sales(product['product_id'], product['variant_id'])
-
-        fig.canvas.mpl_connect('pick_event', on_pick)
+        self.top_products_data = data
+        self.top_products_chart.set_data(
+            [f"{d['product_name']} ({d['variant_name']})" for d in data],
+            [d['total_qty'] for d in data]
+        )
 
-        ax.set_title("Top Selling Products")
-        ax.set_ylabel("Quantity Sold")
-        fig.autofmt_xdate()
+    def on_top_product_clicked(self, index):
+        product = self.top_products_data[index]
+        self.show_product_sales(product['product_id'], product['variant_id'])
 
     def download_report(self):
-        start_date = self.from_date.date().toString("yyyy-MM-dd")
-        end_date = self.to_date.date().toString("yyyy-MM-dd")
+        """Render the sales report PDF in a worker process"""
+        from report_pdf import ReportProcess, ReportThread
 
-        if self.today_rb.isChecked():
-            start_date = QDate.currentDate().toString("yyyy-MM-dd")
-            end_date = QDate.currentDate().toString("yyyy-MM-dd")
-        elif self.week_rb.isChecked():
-            start_date = QDate.currentDate().addDays(-7).toString("yyyy-MM-dd")
-            end_date = QDate.currentDate().toString("yyyy-MM-dd")
+        if getattr(self, 'report_process', None):
+            QMessageBox.information(self, "Report", "A report is already being generated.")
+            return
 
+        start_date, end_date = self.get_report_date_range()
+        os.makedirs(REPORTS_EXPORT_DIR, exist_ok=True)
         filename, _ = QFileDialog.getSaveFileName(
             self, "Save Report",
-            f"sales_report_{start_date}_to_{end_date}.pdf",
+            os.path.join(REPORTS_EXPORT_DIR, f"sales_report_{start_date}_to_{end_date}.pdf"),
             "PDF Files (*.pdf)"
         )
 
         if not filename:
             return
 
-        try:
-            c = canvas.Canvas(filename, pagesize=letter)
-            width, height = letter
-
-            # Title
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(inch, height - inch, f"Sales Report: {start_date} to {end_date}")
-
-            # Summary
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(inch, height - 1.5 * inch, "Sales Summary")
-            c.setFont("Helvetica", 10)
-            total_sales = self.db.get_total_sales(start_date, end_date)
-            num_sales = self.db.get_number_of_sales(start_date, end_date)
-            items_sold = self.db.get_items_sold(start_date, end_date)
-            profit = self.db.get_profit(start_date, end_date)
-            c.drawString(inch, height - 1.75 * inch, f"Total Sales: {self.currency_symbol}{total_sales:.2f}")
-            c.drawString(inch, height - 2.0 * inch, f"Total Transactions: {num_sales}")
-            c.drawString(inch, height - 2.25 * inch, f"Total Items Sold: {items_sold}")
-            c.drawString(inch, height - 2.5 * inch, f"Profit: {self.currency_symbol}{profit:.2f}")
-
-            # Detailed Transactions
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(inch, height - 3.0 * inch, "Detailed Transactions")
-            c.setFont("Helvetica", 8)
-            
-            detailed_transactions = self.db.get_detailed_transactions(start_date, end_date)
-            
-            y = height - 3.25 * inch
-            c.drawString(inch, y, "Date")
-            c.drawString(inch * 2.5, y, "Cashier")
-            c.drawString(inch * 3.5, y, "Payment Method")
-            c.drawString(inch * 5, y, "Amount")
-            c.drawString(inch * 6, y, "Transaction Code")
-            c.drawString(inch * 7, y, "Status")
-            y -= 0.25 * inch
-
-            for trans in detailed_transactions:
-                c.drawString(inch, y, trans['sale_date'])
-                c.drawString(inch * 2.5, y, trans['cashier'])
-                c.drawString(inch * 3.5, y, trans['payments'])
-                c.drawString(inch * 5, y, f"{self.currency_symbol}{trans['total_amount']:.2f}")
-                c.drawString(inch * 6, y, trans['transaction_codes'])
-                c.drawString(inch * 7, y, trans['status'])
-                y -= 0.25 * inch
-                if y < inch:
-                    c.showPage()
-                    y = height - inch
-
-            c.save()
-            QMessageBox.information(self, "Report Saved", f"Report saved to {filename}")
-        except Exception as e:
-            QMessageBox.warning(self, "Save Error", f"Could not save report: {str(e)}")
+        # Another process cannot open an in-memory database
+        renderer = ReportThread if self.db.in_memory else ReportProcess
+        self.report_process = renderer(
+            self.db, start_date, end_date, filename,
+            self.currency_symbol, self.db.get_setting('store_name')
+        )
+        self.report_progress = QProgressDialog("Generating report...", "Cancel", 0, 0, self)
+        self.report_progress.setWindowModality(Qt.NonModal)
+        self.report_progress.setMinimumDuration(0)
+        self.report_progress.canceled.connect(self.cancel_report)
+        self.report_cancelled = False
+
+        self.report_timer = QTimer(self)
+        self.report_timer.timeout.connect(self.poll_report)
+        self.report_process.start()
+        self.report_timer.start(200)
+
+    def poll_report(self):
+        message = self.report_process.poll()
+        if message is None:
+            return
+        kind, value, total = message
+        if kind == 'progress':
+            if not self.report_cancelled:
+                self.report_progress.setMaximum(max(total, 1))
+                self.report_progress.setValue(min(value, total))
+                self.report_progress.setLabelText(f"Rendered {value:,} of {total:,} transactions...")
+            return
+
+        cancelled = self.report_cancelled
+        self.finish_report()
+        if kind == 'done':
+            QMessageBox.information(self, "Report Saved", f"Report saved to {value}")
+        elif not cancelled:
+            QMessageBox.warning(self, "Save Error", f"Could not save report: {value}")
+
+    def cancel_report(self):
+        """Stop the report; poll_report() tidies up once the renderer has actually stopped"""
+        if getattr(self, 'report_process', None) and not self.report_cancelled:
+            self.report_cancelled = True
+            self.report_process.cancel()
+
+    def finish_report(self):
+        self.report_timer.stop()
+        self.report_process = None
+        self.report_progress.canceled.disconnect(self.cancel_report)
+        self.report_progress.close()
 
     def create_settings_tab(self):
         """Create settings tab (admin only)"""
@@ -1168,11 +1335,69 @@ class POSMainWindow(QMainWindow):
         
         layout.addStretch()
         
-        self.tabs.addTab(scroll_area, "Settings")
+        self.add_tab(scroll_area, "Settings")
         
         self.load_settings()
         self.load_users()
 
+    def open_stocktake(self):
+        dialog = StocktakeDialog(self.db, self)
+        dialog.exec()
+        self.refresh_stock_views()
+
+    def open_goods_received(self):
+        dialog = GoodsReceivedDialog(self.db, self.user, self)
+        if dialog.exec() == QDialog.Accepted:
+            self.refresh_stock_views()
+
+    def show_diagnostics(self):
+        dialog = DiagnosticsDialog(self.db, self)
+        dialog.exec()
+
+    def show_archive(self):
+        dialog = ArchiveDialog(self.db, self.db_executor, self)
+        dialog.exec()
+        self.update_reports()
+
+    def import_catalogue(self):
+        """Bulk import products and variants from a catalogue CSV"""
+        from catalogue_import import import_catalogue
+
+        filename, _ = QFileDialog.getOpenFileName(self, "Import Catalogue", "", "CSV Files (*.csv)")
+        if not filename:
+            return
+
+        progress = QProgressDialog("Importing catalogue...", "Stop", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_progress(rows):
+            progress.setLabelText(f"Imported {rows:,} rows...")
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        try:
+            result = import_catalogue(self.db, filename, progress=on_progress)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Import Error", f"Failed to import catalogue: {str(e)}")
+            return
+        finally:
+            progress.close()
+
+        message = (f"Added {result['inserted']:,} and updated {result['updated']:,} variants "
+                   f"in {result['elapsed']:.1f}s.")
+        if result['rejected']:
+            message += f"\n\n{result['rejected']:,} rows were rejected; see {result['rejects_path']}"
+        QMessageBox.information(self, "Import Catalogue", message)
+        self.refresh_stock_views()
+
+    def refresh_stock_views(self):
+        """Reload the tabs that show stock levels"""
+        if hasattr(self, 'products_mgmt_table'):
+            self.refresh_products_table()
+        if hasattr(self, 'products_stack'):
+            self.load_products()
+
     def open_settings_dialog(self):
         dialog = SettingsDialog(self.db, self)
         dialog.exec()
@@ -1190,75 +1415,35 @@ class POSMainWindow(QMainWindow):
             
     def load_products(self, products=None):
         """Load products into both grid and table views"""
+        versions = None  # Search results; the next full load always runs
         if products is None:
+            versions = self.changes.versions(CATALOGUE_TABLES)
+            if versions == self.grid_versions:
+                return  # Already showing the whole catalogue as it is in the database
             products = self.db.get_products_with_variants()
-        
-        # Clear existing items
-        for i in reversed(range(self.grid_layout.count())):
-            self.grid_layout.itemAt(i).widget().setParent(None)
+        self.grid_versions = versions
+        
+        # Clear existing items; setParent(None) alone left the detached cards alive
+        while self.grid_layout.count():
+            card = self.grid_layout.takeAt(0).widget()
+            if card:
+                card.hide()
+                card.deleteLater()
             
         self.products_table.setRowCount(0)
         self.products_table.setColumnCount(5)
         self.products_table.setHorizontalHeaderLabels(['Product', 'Variant', 'Price', 'Stock', 'Action'])
         
-        # Populate grid view
-        row, col = 0, 0
-        for product in products:
-            if product['variant_id'] is None:
-                continue
-                
-            # Create product card
-            card = QFrame()
-            card.setFrameStyle(QFrame.Box)
-            card.setFixedSize(200, 125)
-            card.setStyleSheet("""
-                QFrame {
-                    border: 1px solid #ddd;
-                    border-radius: 8px;
-                    background-color: white;
-                    margin: 2px;
-                }
-                QFrame:hover {
-                    border: 2px solid #007bff;
-                }
-            """)
-            
-            card_layout = QVBoxLayout()
-            
-            name_label = QLabel(f"{product['product_name']}")
-            name_label.setWordWrap(True)
-            card_layout.addWidget(name_label)
-            
-            # Variant and price (inclusive of tax)
-            price_with_tax = self.get_price_with_tax(product['price'])
-            variant_label = QLabel(f"{product['variant_name']} - {self.db.get_setting('currency_symbol')}{price_with_tax:.2f}")
-            variant_label.setStyleSheet("color: #666;")
-            card_layout.addWidget(variant_label)
-            
-            # Stock
-            stock_color = "#28a745" if product['stock_quantity'] > product['reorder_level'] else "#ffc107" if product['stock_quantity'] > 0 else "#dc3545"
-            stock_label = QLabel(f"Stock: {product['stock_quantity']}")
-            stock_label.setStyleSheet(f"color: {stock_color};")
-            card_layout.addWidget(stock_label)
+        # Read once rather than one settings query per label
+        currency_symbol = self.currency_symbol
+
+        # Populate grid view in batches so the register is usable while cards are added
+        self.grid_fill_generation = getattr(self, 'grid_fill_generation', 0) + 1
+        grid_products = [p for p in products if p['variant_id'] is not None]
+        self.fill_product_grid(grid_products, 0, self.grid_fill_generation, currency_symbol)
 
-            card_layout.addStretch() 
-            
-            # Add to cart button
-            add_btn = QPushButton("Add to Cart")
-            add_btn.setStyleSheet("padding: 4px;")
-            add_btn.clicked.connect(lambda checked, p=product: self.add_to_cart(p))
-            card_layout.addWidget(add_btn)
-            
-            card.setLayout(card_layout)
-            self.grid_layout.addWidget(card, row, col)
-            
-            col += 1
-            if col >= 4:  # 4 columns
-                col = 0
-                row += 1
-                
         # Populate table view
-        self.products_table.setRowCount(len([p for p in products if p['variant_id'] is not None]))
+        self.products_table.setRowCount(len(grid_products))
         row_idx = 0
         for product in products:
             if product['variant_id'] is None:
@@ -1267,7 +1452,7 @@ class POSMainWindow(QMainWindow):
             price_with_tax = self.get_price_with_tax(product['price'])
             self.products_table.setItem(row_idx, 0, QTableWidgetItem(product['product_name']))
             self.products_table.setItem(row_idx, 1, QTableWidgetItem(product['variant_name'] or ''))
-            self.products_table.setItem(row_idx, 2, QTableWidgetItem(f"{self.db.get_setting('currency_symbol')}{price_with_tax:.2f}"))
+            self.products_table.setItem(row_idx, 2, QTableWidgetItem(f"{currency_symbol}{price_with_tax:.2f}"))
             self.products_table.setItem(row_idx, 3, QTableWidgetItem(str(product['stock_quantity'])))
             
             add_btn = QPushButton("Add")
@@ -1276,6 +1461,63 @@ class POSMainWindow(QMainWindow):
             
             row_idx += 1
             
+    def fill_product_grid(self, products, start, generation, currency_symbol):
+        """Add one batch of product cards, then schedule the next batch"""
+        if generation != self.grid_fill_generation:
+            return  # A newer load_products call has taken over
+        end = min(start + GRID_FILL_BATCH, len(products))
+        for index in range(start, end):
+            card = self.create_product_card(products[index], currency_symbol)
+            self.grid_layout.addWidget(card, index // 4, index % 4)  # 4 columns
+        if end < len(products):
+            QTimer.singleShot(0, lambda: self.fill_product_grid(products, end, generation, currency_symbol))
+
+    def create_product_card(self, product, currency_symbol):
+        card = QFrame()
+        card.setFrameStyle(QFrame.Box)
+        card.setFixedSize(200, 125)
+        card.setStyleSheet("""
+            QFrame {
+                border: 1px solid #ddd;
+                border-radius: 8px;
+                background-color: white;
+                margin: 2px;
+            }
+            QFrame:hover {
+                border: 2px solid #007bff;
+            }
+        """)
+        
+        card_layout = QVBoxLayout()
+        
+        name_label = QLabel(f"{product['product_name']}")
+        name_label.setWordWrap(True)
+        card_layout.addWidget(name_label)
+        
+        # Variant and price (inclusive of tax)
+        price_with_tax = self.get_price_with_tax(product['price'])
+        variant_label = QLabel(f"{product['variant_name']} - {currency_symbol}{price_with_tax:.2f}")
+        variant_label.setStyleSheet("color: #666;")
+        card_layout.addWidget(variant_label)
+        
+        # Stock
+        stock_color = "#28a745" if product['stock_quantity'] > product['reorder_level'] else "#ffc107" if product['stock_quantity'] > 0 else "#dc3545"
+        stock_label = QLabel(f"Stock: {product['stock_quantity']}")
+        stock_label.setStyleSheet(f"color: {stock_color};")
+        card_layout.addWidget(stock_label)
+
+        card_layout.addStretch() 
+        
+        # Add to cart button
+        add_btn = QPushButton("Add to Cart")
+        add_btn.setStyleSheet("padding: 4px;")
+        add_btn.clicked.connect(lambda checked, p=product: self.add_to_cart(p))
+        card_layout.addWidget(add_btn)
+        
+        card.setLayout(card_layout)
+        return card
+
+    @profiled_action('search')
     def search_products(self):
         """Search products and handle barcode input"""
         search_term = self.search_input.text().strip()
@@ -1287,11 +1529,13 @@ class POSMainWindow(QMainWindow):
         # Check if it might be a barcode (longer string, often numeric)
         if len(search_term) > 8 and search_term.replace('-', '').isdigit():
             # Try barcode lookup
+            started = time.perf_counter()
             product = self.db.find_by_barcode(search_term)
             if product:
                 # Auto-add to cart
                 self.add_to_cart(product)
                 self.search_input.clear()
+                METRICS.record('scan_to_cart', (time.perf_counter() - started) * 1000)
                 return
                 
         # Regular search
@@ -1300,6 +1544,9 @@ class POSMainWindow(QMainWindow):
         
     def add_to_cart(self, product):
         """Add product to cart"""
+        if self.checkout_pending:
+            self.pending_scans.append(product)
+            return
         if product['stock_quantity'] <= 0:
             QMessageBox.warning(self, "Out of Stock", "This item is out of stock!")
             return
@@ -1400,6 +1647,8 @@ class POSMainWindow(QMainWindow):
 
     def add_custom_item(self):
         """Show dialog to add a custom item to the cart"""
+        if self.checkout_pending:
+            return
         dialog = QDialog(self)
         dialog.setWindowTitle("Add Custom Item")
         dialog.setFixedSize(300, 200)
@@ -1452,8 +1701,47 @@ class POSMainWindow(QMainWindow):
     def process_other_payment(self, method):
         self.process_payment(method)
 
+    def set_checkout_pending(self, pending):
+        """Lock the cart and payment buttons while a sale is being saved"""
+        self.checkout_pending = pending
+        for widget in (self.cart_table, self.cash_payment_btn, self.card_payment_btn, self.mpesa_payment_btn,
+                       self.split_payment_btn, self.clear_cart_btn):
+            widget.setEnabled(not pending)
+        if not pending:
+            scans, self.pending_scans = self.pending_scans, []
+            for product in scans:
+                self.add_to_cart(product)
+
+    def submit_sale(self, total, tax_amount, payments, items, on_committed):
+        """
+        Save the sale on the database writer thread, then call on_committed(sale_id, commit_ms).
+
+        The register stays responsive meanwhile, but the cart is locked so it
+        cannot change under the sale; products scanned in the meantime are
+        added once the sale is done.
+        """
+        self.set_checkout_pending(True)
+        started = time.perf_counter()
+        future = self.db_executor.write(self.db.commit_sale, self.current_shift['id'], total, tax_amount, 0, payments, items)
+
+        def committed(sale_id):
+            try:
+                on_committed(sale_id, (time.perf_counter() - started) * 1000)
+            finally:
+                self.set_checkout_pending(False)
+
+        def failed(error):
+            logger.error(f"Saving the sale failed: {error}", exc_info=error)
+            self.set_checkout_pending(False)
+            QMessageBox.critical(self, "Payment Error", f"The sale could not be saved and the cart was kept: {error}")
+
+        self.db_executor.then(future, committed, failed)
+
+    @profiled_action('checkout')
     def process_payment(self, method):
         """Process payment"""
+        if self.checkout_pending:
+            return
         if not self.cart_items:
             QMessageBox.warning(self, "Empty Cart", "Please add items to cart first!")
             return
@@ -1495,36 +1783,38 @@ class POSMainWindow(QMainWindow):
                 return
             payments.append({'method': method, 'amount': total, 'reference': reference})
 
-        # Process sale
-        sale_id = self.db.create_sale(
-            self.current_shift['id'], total, tax_amount, 0
-        )
-        
-        # Add sale payments
-        self.db.add_sale_payments(sale_id, payments)
-        
-        # Add sale items
-        for item in self.cart_items:
-            self.db.add_sale_item(
-                sale_id, item.get('product_id'), item.get('variant_id'),
-                item['qty'], item['price'], item['total'], item.get('name')
+        # Process sale, payments and items in one transaction
+        items = [
+            {
+                'product_id': item.get('product_id'), 'variant_id': item.get('variant_id'),
+                'qty': item['qty'], 'price': item['price'], 'subtotal': item['total'], 'name': item.get('name')
+            }
+            for item in self.cart_items
+        ]
+        def committed(sale_id, commit_ms):
+            # Show change
+            QMessageBox.information(
+                self, "Payment Complete", 
+                f"Payment successful!\nChange: {self.db.get_setting('currency_symbol')}{change:.2f}\n\nReceipt will be printed."
             )
-            
-        # Show change
-        QMessageBox.information(
-            self, "Payment Complete", 
-            f"Payment successful!\nChange: {self.db.get_setting('currency_symbol')}{change:.2f}\n\nReceipt will be printed."
-        )
-        
-        # Print receipt
-        self.print_receipt(sale_id)
-        
-        # Clear cart
-        self.cart_items.clear()
-        self.update_cart_display()
-        self.load_products()  # Refresh stock
 
+            # Print receipt
+            self.print_receipt(sale_id)
+
+            # Clear cart
+            started = time.perf_counter()
+            self.cart_items.clear()
+            self.update_cart_display()
+            self.load_products()  # Refresh stock
+            # Time the register spent on the sale, not the cashier's time in the dialogs
+            METRICS.record('checkout', commit_ms + (time.perf_counter() - started) * 1000)
+
+        self.submit_sale(total, tax_amount, payments, items, committed)
+
+    @profiled_action('checkout')
     def process_split_payment(self):
+        if self.checkout_pending:
+            return
         if not self.cart_items:
             QMessageBox.warning(self, "Empty Cart", "Please add items to cart first!")
             return
@@ -1542,33 +1832,31 @@ class POSMainWindow(QMainWindow):
         dialog = SplitPaymentDialog(total, self)
         if dialog.exec() == QDialog.Accepted:
             payments = dialog.payments
-            
-            # Process sale
-            sale_id = self.db.create_sale(
-                self.current_shift['id'], total, tax_amount, 0
-            )
-            
-            # Add sale payments
-            self.db.add_sale_payments(sale_id, payments)
 
-            # Add sale items
+            items = []
             for item in self.cart_items:
                 base_price = item['price']
                 if TAX_INCLUSIVE:
                     base_price = item['price'] / (1 + tax_rate)
                 
-                self.db.add_sale_item(
-                    sale_id, item.get('product_id'), item.get('variant_id'),
-                    item['qty'], base_price, item['qty'] * base_price
-                )
+                items.append({
+                    'product_id': item.get('product_id'), 'variant_id': item.get('variant_id'),
+                    'qty': item['qty'], 'price': base_price, 'subtotal': item['qty'] * base_price
+                })
 
-            QMessageBox.information(self, "Payment Complete", "Payment successful!")
-            
-            self.print_receipt(sale_id)
-            
-            self.cart_items.clear()
-            self.update_cart_display()
-            self.load_products()
+            def committed(sale_id, commit_ms):
+                QMessageBox.information(self, "Payment Complete", "Payment successful!")
+
+                self.print_receipt(sale_id)
+
+                started = time.perf_counter()
+                self.cart_items.clear()
+                self.update_cart_display()
+                self.load_products()
+                METRICS.record('checkout', commit_ms + (time.perf_counter() - started) * 1000)
+
+            # Process sale, payments and items in one transaction
+            self.submit_sale(total, tax_amount, payments, items, committed)
             
     def print_receipt(self, sale_id):
         """Print receipt for sale"""
@@ -1579,6 +1867,12 @@ class POSMainWindow(QMainWindow):
         
     def refresh_products_table(self):
         """Refresh products management table"""
+        if not hasattr(self, 'products_mgmt_table'):
+            return  # Products tab not built yet; it loads when first opened
+        versions = (self.show_low_stock_cb.isChecked(), self.changes.versions(CATALOGUE_TABLES))
+        if versions == self.products_table_versions:
+            return
+        self.products_table_versions = versions
         if self.show_low_stock_cb.isChecked():
             products = self.db.get_low_stock_items()
         else:
@@ -1614,6 +1908,9 @@ class POSMainWindow(QMainWindow):
             status_item = QTableWidgetItem(status)
             status_item.setForeground(QColor(color))
             self.products_mgmt_table.setItem(i, 9, status_item)
+
+            forecast_week = product.get('forecast_week')
+            self.products_mgmt_table.setItem(i, 10, QTableWidgetItem(f"{forecast_week:.1f}" if forecast_week is not None else '-'))
             
             # Actions
             actions_widget = QWidget()
@@ -1632,18 +1929,43 @@ class POSMainWindow(QMainWindow):
                 actions_layout.addWidget(edit_btn)
                 
             actions_widget.setLayout(actions_layout)
-            self.products_mgmt_table.setCellWidget(i, 10, actions_widget)
+            self.products_mgmt_table.setCellWidget(i, 11, actions_widget)
             
+    def update_forecasts(self):
+        """Fold newly closed sales days into the demand forecasts on the database writer thread"""
+        try:
+            from forecast import run_forecast
+            future = self.db_executor.write(run_forecast, self.db)
+        except Exception as e:
+            self.forecasts_failed(e)
+            return
+        self.db_executor.then(future, self.forecasts_updated, self.forecasts_failed)
+
+    def forecasts_updated(self, count):
+        self.refresh_products_table()
+        QMessageBox.information(self, "Forecasts", f"Forecasts updated for {count} variants.")
+
+    def forecasts_failed(self, error):
+        QMessageBox.critical(self, "Error", f"Failed to update forecasts: {str(error)}")
+
     def show_reorder_info(self, product):
         """Show supplier reorder information"""
         msg = QMessageBox()
         msg.setWindowTitle("Re-order Information")
         msg.setIcon(QMessageBox.Information)
+
+        forecast_daily = product.get('forecast_daily')
+        if forecast_daily:
+            days_of_cover = f"{product['stock_quantity'] / forecast_daily:.1f} days"
+        else:
+            days_of_cover = "N/A"
         
         info_text = f"""
         Product: {product['product_name']} ({product['variant_name']})
         Current Stock: {product['stock_quantity']}
         Reorder Level: {product['reorder_level']}
+        Forecast Demand (7 days): {product.get('forecast_week') or 0:.1f}
+        Days of Cover: {days_of_cover}
         
         Supplier Information:
         Name: {product.get('supplier_name', 'N/A')}
@@ -1689,9 +2011,55 @@ REVENUE BY PAYMENT METHOD
         self.report_text.setText(report_text)
         
     def export_report_csv(self):
-        """Export report to CSV"""
-        # TODO: Implement CSV export
-        QMessageBox.information(self, "Export", "CSV export functionality will be implemented here.")
+        """Export report data to CSV or JSON Lines on a background thread"""
+        from report_export import ExportWorker, REPORT_TITLES
+
+        if getattr(self, 'export_worker', None) and self.export_worker.isRunning():
+            QMessageBox.information(self, "Export", "An export is already running.")
+            return
+
+        title, ok = QInputDialog.getItem(self, "Export Data", "Report:", list(REPORT_TITLES.values()), 0, False)
+        if not ok:
+            return
+        report = next(key for key, value in REPORT_TITLES.items() if value == title)
+
+        start_date, end_date = self.get_report_date_range()
+        os.makedirs(REPORTS_EXPORT_DIR, exist_ok=True)
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Export Data",
+            os.path.join(REPORTS_EXPORT_DIR, f"{report}_{start_date}_to_{end_date}.csv"),
+            "CSV Files (*.csv);;JSON Lines (*.jsonl)"
+        )
+        if not filename:
+            return
+
+        # Non-modal so the register stays usable while the file is written
+        self.export_progress = QProgressDialog(f"Exporting {title}...", "Cancel", 0, 0, self)
+        self.export_progress.setWindowModality(Qt.NonModal)
+        self.export_progress.setMinimumDuration(0)
+
+        self.export_worker = ExportWorker(self.db, report, start_date, end_date, filename, self)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.completed.connect(self.on_export_completed)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_progress.canceled.connect(self.export_worker.cancel)
+        self.export_worker.finished.connect(self.export_worker.deleteLater)
+        self.export_worker.start()
+
+    def on_export_progress(self, rows, total):
+        self.export_progress.setMaximum(max(total, 1))
+        self.export_progress.setValue(min(rows, total))
+        self.export_progress.setLabelText(f"Exported {rows:,} of {total:,} rows...")
+
+    def on_export_completed(self, path, rows):
+        self.export_worker = None
+        self.export_progress.close()
+        QMessageBox.information(self, "Export Complete", f"Exported {rows:,} rows to {path}")
+
+    def on_export_failed(self, message):
+        self.export_worker = None
+        self.export_progress.close()
+        QMessageBox.warning(self, "Export", message)
         
     def load_settings(self):
         """Load settings into form"""
@@ -1727,7 +2095,10 @@ REVENUE BY PAYMENT METHOD
         else: # Medium
             font_size = 15
         
-        self.app.setStyleSheet(f"* {{ font-size: {font_size}px; }}")
+        style_sheet = f"* {{ font-size: {font_size}px; }}"
+        # Restyling every live widget is expensive; skip it when nothing changed
+        if self.app.styleSheet() != style_sheet:
+            self.app.setStyleSheet(style_sheet)
         
     def save_settings(self):
         """Save settings"""
@@ -1991,6 +2362,7 @@ REVENUE BY PAYMENT METHOD
         for idx in sorted(selected, reverse=True):
             self.variants_table.removeRow(idx.row())
             
+    @profiled_action('save_product')
     def save_product(self, dialog):
         """Save the product and its variants"""
         # Validate inputs
@@ -2252,6 +2624,7 @@ REVENUE BY PAYMENT METHOD
         dialog.setLayout(layout)
         dialog.exec()
 
+    @profiled_action('save_product')
     def save_edited_product(self, dialog, product_id):
         """Save the edited product and its variants"""
         # Validate inputs
@@ -2341,13 +2714,13 @@ REVENUE BY PAYMENT METHOD
         )
         
         if filename:
-            import shutil
             try:
-                shutil.copy2(self.db.db_path, filename)
+                self.db.backup_database(filename)
                 QMessageBox.information(self, "Backup", "Database backed up successfully!")
             except Exception as e:
                 QMessageBox.critical(self, "Backup Error", f"Failed to backup database: {str(e)}")
                 
+    @profiled_action('close_shift')
     def close_shift(self):
         """Close current shift"""
         if not self.current_shift:
@@ -2367,6 +2740,21 @@ REVENUE BY PAYMENT METHOD
             
             eod_dialog = EndOfDayDialog(self.db, shift_data, self)
             eod_dialog.exec()
+
+            # Keep stock-as-of queries bounded to a short ledger tail, and fold the closed
+            # days into the demand forecasts; both run on the writer while the next shift starts
+            snapshot = self.db_executor.write(self.db.maybe_create_stock_snapshot)
+            self.db_executor.then(snapshot, lambda _: None,
+                                  lambda error: logger.error(f"Stock snapshot failed: {error}", exc_info=error))
+            try:
+                from forecast import run_forecast
+                forecast = self.db_executor.write(run_forecast, self.db)
+                self.db_executor.then(forecast, lambda _: None,
+                                      lambda error: logger.error(f"Forecast update failed: {error}", exc_info=error))
+            except Exception as e:
+                logger.exception(f"Forecast update failed: {e}")
+            # Between shifts is a good time for maintenance; opening the next shift interrupts it
+            self.maintenance.run_now()
             
             # Restart shift
             self.current_shift = None
@@ -2404,10 +2792,16 @@ REVENUE BY PAYMENT METHOD
 
 
 class POSApplication:
+    @startup_trace.traced("POSApplication.__init__")
     def __init__(self):
-        self.app = QApplication(sys.argv)
-        self.db = POSDatabase()
-        self.db.init_database()
+        with startup_trace.phase("QApplication"):
+            self.app = QApplication(sys.argv)
+        with startup_trace.phase("start_watchdog"):
+            self.watchdog = start_watchdog(self.app)
+        with startup_trace.phase("POSDatabase"):
+            self.db = POSDatabase()
+        with startup_trace.phase("init_database"):
+            self.db.init_database()
         
         # Set application properties
         self.app.setApplicationName("POS System")
@@ -2428,7 +2822,9 @@ class POSApplication:
         
     def run(self):
         """Run the application"""
-        if not user_auth.check_syscfg_exists():
+        with startup_trace.phase("check_syscfg_exists"):
+            activated = user_auth.check_syscfg_exists()
+        if not activated:
             reply = QMessageBox.question(None, "First-Time Setup", 
                                            "This application is not activated. Do you want to perform first-time setup?",
                                            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
@@ -2440,16 +2836,21 @@ class POSApplication:
 
         while True:
             # Show login dialog
-            login_dialog = LoginDialog(self.db)
-            if login_dialog.exec() != QDialog.Accepted:
+            with startup_trace.phase("LoginDialog"):
+                login_dialog = LoginDialog(self.db)
+            with startup_trace.phase("LoginDialog.exec", 'wait'):
+                accepted = login_dialog.exec() == QDialog.Accepted
+            if not accepted:
                 break
                 
             # Create main window
-            main_window = POSMainWindow(self.app, self.db, login_dialog.user)
-            main_window.show()
+            with startup_trace.phase("POSMainWindow"):
+                main_window = POSMainWindow(self.app, self.db, login_dialog.user)
+                main_window.show()
             
             # Run event loop
             self.app.exec()
+            main_window.close_database()
             
             # Check if we should continue (logout vs exit)
             if not hasattr(main_window, 'should_logout') or not main_window.should_logout:
@@ -2520,7 +2921,10 @@ class POSApplication:
 
 
 if __name__ == '__main__':
-    print("--- SCRIPT START ---")
+    # Report rendering runs in a worker process; needed for frozen builds
+    multiprocessing.freeze_support()
+    setup_logging()
+    logger.info("--- SCRIPT START ---")
     app = POSApplication()
     sys.exit(app.run())
  
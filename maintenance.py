@@ -0,0 +1,271 @@
+"""
+Idle-time database maintenance.
+
+MaintenanceScheduler watches for keyboard and mouse input. Once the register
+has been idle for MAINTENANCE_CONFIG['idle_minutes'], or right after a shift
+is closed, it works through the steps below one bounded piece at a time:
+
+    rollups      catch the daily sales rollups up to yesterday, a month per piece
+    optimize     ANALYZE the first time, PRAGMA optimize after that, once a day
+    quick_check  PRAGMA quick_check, one table per piece, once a day
+    vacuum       PRAGMA incremental_vacuum, 'vacuum_pages_per_step' pages per piece
+    warm_cache   read the catalogue and recent sales so the first scan is fast
+
+Each piece is a DatabaseExecutor.exclusive() job with its own connection.
+A progress handler on that connection aborts the running statement as soon
+as a key is pressed, so a sale never waits behind maintenance for more than
+a moment; the interrupted piece is rolled back and redone at the next idle
+period.
+
+Databases created before incremental vacuum was turned on are switched over
+with one full VACUUM once they have enough free pages, if they are smaller
+than 'convert_max_mb'. Larger ones are left alone; switch them with
+
+    python maintenance.py [--db PATH]
+
+which also runs every step to completion.
+"""
+
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from PySide6.QtCore import QEvent, QObject, QTimer
+from PySide6.QtWidgets import QApplication
+
+from config import DATABASE_PATH, MAINTENANCE_CONFIG
+from db import utc_now
+
+logger = logging.getLogger(__name__)
+
+_INPUT_EVENTS = (QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.Wheel, QEvent.TouchBegin)
+
+
+def _due(db, key: str, interval_hours: float) -> bool:
+    last = db.get_setting(key)
+    return not last or datetime.now() - datetime.fromisoformat(last) >= timedelta(hours=interval_hours)
+
+
+def _mark_done(db, key: str):
+    db.set_setting(key, datetime.now().isoformat(timespec='seconds'))
+
+
+def refresh_rollups(db, conn, state: Dict) -> bool:
+    yesterday = (utc_now() - timedelta(days=1)).strftime("%Y-%m-%d")  # Sale days are UTC days
+    rolled_through = db._sales_rollup_through(conn)
+    if rolled_through is None:
+        first_sale = conn.execute("SELECT MIN(created_at) FROM sales").fetchone()[0]
+        start = datetime.strptime(first_sale[:10], "%Y-%m-%d") if first_sale else utc_now()
+    else:
+        start = datetime.strptime(rolled_through, "%Y-%m-%d") + timedelta(days=1)
+    through = min(yesterday, (start + timedelta(days=MAINTENANCE_CONFIG['rollup_days_per_step'] - 1)).strftime("%Y-%m-%d"))
+    if through >= start.strftime("%Y-%m-%d"):
+        db.refresh_sales_rollups(through)
+    return through >= yesterday
+
+
+def optimize(db, conn, state: Dict) -> bool:
+    if not _due(db, 'maintenance_optimized_at', MAINTENANCE_CONFIG['analyze_interval_hours']):
+        return True
+    conn.execute(f"PRAGMA analysis_limit = {int(MAINTENANCE_CONFIG['analysis_limit'])}")
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        conn.execute("PRAGMA optimize")
+    else:
+        conn.execute("ANALYZE")  # PRAGMA optimize only refreshes statistics that already exist
+    conn.commit()
+    _mark_done(db, 'maintenance_optimized_at')
+    return True
+
+
+def quick_check(db, conn, state: Dict) -> bool:
+    if 'quick_check_tables' not in state:
+        if not _due(db, 'maintenance_checked_at', MAINTENANCE_CONFIG['quick_check_interval_hours']):
+            return True
+        state['quick_check_tables'] = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    tables = state['quick_check_tables']
+    if tables:
+        problems = [row[0] for row in conn.execute(f'PRAGMA quick_check("{tables[0]}")').fetchall()]
+        if problems != ['ok']:
+            logger.error(f"Integrity check of {tables[0]} found problems: {'; '.join(problems[:10])}")
+        tables.pop(0)
+    if tables:
+        return False
+    del state['quick_check_tables']
+    _mark_done(db, 'maintenance_checked_at')
+    return True
+
+
+def incremental_vacuum(db, conn, state: Dict) -> bool:
+    if db.in_memory:
+        return True
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        size_mb = conn.execute("PRAGMA page_count").fetchone()[0] * page_size / 1024 / 1024
+        if free_pages >= MAINTENANCE_CONFIG['min_free_pages'] and size_mb <= MAINTENANCE_CONFIG['convert_max_mb']:
+            logger.info(f"Switching the database to incremental vacuum ({size_mb:.0f} MB, {free_pages} free pages)")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        return True
+    if free_pages:
+        # Each step of the statement frees one page, and execute() steps once; executescript() runs it to the end
+        conn.executescript(f"PRAGMA incremental_vacuum({int(MAINTENANCE_CONFIG['vacuum_pages_per_step'])})")
+    return free_pages <= MAINTENANCE_CONFIG['vacuum_pages_per_step']
+
+
+def warm_cache(db, conn, state: Dict) -> bool:
+    """Read what the first scans and reports after a quiet spell need into the OS file cache"""
+    for table in ('products', 'variants', 'categories', 'brands', 'settings'):
+        conn.execute(f"SELECT * FROM {table}").fetchall()
+    conn.execute("SELECT barcode FROM variants WHERE barcode IS NOT NULL ORDER BY barcode").fetchall()
+    since = (utc_now() - timedelta(days=30)).strftime("%Y-%m-%d")
+    conn.execute("""
+        SELECT SUM(si.qty), SUM(sp.amount) FROM sales s
+        LEFT JOIN sale_items si ON si.sale_id = s.id
+        LEFT JOIN sale_payments sp ON sp.sale_id = s.id
+        WHERE s.created_at >= ?
+    """, (since,)).fetchall()
+    return True
+
+
+STEPS = {
+    'rollups': refresh_rollups,
+    'optimize': optimize,
+    'quick_check': quick_check,
+    'vacuum': incremental_vacuum,
+    'warm_cache': warm_cache,
+}
+
+
+def run_step(db, step: str, state: Dict, cancel: threading.Event) -> bool:
+    """
+    Run one bounded piece of a step on a connection of its own; True once the step has nothing left.
+
+    Returns False without doing anything, or with the piece rolled back, once cancel is set.
+    """
+    if cancel.is_set():
+        return False
+    conn = db._connect()
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.set_progress_handler(cancel.is_set, MAINTENANCE_CONFIG['interrupt_check_ops'])
+    db.pin_connection(conn)
+    try:
+        return STEPS[step](db, db.get_connection(), state)
+    except sqlite3.OperationalError:
+        if cancel.is_set():
+            return False  # Interrupted; the piece's transaction was rolled back
+        raise
+    finally:
+        db.pin_connection(None)
+        conn.close()
+
+
+class MaintenanceScheduler(QObject):
+    """Runs the maintenance steps while the register is idle; create it on the GUI thread"""
+
+    def __init__(self, db, executor, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.executor = executor
+        self.cancel = threading.Event()
+        self.state = {}
+        self.pending = []
+        self.running = False
+        self.last_input = time.monotonic()
+        self.ran_since_input = False
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check_idle)
+
+    def start(self):
+        if not MAINTENANCE_CONFIG['enabled']:
+            return
+        QApplication.instance().installEventFilter(self)
+        self.timer.start(MAINTENANCE_CONFIG['check_interval_ms'])
+
+    def stop(self):
+        self.timer.stop()
+        self.cancel.set()
+        app = QApplication.instance()
+        if app is not None:
+            app.removeEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() in _INPUT_EVENTS:
+            self.last_input = time.monotonic()
+            self.ran_since_input = False
+            if self.running:
+                self.cancel.set()
+        return False
+
+    def check_idle(self):
+        if not self.ran_since_input and time.monotonic() - self.last_input >= MAINTENANCE_CONFIG['idle_minutes'] * 60:
+            self.run_now()
+
+    def run_now(self):
+        """Start (or resume) the steps now, e.g. after the shift is closed; input stops them again"""
+        if self.running or not MAINTENANCE_CONFIG['enabled']:
+            return
+        self.ran_since_input = True
+        self.cancel.clear()
+        if not self.pending:
+            self.pending = list(STEPS)
+        logger.debug(f"Idle maintenance started: {', '.join(self.pending)}")
+        self.next_step()
+
+    def next_step(self):
+        if self.cancel.is_set() or not self.pending:
+            self.running = False
+            if self.pending:
+                logger.debug(f"Idle maintenance interrupted before {self.pending[0]}")
+            else:
+                logger.info("Idle maintenance finished")
+            return
+        self.running = True
+        try:
+            future = self.executor.exclusive(run_step, self.db, self.pending[0], self.state, self.cancel)
+        except RuntimeError:
+            self.running = False  # Shutting down
+            return
+        self.executor.then(future, self.step_finished, self.step_failed)
+
+    def step_finished(self, done: bool):
+        if done:
+            self.pending.pop(0)
+        self.next_step()
+
+    def step_failed(self, error: Exception):
+        logger.error(f"Maintenance step {self.pending[0]} failed: {error}", exc_info=error)
+        self.pending.pop(0)
+        self.next_step()
+
+
+def main(argv=None) -> int:
+    from db import POSDatabase
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    db_path = DATABASE_PATH
+    if '--db' in argv:
+        db_path = argv[argv.index('--db') + 1]
+    db = POSDatabase(db_path)
+    db.init_database()
+    with db.get_connection() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("Switching to incremental vacuum...")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+    state = {}
+    for step in STEPS:
+        started = time.perf_counter()
+        while not run_step(db, step, state, threading.Event()):
+            pass
+        print(f"{step}: {(time.perf_counter() - started) * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Persistent performance metrics.
+
+Latencies that cashiers feel (checkout, scan-to-cart, report refresh,
+receipt printing) and every database query are recorded into per-hour
+histograms in memory; record() is a lock, a bisect and four additions. The
+main window flushes the hours to the perf_metrics table every
+METRICS_CONFIG['flush_interval_ms'], merging them with what is stored; a
+year of history is at most a few tens of thousands of small rows.
+daily_summary() turns stored hours into per-day p50/p95 for the Trends tab
+of the diagnostics view.
+"""
+
+import bisect
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from config import METRICS_CONFIG
+
+# Upper bounds in ms, roughly 1.5x apart so percentiles stay meaningful from 1 ms to a minute
+METRIC_BUCKETS_MS = (1, 1.5, 2, 3, 5, 7.5, 10, 15, 20, 30, 50, 75, 100, 150, 200, 300, 500, 750,
+                     1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000, 60000, float('inf'))
+
+METRIC_LABELS = {
+    'checkout': "Checkout (sale commit and refresh)",
+    'scan_to_cart': "Scan to cart",
+    'report_refresh': "Report refresh",
+    'print_receipt': "Receipt printing",
+    'db_query': "Database query",
+}
+
+
+def hour_key(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%d %H:00')
+
+
+def percentile_from_buckets(histogram: List[int], fraction: float) -> float:
+    """Estimate a percentile by interpolating inside the bucket that contains it"""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    target = total * fraction
+    running = 0
+    lower = 0.0
+    for bound, count in zip(METRIC_BUCKETS_MS, histogram):
+        if count and running + count >= target:
+            if bound == float('inf'):
+                return lower  # Only known to be slower than the last finite bound
+            return lower + (bound - lower) * (target - running) / count
+        running += count
+        lower = bound
+    return lower
+
+
+class MetricsRecorder:
+    """Thread-safe per-hour histograms waiting to be flushed to the database"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hours: Dict[tuple, list] = {}
+        self._pruned = False
+        self._hour = ('', 0.0)  # (hour_key of the current hour, time.time() at which it ends)
+
+    def _current_hour(self) -> str:
+        """hour_key(datetime.now()), formatted only once an hour"""
+        key, ends_at = self._hour
+        if time.time() >= ends_at:
+            now = datetime.now()
+            start = now.replace(minute=0, second=0, microsecond=0)
+            key = hour_key(now)
+            self._hour = (key, (start + timedelta(hours=1)).timestamp())
+        return key
+
+    def record(self, metric: str, elapsed_ms: float):
+        if not METRICS_CONFIG['enabled']:
+            return
+        bucket = bisect.bisect_left(METRIC_BUCKETS_MS, elapsed_ms)
+        key = (metric, self._current_hour())
+        with self._lock:
+            entry = self._hours.get(key)
+            if entry is None:
+                entry = self._hours[key] = [0, 0.0, 0.0, [0] * len(METRIC_BUCKETS_MS)]
+            entry[0] += 1
+            entry[1] += elapsed_ms
+            entry[2] = max(entry[2], elapsed_ms)
+            entry[3][bucket] += 1
+
+    def flush(self, db):
+        """Merge the pending hours into perf_metrics; pending data is kept if the write fails"""
+        with self._lock:
+            pending, self._hours = self._hours, {}
+        if pending:
+            rows = [{'metric': metric, 'hour': hour, 'count': count, 'total_ms': total_ms, 'max_ms': max_ms,
+                     'histogram': histogram}
+                    for (metric, hour), (count, total_ms, max_ms, histogram) in pending.items()]
+            try:
+                db.merge_perf_metrics(rows)
+            except Exception:
+                with self._lock:
+                    for key, entry in pending.items():
+                        current = self._hours.setdefault(key, [0, 0.0, 0.0, [0] * len(METRIC_BUCKETS_MS)])
+                        current[0] += entry[0]
+                        current[1] += entry[1]
+                        current[2] = max(current[2], entry[2])
+                        current[3] = [a + b for a, b in zip(current[3], entry[3])]
+                raise
+        if not self._pruned:
+            self._pruned = True
+            cutoff = datetime.now() - timedelta(days=METRICS_CONFIG['retention_days'])
+            db.delete_perf_metrics_before(hour_key(cutoff))
+
+
+METRICS = MetricsRecorder()
+
+
+def daily_summary(rows: List[Dict]) -> List[Dict]:
+    """Fold stored hourly rows for one metric into per-day count, p50, p95, max and mean, oldest first"""
+    days: Dict[str, list] = {}
+    for row in rows:
+        day = days.setdefault(row['hour'][:10], [0, 0.0, 0.0, [0] * len(METRIC_BUCKETS_MS)])
+        day[0] += row['count']
+        day[1] += row['total_ms']
+        day[2] = max(day[2], row['max_ms'])
+        for i, count in enumerate(row['histogram'][:len(METRIC_BUCKETS_MS)]):
+            day[3][i] += count
+    return [
+        {
+            'day': day,
+            'count': count,
+            'avg_ms': total_ms / count if count else 0.0,
+            'p50_ms': percentile_from_buckets(histogram, 0.50),
+            'p95_ms': percentile_from_buckets(histogram, 0.95),
+            'max_ms': max_ms,
+        }
+        for day, (count, total_ms, max_ms, histogram) in sorted(days.items())
+    ]
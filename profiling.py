@@ -0,0 +1,174 @@
+"""
+Opt-in per-action profiling.
+
+Named user actions (checkout, search, open_reports, refresh_reports,
+save_product, close_shift) are wrapped with @profiled_action(name). When
+profiling is on (config.ENABLE_PROFILING, --profile-actions on the command
+line, or POS_PROFILE_ACTIONS=1 in the environment, so an installed build at a
+shop can be profiled without a rebuild), every run of an action is profiled
+with cProfile and saved under PROFILING_CONFIG['output_dir'] as
+
+    <action>/<action>_<timestamp>_v<version>.prof   pstats data (pstats, snakeviz)
+    <action>/<action>_<timestamp>_v<version>.txt    readable summary
+
+Only the action's own call is profiled: work it defers to the event loop
+(such as batched grid fills) is not included, and time spent waiting in a
+modal dialog shows up under that dialog's exec(). Two profiles of the same
+action, e.g. from two versions, can be compared with
+
+    python profiling.py compare old.prof new.prof
+
+Whether or not profiling is on, the action name is passed to the stall
+watchdog so stalls are labelled with it, and each run's duration is logged
+at DEBUG level.
+"""
+
+import cProfile
+import functools
+import glob
+import inspect
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import config
+from config import APP_NAME, PROFILING_CONFIG, get_version_string
+from metrics import METRICS
+from stall_watchdog import note_action
+
+logger = logging.getLogger(__name__)
+
+_cli_enabled = '--profile-actions' in sys.argv or os.environ.get('POS_PROFILE_ACTIONS') == '1'
+_active = None  # Name of the action being profiled; cProfile cannot nest
+
+
+def is_enabled() -> bool:
+    return _cli_enabled or config.ENABLE_PROFILING
+
+
+def _max_positional_args(func) -> Optional[int]:
+    parameters = inspect.signature(func).parameters.values()
+    if any(p.kind == p.VAR_POSITIONAL for p in parameters):
+        return None
+    return sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in parameters)
+
+
+def profiled_action(name: str, metric: Optional[str] = None):
+    """
+    Decorator naming a user action; times every run and profiles it when profiling is enabled.
+
+    With metric set, each run's duration is also recorded in the performance
+    metrics; leave it unset for actions that wait on modal dialogs.
+    """
+    def decorator(func):
+        max_args = _max_positional_args(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            global _active
+            # Drop extra signal arguments, as Qt does for a slot that takes fewer than the signal sends
+            args = args[:max_args]
+            note_action(name)
+            start = time.perf_counter()
+            try:
+                if _active is not None or not is_enabled() or threading.current_thread() is not threading.main_thread():
+                    return func(*args, **kwargs)  # Nested actions belong to the outer profile
+                _active = name
+                profile = cProfile.Profile()
+                started_at = datetime.now()
+                try:
+                    return profile.runcall(func, *args, **kwargs)
+                finally:
+                    _active = None
+                    try:
+                        save_profile(name, profile, started_at, (time.perf_counter() - start) * 1000)
+                    except OSError as e:
+                        logger.warning(f"Could not save profile for {name}: {e}")
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if metric:
+                    METRICS.record(metric, elapsed_ms)
+                logger.debug(f"{name} finished", extra={'action': name, 'duration_ms': round(elapsed_ms, 1)})
+        return wrapper
+    return decorator
+
+
+def save_profile(name: str, profile: cProfile.Profile, started_at: datetime, elapsed_ms: float) -> str:
+    """Write the .prof file and its text summary, and prune old profiles of this action"""
+    directory = os.path.join(PROFILING_CONFIG['output_dir'], name)
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{name}_{started_at:%Y%m%d_%H%M%S_%f}_v{get_version_string()}")
+    profile.dump_stats(base + '.prof')
+
+    summary = io.StringIO()
+    summary.write(f"{APP_NAME} v{get_version_string()} - action '{name}'\n")
+    summary.write(f"Started {started_at.isoformat(timespec='milliseconds')}, took {elapsed_ms:.1f} ms\n")
+    summary.write(f"Python {sys.version.split()[0]} on {sys.platform}\n\n")
+    stats = pstats.Stats(profile, stream=summary)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(PROFILING_CONFIG['summary_lines'])
+    with open(base + '.txt', 'w', encoding='utf-8') as f:
+        f.write(summary.getvalue())
+
+    profiles = sorted(glob.glob(os.path.join(directory, f"{name}_*.prof")))
+    for old in profiles[:-PROFILING_CONFIG['keep_per_action']]:
+        for path in (old, old[:-len('.prof')] + '.txt'):
+            if os.path.exists(path):
+                os.remove(path)
+    return base + '.prof'
+
+
+def _function_totals(path: str) -> Tuple[Dict[Tuple[str, str], list], float]:
+    """Per-function [calls, tottime, cumtime], keyed by file name and function so line moves between versions match"""
+    stats = pstats.Stats(path)
+    totals = {}
+    for (filename, line, function), (cc, calls, tottime, cumtime, callers) in stats.stats.items():
+        key = (os.path.basename(filename), function)
+        entry = totals.setdefault(key, [0, 0.0, 0.0])
+        entry[0] += calls
+        entry[1] += tottime
+        entry[2] += cumtime
+    return totals, stats.total_tt
+
+
+def compare_profiles(old_path: str, new_path: str, limit: int = 30, stream=None):
+    """Print the functions whose cumulative time changed most between two profiles"""
+    stream = stream or sys.stdout
+    old, old_total = _function_totals(old_path)
+    new, new_total = _function_totals(new_path)
+    rows = []
+    for key in set(old) | set(new):
+        before = old.get(key, [0, 0.0, 0.0])
+        after = new.get(key, [0, 0.0, 0.0])
+        rows.append((after[2] - before[2], key, before, after))
+    rows.sort(key=lambda row: abs(row[0]), reverse=True)
+
+    stream.write(f"old: {old_path} ({old_total * 1000:.1f} ms)\n")
+    stream.write(f"new: {new_path} ({new_total * 1000:.1f} ms)\n\n")
+    stream.write(f"{'cum ms old':>11} {'cum ms new':>11} {'delta':>10} {'calls old':>10} {'calls new':>10}  function\n")
+    for delta, (filename, function), before, after in rows[:limit]:
+        stream.write(f"{before[2] * 1000:11.1f} {after[2] * 1000:11.1f} {delta * 1000:+10.1f} "
+                     f"{before[0]:10d} {after[0]:10d}  {filename}:{function}\n")
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) in (3, 4) and argv[0] == 'compare':
+        limit = int(argv[3]) if len(argv) == 4 else 30
+        compare_profiles(argv[1], argv[2], limit)
+        return 0
+    if len(argv) == 2 and argv[0] == 'show':
+        pstats.Stats(argv[1]).strip_dirs().sort_stats('cumulative').print_stats(PROFILING_CONFIG['summary_lines'])
+        return 0
+    print("Usage: python profiling.py compare OLD.prof NEW.prof [LIMIT]")
+    print("       python profiling.py show FILE.prof")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
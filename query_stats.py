@@ -0,0 +1,321 @@
+"""
+Query instrumentation for POSDatabase connections.
+
+Connections opened with factory=InstrumentedConnection time every statement,
+including the fetch that follows a SELECT, and tag it with the POSDatabase
+method (or module function) that issued it. Timings are aggregated into
+per-query latency histograms in QUERY_STATS. Statements slower than
+QUERY_STATS_CONFIG['slow_query_ms'] are kept with their parameters and
+EXPLAIN QUERY PLAN output, and logged as JSON lines to the pos.slow_queries
+logger, which LOGGING_CONFIG sends to a rotating file from the logging thread.
+A query's plan is looked up once per QUERY_STATS_CONFIG['explain_interval_s']
+and reused for its slow runs in between, so a query that is slow every time
+does not pay for a second statement every time.
+
+Instrumentation is on by default, so its steady-state cost is kept to a few
+dict lookups per statement: normalized SQL is cached per SQL string, and how
+each code object on the stack is attributed is worked out only once.
+"""
+
+import bisect
+import functools
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from types import CodeType
+from typing import Dict, List, Optional, Tuple
+
+from config import QUERY_STATS_CONFIG
+from metrics import METRICS
+
+# Upper bounds in ms; the last bucket catches everything slower
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf'))
+
+_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db.py')
+_THIS_FILE = os.path.abspath(__file__)
+_PARAM_LIST = re.compile(r'\?(\s*,\s*\?)+')
+_WHITESPACE = re.compile(r'\s+')
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+slow_log = logging.getLogger('pos.slow_queries')
+
+# Normalized SQL -> (monotonic time explained, plan)
+_plans: Dict[str, Tuple[float, Optional[List[str]]]] = {}
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and variable-length parameter lists so similar queries group together"""
+    return _PARAM_LIST.sub('?, ...', _WHITESPACE.sub(' ', sql).strip())
+
+
+# How _caller treats a frame running a given code object; worked out once per code object
+_SKIP, _DB_PUBLIC, _DB_PRIVATE, _OUTSIDE = range(4)
+_code_kinds: Dict[CodeType, Tuple[int, str]] = {}
+
+
+def _code_kind(code: CodeType) -> Tuple[int, str]:
+    kind = _code_kinds.get(code)
+    if kind is None:
+        filename = os.path.abspath(code.co_filename)
+        if filename == _THIS_FILE:
+            kind = (_SKIP, '')
+        elif filename == _DB_FILE:
+            kind = (_DB_PRIVATE if code.co_name.startswith('_') else _DB_PUBLIC, code.co_name)
+        else:
+            module = os.path.splitext(os.path.basename(filename))[0]
+            kind = (_OUTSIDE, f"{module}.{code.co_name}")
+        _code_kinds[code] = kind
+    return kind
+
+
+def _caller() -> str:
+    """Name the POSDatabase method, or module.function, that issued the query"""
+    frame = sys._getframe(1)
+    private = None
+    while frame is not None:
+        kind, name = _code_kind(frame.f_code)
+        if kind == _DB_PUBLIC:
+            return name
+        if kind == _DB_PRIVATE:
+            # Attribute private helpers like _insert_sale_items to their public caller
+            private = private or name
+        elif kind == _OUTSIDE:
+            return private or name
+        frame = frame.f_back
+    return private or '<unknown>'
+
+
+def percentile_from_histogram(buckets: List[int], fraction: float) -> float:
+    """Approximate a percentile as the upper bound of the bucket that contains it"""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    target = total * fraction
+    running = 0
+    for bound, count in zip(HISTOGRAM_BUCKETS_MS, buckets):
+        running += count
+        if running >= target:
+            return bound
+    return HISTOGRAM_BUCKETS_MS[-1]
+
+
+class QueryStats:
+    """Thread-safe aggregate of query timings plus the recent slow queries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queries: Dict[tuple, Dict] = {}
+            self.slow_queries = deque(maxlen=QUERY_STATS_CONFIG['max_slow_entries'])
+            self.started_at = datetime.now()
+
+    def record(self, method: str, sql: str, elapsed_ms: float, rows: int = 0):
+        key = (method, normalize_sql(sql))
+        bucket = bisect.bisect_right(HISTOGRAM_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            entry = self.queries.get(key)
+            if entry is None:
+                entry = self.queries[key] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                    'histogram': [0] * len(HISTOGRAM_BUCKETS_MS),
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['rows'] += rows
+            entry['histogram'][bucket] += 1
+
+    def record_slow(self, entry: Dict):
+        with self._lock:
+            self.slow_queries.append(entry)
+        slow_log.info(json.dumps(entry, default=str))
+
+    def summary(self) -> List[Dict]:
+        """Per-query stats, slowest total time first"""
+        with self._lock:
+            items = [(key, dict(entry, histogram=list(entry['histogram']))) for key, entry in self.queries.items()]
+        rows = []
+        for (method, sql), entry in items:
+            rows.append({
+                'method': method,
+                'sql': sql,
+                'count': entry['count'],
+                'total_ms': entry['total_ms'],
+                'avg_ms': entry['total_ms'] / entry['count'],
+                'p50_ms': percentile_from_histogram(entry['histogram'], 0.5),
+                'p95_ms': percentile_from_histogram(entry['histogram'], 0.95),
+                'max_ms': entry['max_ms'],
+                'rows': entry['rows'],
+                'histogram': entry['histogram'],
+            })
+        rows.sort(key=lambda r: r['total_ms'], reverse=True)
+        return rows
+
+    def get_slow_queries(self) -> List[Dict]:
+        with self._lock:
+            return list(reversed(self.slow_queries))
+
+    def export(self, path: str):
+        """Write the summary and slow queries to a JSON file"""
+        data = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'collecting_since': self.started_at.isoformat(timespec='seconds'),
+            'slow_query_ms': QUERY_STATS_CONFIG['slow_query_ms'],
+            'histogram_buckets_ms': [b if b != float('inf') else None for b in HISTOGRAM_BUCKETS_MS],
+            'queries': self.summary(),
+            'slow_queries': self.get_slow_queries(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, default=str)
+
+
+QUERY_STATS = QueryStats()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times each statement through to its first fetch.
+
+    Row-returning statements are recorded after fetchall()/fetchone(), or when
+    fetchmany() runs dry, so the time SQLite spends stepping through rows is
+    counted; anything left pending is recorded on the next execute or close.
+    """
+    _pending = None
+
+    def _start(self, sql, parameters, many=False):
+        self._finish()
+        self._pending = [sql, parameters, many, _caller(), 0.0, 0]
+
+    def _finish(self):
+        pending = self._pending
+        if pending is None:
+            return
+        self._pending = None
+        sql, parameters, many, method, elapsed_ms, rows = pending
+        QUERY_STATS.record(method, sql, elapsed_ms, rows)
+        METRICS.record('db_query', elapsed_ms)
+        if elapsed_ms >= QUERY_STATS_CONFIG['slow_query_ms']:
+            QUERY_STATS.record_slow({
+                'at': datetime.now().isoformat(timespec='milliseconds'),
+                'method': method,
+                'elapsed_ms': round(elapsed_ms, 2),
+                'rows': rows,
+                'sql': sql.strip(),
+                'params': self._describe_params(parameters, many),
+                'plan': self._explain(sql, parameters, many),
+            })
+
+    def _add_time(self, start: float, rows: int = 0):
+        if self._pending is not None:
+            self._pending[4] += (time.perf_counter() - start) * 1000
+            self._pending[5] += rows
+
+    @staticmethod
+    def _describe_params(parameters, many: bool) -> str:
+        if many:
+            count = len(parameters) if hasattr(parameters, '__len__') else '?'
+            return f"<{count} parameter sets>"
+        text = repr(parameters)
+        return text if len(text) <= 500 else text[:500] + '...'
+
+    def _explain(self, sql: str, parameters, many: bool) -> Optional[List[str]]:
+        if not QUERY_STATS_CONFIG['explain_slow_queries']:
+            return None
+        if sql.lstrip().split(None, 1)[0].upper() not in _EXPLAINABLE:
+            return None
+        key = normalize_sql(sql)
+        cached = _plans.get(key)
+        if cached is not None and time.monotonic() - cached[0] < QUERY_STATS_CONFIG['explain_interval_s']:
+            return cached[1]
+        if many:
+            if not isinstance(parameters, (list, tuple)) or not parameters:
+                return None
+            parameters = parameters[0]
+        try:
+            # A plain cursor, so the plan lookup is not itself instrumented
+            cursor = self.connection.cursor(sqlite3.Cursor)
+            plan = [row[-1] for row in cursor.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()]
+        except sqlite3.Error:
+            plan = None
+        _plans[key] = (time.monotonic(), plan)
+        return plan
+
+    def _returns_rows(self) -> bool:
+        return self.description is not None
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add_time(start)
+            if not self._returns_rows():
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        if not isinstance(seq_of_parameters, (list, tuple)):
+            seq_of_parameters = list(seq_of_parameters)
+        self._start(sql, seq_of_parameters, many=True)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add_time(start, len(seq_of_parameters))
+            self._finish()
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add_time(start, len(rows))
+        self._finish()
+        return rows
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add_time(start, 1 if row is not None else 0)
+        self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        self._add_time(start, len(rows))
+        if not rows:
+            self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass  # Interpreter shutdown or a closed connection
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose execute shortcuts and cursors are instrumented"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,129 @@
+"""
+Streaming report exports to CSV and JSON Lines.
+
+Rows are read from the SQLite cursor in batches and written as they arrive,
+so exporting a year of line items uses the same memory as exporting a day.
+ExportWorker runs an export on a background thread with progress and cancel
+so the register stays usable while a large file is written.
+"""
+
+import csv
+import json
+import os
+from decimal import Decimal
+from typing import Callable
+
+from PySide6.QtCore import QThread, Signal
+
+from config import EXPORT_CONFIG
+from db import POSDatabase, REPORT_EXPORT_QUERIES
+
+REPORT_TITLES = {
+    'transactions': "Transactions",
+    'sold_items': "Sold Items",
+    'payments': "Payments",
+    'product_sales': "Product Sales",
+}
+
+PROGRESS_EVERY_ROWS = 2000
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled part way through"""
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def export_report(db: POSDatabase, report: str, start_date: str, end_date: str, path: str,
+                  progress: Callable[[int], None] = None,
+                  cancelled: Callable[[], bool] = None) -> int:
+    """
+    Write a report export to a .csv or .jsonl file.
+
+    The file is written under a temporary name and renamed on success, so a
+    cancelled or failed export never leaves a truncated file behind.
+
+    Returns:
+        int: Number of rows written
+    """
+    columns, _ = REPORT_EXPORT_QUERIES[report]
+    jsonl = path.lower().endswith('.jsonl')
+    tmp_path = path + '.part'
+    written = 0
+
+    try:
+        with open(tmp_path, 'w', newline='', encoding=EXPORT_CONFIG['csv_encoding']) as f:
+            if jsonl:
+                def write(row):
+                    f.write(json.dumps(dict(zip(columns, row)), default=_json_default) + '\n')
+            else:
+                writer = csv.writer(f, delimiter=EXPORT_CONFIG['csv_delimiter'])
+                if EXPORT_CONFIG['include_headers']:
+                    writer.writerow(columns)
+                write = writer.writerow
+
+            for row in db.iter_report_rows(report, start_date, end_date):
+                write(row)
+                written += 1
+                if written % PROGRESS_EVERY_ROWS == 0:
+                    if cancelled and cancelled():
+                        raise ExportCancelled()
+                    if progress:
+                        progress(written)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if progress:
+        progress(written)
+    return written
+
+
+class ExportWorker(QThread):
+    """Run export_report off the UI thread"""
+    progress = Signal(int, int)  # rows written, total rows
+    completed = Signal(str, int)  # path, rows written
+    failed = Signal(str)
+
+    def __init__(self, db: POSDatabase, report: str, start_date: str, end_date: str, path: str, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.report = report
+        self.start_date = start_date
+        self.end_date = end_date
+        self.path = path
+        self._cancel = False
+
+    def cancel(self):
+        self._cancel = True
+
+    def run(self):
+        try:
+            total = self.db.count_report_rows(self.report, self.start_date, self.end_date)
+            self.progress.emit(0, total)
+            written = export_report(
+                self.db, self.report, self.start_date, self.end_date, self.path,
+                progress=lambda rows: self.progress.emit(rows, total),
+                cancelled=lambda: self._cancel
+            )
+            self.completed.emit(self.path, written)
+        except ExportCancelled:
+            self.failed.emit("Export cancelled.")
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 5:
+        print(f"Usage: python report_export.py <{'|'.join(REPORT_TITLES)}> <start> <end> <file.csv|file.jsonl>")
+        sys.exit(1)
+    rows = export_report(POSDatabase(), *sys.argv[1:5])
+    print(f"Exported {rows} rows to {sys.argv[4]}")
@@ -0,0 +1,279 @@
+"""
+Sales report PDF rendering with ReportLab platypus.
+
+Reports are rendered in a separate process so layout never blocks the UI.
+Summary, payment and top-product sections come from one consistent read
+(POSDatabase.get_report_snapshot). The transaction list is fetched a page at
+a time and each page becomes a table with a repeating header. The story holds
+one PendingTable placeholder per page, which fetches its rows only when the
+layout reaches it, so only a page or two of rows are held at once.
+
+In-memory databases cannot be opened from another process, so ReportThread
+renders those on a background thread instead.
+"""
+
+import math
+import multiprocessing
+import os
+import queue
+import threading
+from typing import Iterator, Optional
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import Flowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from config import EXPORT_CONFIG
+from db import POSDatabase
+
+PAGE_ROWS = 500
+WRAP_CHARS = 28
+PAGE_SIZES = {'A4': A4, 'LETTER': letter}
+
+
+class PendingTable(Flowable):
+    """
+    Stand-in for the next table from an iterator, fetched the first time the layout reaches it.
+
+    Placeholders are laid out in story order, so each one takes the next
+    table; once one has been drawn or split the document drops it, and its
+    rows with it.
+    """
+
+    def __init__(self, tables: Iterator):
+        super().__init__()
+        self._tables = tables
+        self._table = None
+
+    def _get(self) -> Flowable:
+        if self._table is None:
+            self._table = next(self._tables, None)
+            if self._table is None:
+                self._table = Spacer(0, 0)  # Fewer pages than counted, e.g. sales deleted since the snapshot
+        return self._table
+
+    def wrap(self, availWidth, availHeight):
+        self.width, self.height = self._get().wrap(availWidth, availHeight)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        return self._get().split(availWidth, availHeight)
+
+    def draw(self):
+        self._get().drawOn(self.canv, 0, 0)
+
+
+def _table_style(font_size: int) -> TableStyle:
+    return TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), font_size),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e9ecef')),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (-1, 1), (-1, -1), 'RIGHT'),
+    ])
+
+
+def _wrap(text: Optional[str], style: ParagraphStyle):
+    """Wrap long cell text; short text stays a plain string, which lays out far faster"""
+    text = text or ''
+    return Paragraph(escape(text), style) if len(text) > WRAP_CHARS else text
+
+
+def _transaction_tables(db: POSDatabase, start_date: str, end_date: str, max_sale_id: int,
+                        currency: str, font_size: int, width: float, progress) -> Iterator[Table]:
+    """Yield one table per page of transactions"""
+    cell_style = ParagraphStyle('cell', fontName='Helvetica', fontSize=font_size - 1, leading=font_size + 1)
+    header = ["Sale #", "Date", "Cashier", "Payments", "Reference", "Amount"]
+    col_widths = [w * width for w in (0.08, 0.18, 0.12, 0.3, 0.18, 0.14)]
+    style = _table_style(font_size - 1)
+
+    after_id = 0
+    done = 0
+    while True:
+        rows = db.get_transactions_page(start_date, end_date, max_sale_id, after_id, PAGE_ROWS)
+        if not rows:
+            return
+        data = [header]
+        for sale_id, sale_date, cashier, payments, codes, total in rows:
+            data.append([
+                str(sale_id), sale_date, cashier or '',
+                _wrap(payments, cell_style), _wrap(codes, cell_style),
+                f"{currency}{total or 0:.2f}"
+            ])
+        after_id = rows[-1][0]
+        done += len(rows)
+        progress(done)
+        yield Table(data, colWidths=col_widths, repeatRows=1, style=style)
+
+
+def render_sales_report(db: POSDatabase, start_date: str, end_date: str, path: str,
+                        currency: str = '$', store_name: str = '', progress=None) -> int:
+    """
+    Render the sales report PDF.
+
+    Args:
+        progress: Optional callable taking (transactions_done, total)
+
+    Returns:
+        int: Number of transactions in the report
+    """
+    snapshot = db.get_report_snapshot(start_date, end_date)
+    total = snapshot['num_sales']
+    report_progress = (lambda done: progress(done, total)) if progress else (lambda done: None)
+
+    page_size = PAGE_SIZES.get(str(EXPORT_CONFIG['pdf_page_size']).upper(), A4)
+    font_size = EXPORT_CONFIG['pdf_font_size']
+    styles = getSampleStyleSheet()
+    table_style = _table_style(font_size)
+    tmp_path = path + '.part'
+    doc = SimpleDocTemplate(
+        tmp_path, pagesize=page_size, leftMargin=0.75 * inch, rightMargin=0.75 * inch,
+        topMargin=0.75 * inch, bottomMargin=0.75 * inch, title=f"Sales Report {start_date} to {end_date}"
+    )
+    width = doc.width
+
+    story = []
+    title = f"Sales Report: {start_date} to {end_date}"
+    if store_name:
+        title = f"{store_name} - {title}"
+    story.append(Paragraph(title, styles['Title']))
+
+    story.append(Paragraph("Sales Summary", styles['Heading2']))
+    summary_rows = [
+        ["Total Sales", f"{currency}{snapshot['total_sales']:.2f}"],
+        ["Total Transactions", str(snapshot['num_sales'])],
+        ["Total Items Sold", str(snapshot['items_sold'])],
+        ["Total Tax", f"{currency}{snapshot['total_tax']:.2f}"],
+        ["Total Discounts", f"{currency}{snapshot['total_discounts']:.2f}"],
+        ["Profit", f"{currency}{snapshot['profit']:.2f}"],
+    ]
+    story.append(Table([["Metric", "Value"]] + summary_rows, colWidths=[width * 0.5, width * 0.3], style=table_style))
+
+    story.append(Paragraph("Payments", styles['Heading2']))
+    payment_rows = [[pm['method'], str(pm['count']), f"{currency}{pm['total']:.2f}"] for pm in snapshot['payment_methods']]
+    story.append(Table([["Method", "Payments", "Total"]] + payment_rows,
+                       colWidths=[width * 0.4, width * 0.2, width * 0.2], style=table_style))
+
+    story.append(Paragraph("Top Products", styles['Heading2']))
+    product_rows = [
+        [f"{p['product_name'] or ''} ({p['variant_name'] or ''})", str(p['total_qty']), f"{currency}{p['total_revenue']:.2f}"]
+        for p in snapshot['top_products']
+    ]
+    story.append(Table([["Product", "Quantity", "Revenue"]] + product_rows, repeatRows=1,
+                       colWidths=[width * 0.55, width * 0.15, width * 0.2], style=table_style))
+
+    story.append(Spacer(1, 0.2 * inch))
+    story.append(Paragraph("Detailed Transactions", styles['Heading2']))
+
+    tables = _transaction_tables(db, start_date, end_date, snapshot['max_sale_id'], currency, font_size, width, report_progress)
+    story.extend(PendingTable(tables) for _ in range(math.ceil(total / PAGE_ROWS)))
+    try:
+        doc.build(story)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    report_progress(total)
+    return total
+
+
+def _render_to_queue(db: POSDatabase, start_date, end_date, path, currency, store_name, messages, cancelled=None):
+    """Render, reporting progress and the result through messages; stops at the next page once cancelled is set"""
+    def progress(done, total):
+        if cancelled is not None and cancelled.is_set():
+            raise InterruptedError("Report cancelled")
+        messages.put(('progress', done, total))
+
+    try:
+        total = render_sales_report(db, start_date, end_date, path, currency, store_name, progress=progress)
+        messages.put(('done', path, total))
+    except Exception as e:
+        messages.put(('error', str(e), 0))
+
+
+def _render_in_process(db_path, start_date, end_date, path, currency, store_name, messages):
+    """Worker process entry point"""
+    _render_to_queue(POSDatabase(db_path), start_date, end_date, path, currency, store_name, messages)
+
+
+def _latest_message(messages) -> Optional[tuple]:
+    """Drain progress messages, stopping at the result if it has arrived"""
+    latest = None
+    while True:
+        try:
+            latest = messages.get_nowait()
+        except queue.Empty:
+            break
+        if latest[0] != 'progress':
+            break
+    return latest
+
+
+class ReportProcess:
+    """Render a sales report in a separate process; poll() from a UI timer"""
+
+    def __init__(self, db: POSDatabase, start_date: str, end_date: str, path: str,
+                 currency: str = '$', store_name: str = ''):
+        if db.in_memory:
+            raise ValueError("An in-memory database cannot be opened from another process; use ReportThread")
+        # Spawn rather than fork: forking a process with a running Qt app is unsafe
+        context = multiprocessing.get_context('spawn')
+        self.path = path
+        self.messages = context.Queue()
+        self.process = context.Process(
+            target=_render_in_process,
+            args=(db.db_path, start_date, end_date, path, currency, store_name, self.messages),
+            daemon=True
+        )
+
+    def start(self):
+        self.process.start()
+
+    def poll(self) -> Optional[tuple]:
+        """Return the latest message, if any: ('progress', done, total), ('done', path, total) or ('error', message, 0)"""
+        latest = _latest_message(self.messages)
+        if latest is None and not self.process.is_alive() and self.process.exitcode not in (None, 0):
+            return ('error', f"Report process exited with code {self.process.exitcode}", 0)
+        return latest
+
+    def cancel(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        if os.path.exists(self.path + '.part'):
+            os.remove(self.path + '.part')
+
+
+class ReportThread:
+    """ReportProcess's interface on a background thread, for in-memory databases"""
+
+    def __init__(self, db: POSDatabase, start_date: str, end_date: str, path: str,
+                 currency: str = '$', store_name: str = ''):
+        self.path = path
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(
+            target=_render_to_queue,
+            args=(db, start_date, end_date, path, currency, store_name, self.messages, self.cancelled),
+            name='report-pdf', daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def poll(self) -> Optional[tuple]:
+        """Same messages as ReportProcess.poll()"""
+        alive = self.thread.is_alive()  # Checked first, so a finished thread's last message is already queued
+        latest = _latest_message(self.messages)
+        if latest is None and not alive:
+            return ('error', "Report thread stopped", 0)
+        return latest
+
+    def cancel(self):
+        """Ask the thread to stop after the page being laid out; poll() reports when it has"""
+        self.cancelled.set()
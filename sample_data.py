@@ -0,0 +1,448 @@
+"""
+Synthetic dataset generator for reproducing production-scale behaviour.
+
+Builds a complete store history into a new database: a catalogue with
+Zipf-distributed product popularity, cashiers working two shifts a day, and
+years of sales with realistic basket sizes, split payments, discounts and
+weekly, yearly and payday seasonality. Stock is tracked as sales happen and
+low items are restocked through goods receipts, so the stock ledger, stock
+levels and reports all agree.
+
+Output is fully determined by the profile, seed and end date. Ids are
+allocated in Python and rows are written with executemany in large
+transactions, with secondary indexes built once at the end, so the 'large'
+profile (about 10 million sale lines) builds in minutes.
+"""
+
+import hashlib
+import json
+import math
+import random
+import sqlite3
+import string
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db import POSDatabase
+
+PROFILES = {
+    # products, max variants per product, days of history, average sales per day, cashiers
+    'small': {'products': 200, 'max_variants': 3, 'days': 90, 'sales_per_day': 150, 'cashiers': 3},
+    'medium': {'products': 2000, 'max_variants': 4, 'days': 365, 'sales_per_day': 800, 'cashiers': 6},
+    'large': {'products': 20000, 'max_variants': 4, 'days': 3 * 365, 'sales_per_day': 2600, 'cashiers': 12},
+}
+
+BATCH_LINES = 200000  # Sale lines buffered before a write; each write is one transaction
+ZIPF_EXPONENT = 1.07
+MEAN_BASKET_LINES = 3.5
+CASHIER_PASSWORD = "cashier123"
+
+CATEGORIES = [
+    "Grains", "Oil", "Bakery", "Dairy", "Sweeteners", "Beverages", "Cleaning", "Snacks",
+    "Personal Care", "Canned Foods", "Frozen", "Spices", "Baby Care", "Household", "Stationery",
+]
+PRODUCT_WORDS = [
+    "Rice", "Flour", "Oil", "Bread", "Milk", "Sugar", "Tea", "Coffee", "Soap", "Juice", "Biscuits",
+    "Crisps", "Toothpaste", "Lotion", "Beans", "Tomatoes", "Peas", "Chicken", "Salt", "Pepper",
+    "Nappies", "Detergent", "Tissue", "Pens", "Butter", "Yoghurt", "Cereal", "Noodles", "Jam", "Water",
+]
+PRODUCT_ADJECTIVES = [
+    "Premium", "Classic", "Fresh", "Golden", "Pure", "Family", "Organic", "Daily", "Royal", "Super",
+]
+VARIANT_SIZES = ["250g", "500g", "1kg", "2kg", "5kg", "200ml", "500ml", "1L", "2L", "Single", "6 Pack", "12 Pack"]
+
+# Trading hours 08:00-20:59 with lunch and after-work peaks
+HOUR_WEIGHTS = [4, 6, 8, 9, 12, 11, 8, 7, 8, 10, 12, 10, 6]
+FIRST_HOUR = 8
+SHIFT_CHANGE_HOUR = 14
+CLOSING_HOUR = 21
+WEEKDAY_FACTORS = [0.85, 0.9, 0.95, 1.0, 1.15, 1.3, 1.05]  # Mon..Sun
+PAYMENT_METHODS = ["Cash", "Mpesa", "Card"]
+PAYMENT_WEIGHTS = [60, 30, 10]
+SPLIT_PAYMENT_RATE = 0.05
+DISCOUNT_RATE = 0.03
+OPENING_CASH = 5000.0
+
+
+def _ean13(number: int) -> str:
+    """Build a valid EAN-13 from a 12-digit sequence number"""
+    digits = f"{number:012d}"
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return digits + str((10 - total % 10) % 10)
+
+
+class DatasetGenerator:
+    def __init__(self, db_path: str, profile: str = 'small', seed: int = 42, end_date: Optional[date] = None,
+                 progress: Callable[[int, int], None] = None, **overrides):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown profile '{profile}'; choose from {', '.join(PROFILES)}")
+        self.db_path = db_path
+        self.settings = dict(PROFILES[profile], **overrides)
+        self.rng = random.Random(seed)
+        self.end_date = end_date or date.today()
+        self.start_date = self.end_date - timedelta(days=self.settings['days'] - 1)
+        self.progress = progress
+        self.tax_rate = 0.0
+        self.counts = {'products': 0, 'variants': 0, 'sales': 0, 'sale_items': 0, 'payments': 0, 'receipts': 0}
+
+        # Catalogue state, indexed by position in self.variants
+        self.variants: List[Tuple] = []  # (variant_id, product_id, supplier_id, price, cost, display, product, variant, brand)
+        self.cumulative_weights: List[float] = []
+        self.stock: List[int] = []
+        self.reorder_levels: List[int] = []
+        self.restock_targets: List[int] = []
+        self.cashier_ids: List[int] = []
+        self.next_ids: Dict[str, int] = {}
+        self._clear_batch()
+
+    def _clear_batch(self):
+        self.batch = {
+            'shifts': [], 'sales': [], 'sale_payments': [], 'sale_items': [],
+            'stock_movements': [], 'goods_receipts': [], 'goods_receipt_items': [],
+        }
+
+    def _next_id(self, table: str) -> int:
+        new_id = self.next_ids[table]
+        self.next_ids[table] = new_id + 1
+        return new_id
+
+    def generate(self) -> Dict:
+        """Build the dataset and return row counts plus the elapsed time"""
+        started = time.perf_counter()
+        db = POSDatabase(self.db_path)
+        db.init_database()
+        self.tax_rate = float(db.get_setting('tax_rate') or '0') / 100
+
+        # Bulk writes bypass query instrumentation; per-batch timings would only flood the slow log
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]:
+                raise ValueError(f"{self.db_path} already has products; generate into a new database")
+            # A throwaway build database can skip durability until it is complete
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA journal_mode = MEMORY")
+            conn.execute("PRAGMA cache_size = -200000")
+            self._drop_secondary_indexes(conn)
+            self._allocate_ids(conn)
+            self._create_cashiers(conn)
+            self._create_catalogue(conn)
+            self._create_history(conn)
+            conn.executemany(
+                "UPDATE variants SET stock_quantity = ? WHERE id = ?",
+                [(self.stock[i], v[0]) for i, v in enumerate(self.variants)]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        # Recreate the indexes dropped above, and refresh planner statistics
+        db.init_database()
+        with db.get_connection() as conn:
+            conn.execute("ANALYZE")
+        self.counts['elapsed'] = time.perf_counter() - started
+        return self.counts
+
+    def _drop_secondary_indexes(self, conn):
+        """Drop indexes on bulk-loaded tables; init_database() recreates them in one pass"""
+        for (name,) in conn.execute(
+            """
+            SELECT name FROM sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL
+              AND tbl_name IN ('sales', 'sale_items', 'sale_payments', 'stock_movements', 'goods_receipt_items')
+            """
+        ).fetchall():
+            conn.execute(f'DROP INDEX "{name}"')
+
+    def _allocate_ids(self, conn):
+        for table in ('users', 'brands', 'categories', 'suppliers', 'products', 'variants', 'shifts', 'sales',
+                      'sale_payments', 'sale_items', 'stock_movements', 'goods_receipts', 'goods_receipt_items'):
+            self.next_ids[table] = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0] + 1
+
+    def _create_cashiers(self, conn):
+        password_hash = hashlib.sha256(CASHIER_PASSWORD.encode()).hexdigest()
+        permissions = json.dumps(["Can access sales tab"])
+        existing = {row[0]: row[1] for row in conn.execute("SELECT username, id FROM users")}
+        users = []
+        for n in range(1, self.settings['cashiers'] + 1):
+            username = f"cashier{n:02d}"
+            if username in existing:
+                self.cashier_ids.append(existing[username])
+                continue
+            user_id = self._next_id('users')
+            users.append((user_id, username, password_hash, 'cashier', permissions))
+            self.cashier_ids.append(user_id)
+        conn.executemany("INSERT INTO users (id, username, password_hash, role, permissions) VALUES (?, ?, ?, ?, ?)", users)
+        conn.commit()
+
+    def _create_catalogue(self, conn):
+        rng = self.rng
+        products = self.settings['products']
+        category_ids = {}
+        for name in CATEGORIES:
+            category_ids[name] = self._next_id('categories')
+        brand_names = [f"{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(string.ascii_uppercase)}{n:03d}"
+                       for n in range(max(products // 10, 1))]
+        brand_ids = [self._next_id('brands') for _ in brand_names]
+        supplier_ids = [self._next_id('suppliers') for _ in range(max(products // 50, 2))]
+
+        # The catalogue predates the history, which also keeps rebuilds byte-for-byte reproducible
+        opening = self.start_date.strftime('%Y-%m-%d 07:00:00')
+        conn.executemany("INSERT INTO categories (id, name, created_at) VALUES (?, ?, ?)",
+                         [(i, n, opening) for n, i in category_ids.items()])
+        conn.executemany("INSERT INTO brands (id, name, created_at) VALUES (?, ?, ?)",
+                         [(i, n, opening) for i, n in zip(brand_ids, brand_names)])
+        conn.executemany(
+            "INSERT INTO suppliers (id, name, phone, email, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(i, f"Supplier {n + 1:03d}", f"+254-700-{rng.randint(0, 999999):06d}", f"orders{n + 1}@supplier.example", opening)
+             for n, i in enumerate(supplier_ids)]
+        )
+
+        product_rows, variant_rows = [], []
+        barcode = 600000000000
+        for n in range(products):
+            product_id = self._next_id('products')
+            brand_index = rng.randrange(len(brand_ids))
+            supplier_id = rng.choice(supplier_ids)
+            name = f"{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_WORDS)} {n + 1}"
+            product_rows.append((product_id, name, brand_ids[brand_index], category_ids[rng.choice(CATEGORIES)],
+                                 supplier_id, opening))
+
+            base_price = round(math.exp(rng.gauss(4.6, 0.9)), 0)  # Median around 100, long tail of expensive items
+            sizes = sorted(rng.sample(range(len(VARIANT_SIZES)), rng.randint(1, self.settings['max_variants'])))
+            for step, size in enumerate(sizes):
+                variant_id = self._next_id('variants')
+                price = max(round(base_price * (1 + 0.8 * step), 0), 5.0)
+                cost = round(price * rng.uniform(0.6, 0.85), 2)
+                barcode += 1
+                variant_name = VARIANT_SIZES[size]
+                variant_rows.append((variant_id, product_id, variant_name, price, cost, _ean13(barcode), opening))
+                self.variants.append((variant_id, product_id, supplier_id, price, cost,
+                                      f"{name} ({variant_name})", name, variant_name, brand_names[brand_index]))
+
+        # Zipf popularity over a random ordering, so popularity is not tied to id
+        ranks = list(range(1, len(self.variants) + 1))
+        rng.shuffle(ranks)
+        weights = [1 / rank ** ZIPF_EXPONENT for rank in ranks]
+        self.cumulative_weights = list(accumulate(weights))
+        total_weight = self.cumulative_weights[-1]
+
+        # Reorder level covers about two days of expected demand
+        daily_lines = self.settings['sales_per_day'] * MEAN_BASKET_LINES * 1.3
+        for i, weight in enumerate(weights):
+            reorder_level = max(5, math.ceil(daily_lines * weight / total_weight * 2))
+            self.reorder_levels.append(reorder_level)
+            self.restock_targets.append(reorder_level * 4)
+            self.stock.append(reorder_level * 4)
+            self._movement(self.variants[i][0], 'receive', reorder_level * 4, None, 'Initial stock', opening)
+
+        conn.executemany(
+            "INSERT INTO products (id, name, brand_id, category_id, supplier_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            product_rows
+        )
+        conn.executemany(
+            """
+            INSERT INTO variants
+                (id, product_id, name, price, purchase_price, barcode, created_at, stock_quantity, reorder_level)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0)
+            """,
+            variant_rows
+        )
+        conn.executemany("UPDATE variants SET reorder_level = ? WHERE id = ?",
+                         [(level, v[0]) for level, v in zip(self.reorder_levels, self.variants)])
+        conn.commit()
+        self.counts['products'] = len(product_rows)
+        self.counts['variants'] = len(variant_rows)
+
+    def _movement(self, variant_id, movement_type, quantity, reference_id, note, created_at):
+        self.batch['stock_movements'].append(
+            (self._next_id('stock_movements'), variant_id, movement_type, quantity, reference_id, note, created_at)
+        )
+
+    def _day_factor(self, day: date, day_index: int) -> float:
+        yearly = 1 + 0.2 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 355) / 365.25)
+        payday = 1.1 if day.day >= 25 or day.day <= 2 else 1.0
+        growth = 1 + 0.1 * day_index / 365  # Steady growth, about 10% a year
+        return WEEKDAY_FACTORS[day.weekday()] * yearly * payday * growth * self.rng.gauss(1, 0.08)
+
+    def _create_history(self, conn):
+        days = self.settings['days']
+        # Scale so the average day hits sales_per_day once growth is included
+        growth_mean = 1 + 0.1 * (days - 1) / 2 / 365
+        base_sales = self.settings['sales_per_day'] / growth_mean
+        for day_index in range(days):
+            day = self.start_date + timedelta(days=day_index)
+            self._restock(day)
+            self._create_day(day, max(1, round(base_sales * self._day_factor(day, day_index))))
+            if len(self.batch['sale_items']) >= BATCH_LINES:
+                self._write_batch(conn)
+            if self.progress:
+                self.progress(day_index + 1, days)
+        self._write_batch(conn)
+
+    def _restock(self, day: date):
+        """Receive a delivery per supplier for everything at or below its reorder level"""
+        by_supplier: Dict[int, List[int]] = {}
+        for i, level in enumerate(self.reorder_levels):
+            if self.stock[i] <= level:
+                by_supplier.setdefault(self.variants[i][2], []).append(i)
+        received_at = day.strftime('%Y-%m-%d 07:30:00')
+        for supplier_id, indexes in sorted(by_supplier.items()):
+            receipt_id = self._next_id('goods_receipts')
+            reference = f"DN{receipt_id:06d}"
+            total_cost = 0.0
+            for i in indexes:
+                variant_id, cost = self.variants[i][0], self.variants[i][4]
+                qty = self.restock_targets[i] - self.stock[i]
+                self.stock[i] += qty
+                total_cost += qty * cost
+                self.batch['goods_receipt_items'].append((self._next_id('goods_receipt_items'), receipt_id, variant_id, qty, cost))
+                self._movement(variant_id, 'receive', qty, receipt_id, reference, received_at)
+            self.batch['goods_receipts'].append(
+                (receipt_id, supplier_id, reference, self.cashier_ids[0] if self.cashier_ids else None,
+                 len(indexes), round(total_cost, 2), received_at)
+            )
+            self.counts['receipts'] += 1
+
+    def _reference(self, method: str) -> Optional[str]:
+        if method == 'Mpesa':
+            return ''.join(self.rng.choices(string.ascii_uppercase + string.digits, k=10))
+        if method == 'Card':
+            return f"{self.rng.randrange(1000000):06d}"
+        return None
+
+    def _create_day(self, day: date, num_sales: int):
+        rng = self.rng
+        prefix = day.strftime('%Y-%m-%d')
+        cashiers = rng.sample(self.cashier_ids, 2) if len(self.cashier_ids) >= 2 else self.cashier_ids * 2
+        shift_ids = [self._next_id('shifts'), self._next_id('shifts')]
+        cash_taken = [0.0, 0.0]
+
+        # Sale times in seconds since midnight, in order so ids follow created_at
+        hours = rng.choices(range(FIRST_HOUR, FIRST_HOUR + len(HOUR_WEIGHTS)), weights=HOUR_WEIGHTS, k=num_sales)
+        seconds = sorted(hour * 3600 + rng.randrange(3600) for hour in hours)
+
+        variants, stock = self.variants, self.stock
+        population = range(len(variants))
+        cumulative = self.cumulative_weights
+        for second in seconds:
+            sale_id = self._next_id('sales')
+            shift = 0 if second < SHIFT_CHANGE_HOUR * 3600 else 1
+            created_at = f"{prefix} {second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}"
+
+            # Geometric basket size; repeated picks of one item become a larger quantity
+            lines = min(1 + int(rng.expovariate(1 / (MEAN_BASKET_LINES - 1))), 40)
+            basket: Dict[int, int] = {}
+            for i in rng.choices(population, cum_weights=cumulative, k=lines):
+                basket[i] = basket.get(i, 0) + (1 if rng.random() < 0.85 else rng.randint(2, 4))
+
+            subtotal = 0.0
+            for i, qty in basket.items():
+                variant_id, product_id, _, price, cost, display, product_name, variant_name, brand_name = variants[i]
+                line_total = price * qty
+                subtotal += line_total
+                stock[i] -= qty
+                self.batch['sale_items'].append((
+                    self._next_id('sale_items'), sale_id, product_id, variant_id, display, qty, price, line_total,
+                    cost, product_name, variant_name, brand_name
+                ))
+                self._movement(variant_id, 'sale', -qty, sale_id, None, created_at)
+
+            discount = round(subtotal * rng.choice((0.05, 0.1)), 2) if rng.random() < DISCOUNT_RATE else 0.0
+            total = round(subtotal - discount, 2)
+            tax = round(total - total / (1 + self.tax_rate), 2)  # Shelf prices include tax
+            self.batch['sales'].append((sale_id, shift_ids[shift], total, tax, discount, created_at))
+
+            if rng.random() < SPLIT_PAYMENT_RATE and total >= 2:
+                methods = rng.sample(PAYMENT_METHODS, 2)
+                first = round(total * rng.uniform(0.2, 0.8), 2)
+                payments = [(methods[0], first), (methods[1], round(total - first, 2))]
+            else:
+                payments = [(rng.choices(PAYMENT_METHODS, weights=PAYMENT_WEIGHTS)[0], total)]
+            for method, amount in payments:
+                if method == 'Cash':
+                    cash_taken[shift] += amount
+                self.batch['sale_payments'].append((self._next_id('sale_payments'), sale_id, method, amount, self._reference(method)))
+            self.counts['sales'] += 1
+            self.counts['sale_items'] += len(basket)
+            self.counts['payments'] += len(payments)
+
+        for shift, (start_hour, end_hour) in enumerate(((FIRST_HOUR, SHIFT_CHANGE_HOUR), (SHIFT_CHANGE_HOUR, CLOSING_HOUR))):
+            self.batch['shifts'].append((
+                shift_ids[shift], cashiers[shift], OPENING_CASH, round(OPENING_CASH + cash_taken[shift], 2),
+                f"{prefix} {start_hour:02d}:00:00", f"{prefix} {end_hour:02d}:00:00"
+            ))
+
+    def _write_batch(self, conn):
+        """Write everything buffered so far in one transaction"""
+        batch = self.batch
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO shifts (id, user_id, opening_cash, closing_cash, start_time, end_time) VALUES (?, ?, ?, ?, ?, ?)",
+            batch['shifts']
+        )
+        conn.executemany(
+            "INSERT INTO sales (id, shift_id, total, tax_amount, discount_amount, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            batch['sales']
+        )
+        conn.executemany(
+            "INSERT INTO sale_payments (id, sale_id, method, amount, transaction_reference) VALUES (?, ?, ?, ?, ?)",
+            batch['sale_payments']
+        )
+        conn.executemany(
+            """
+            INSERT INTO sale_items
+                (id, sale_id, product_id, variant_id, name, qty, price, subtotal,
+                 unit_cost, product_name, variant_name, brand_name)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            batch['sale_items']
+        )
+        conn.executemany(
+            """
+            INSERT INTO goods_receipts (id, supplier_id, reference, user_id, line_count, total_cost, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            batch['goods_receipts']
+        )
+        conn.executemany(
+            "INSERT INTO goods_receipt_items (id, receipt_id, variant_id, qty, unit_cost) VALUES (?, ?, ?, ?, ?)",
+            batch['goods_receipt_items']
+        )
+        conn.executemany(
+            """
+            INSERT INTO stock_movements (id, variant_id, movement_type, quantity, reference_id, note, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            batch['stock_movements']
+        )
+        conn.commit()
+        self._clear_batch()
+
+
+def generate_dataset(db_path: str, profile: str = 'small', seed: int = 42, end_date: Optional[date] = None,
+                     progress: Callable[[int, int], None] = None, **overrides) -> Dict:
+    """Generate a synthetic store history into a new database; see DatasetGenerator"""
+    return DatasetGenerator(db_path, profile, seed, end_date, progress, **overrides).generate()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print(f"Usage: python sample_data.py <database> [{'|'.join(PROFILES)}] [seed] [end YYYY-MM-DD]")
+        sys.exit(1)
+    path = sys.argv[1]
+    profile = sys.argv[2] if len(sys.argv) > 2 else 'small'
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+    end = datetime.strptime(sys.argv[4], '%Y-%m-%d').date() if len(sys.argv) > 4 else None
+
+    def report(done, total):
+        if done % 30 == 0 or done == total:
+            print(f"  {done}/{total} days", flush=True)
+
+    counts = generate_dataset(path, profile, seed, end, progress=report)
+    print(f"Created {counts['products']:,} products, {counts['variants']:,} variants, {counts['sales']:,} sales, "
+          f"{counts['sale_items']:,} sale lines, {counts['payments']:,} payments and {counts['receipts']:,} "
+          f"goods receipts in {counts['elapsed']:.1f}s.")
@@ -52,61 +52,95 @@ def create_executable():
             return False
     return True
 
-def create_sample_data():
-    """Create sample data for testing"""
+def create_sample_data(profile=None, db_path="pos_system.db"):
+    """Create sample data for testing; a profile builds a full synthetic history instead"""
+    if profile:
+        return create_dataset(profile, db_path)
+
     print("Creating sample data...")
     
     from db import POSDatabase
     
-    db = POSDatabase("pos_system.db")
+    db = POSDatabase(db_path)
+    db.init_database()
     
     # Add sample suppliers
-    supplier1_id = db.create_supplier("ABC Wholesale", "+254-700-123456", "abc@wholesale.com", "123 Market Street")
-    supplier2_id = db.create_supplier("XYZ Distributors", "+254-700-789012", "info@xyz.com", "456 Industrial Area")
+    supplier1_id = db.add_supplier("ABC Wholesale", "+254-700-123456", "abc@wholesale.com", "123 Market Street")
+    supplier2_id = db.add_supplier("XYZ Distributors", "+254-700-789012", "info@xyz.com", "456 Industrial Area")
+    
+    def create_product(name, brand, category, supplier_id):
+        return db.add_product(name, db.add_category(category), db.add_brand(brand), supplier_id)
+    
+    def create_variant(product_id, name, price, barcode, stock, reorder_level):
+        return db.add_product_variant(product_id, name, price, round(price * 0.75, 2), barcode, stock, reorder_level)
     
     # Add sample products with variants
     # Rice products
-    rice_id = db.create_product("Basmati Rice", "Pishori", "Grains", "1234567890123", supplier1_id)
-    db.create_variant(rice_id, "1kg", 150.00, "1234567890124", 50, 10)
-    db.create_variant(rice_id, "2kg", 280.00, "1234567890125", 30, 5)
+    rice_id = create_product("Basmati Rice", "Pishori", "Grains", supplier1_id)
+    rice_1kg_id = create_variant(rice_id, "1kg", 150.00, "1234567890124", 50, 10)
+    create_variant(rice_id, "2kg", 280.00, "1234567890125", 30, 5)
     
     # Cooking oil
-    oil_id = db.create_product("Cooking Oil", "Fresh Fri", "Oil", "2234567890123", supplier1_id)
-    db.create_variant(oil_id, "500ml", 120.00, "2234567890124", 40, 8)
-    db.create_variant(oil_id, "1L", 220.00, "2234567890125", 25, 5)
+    oil_id = create_product("Cooking Oil", "Fresh Fri", "Oil", supplier1_id)
+    create_variant(oil_id, "500ml", 120.00, "2234567890124", 40, 8)
+    create_variant(oil_id, "1L", 220.00, "2234567890125", 25, 5)
     
     # Bread
-    bread_id = db.create_product("Bread", "Festive", "Bakery", "3234567890123", supplier2_id)
-    db.create_variant(bread_id, "400g", 50.00, "3234567890124", 20, 15)
-    db.create_variant(bread_id, "800g", 85.00, "3234567890125", 15, 10)
+    bread_id = create_product("Bread", "Festive", "Bakery", supplier2_id)
+    bread_400g_id = create_variant(bread_id, "400g", 50.00, "3234567890124", 20, 15)
+    create_variant(bread_id, "800g", 85.00, "3234567890125", 15, 10)
     
     # Milk
-    milk_id = db.create_product("Fresh Milk", "Brookside", "Dairy", "4234567890123", supplier2_id)
-    db.create_variant(milk_id, "500ml", 60.00, "4234567890124", 30, 10)
-    db.create_variant(milk_id, "1L", 110.00, "4234567890125", 20, 8)
+    milk_id = create_product("Fresh Milk", "Brookside", "Dairy", supplier2_id)
+    create_variant(milk_id, "500ml", 60.00, "4234567890124", 30, 10)
+    create_variant(milk_id, "1L", 110.00, "4234567890125", 20, 8)
     
     # Sugar
-    sugar_id = db.create_product("White Sugar", "Kabras", "Sweeteners", "5234567890123", supplier1_id)
-    db.create_variant(sugar_id, "1kg", 120.00, "5234567890124", 25, 5)
-    db.create_variant(sugar_id, "2kg", 230.00, "5234567890125", 15, 3)
+    sugar_id = create_product("White Sugar", "Kabras", "Sweeteners", supplier1_id)
+    create_variant(sugar_id, "1kg", 120.00, "5234567890124", 25, 5)
+    create_variant(sugar_id, "2kg", 230.00, "5234567890125", 15, 3)
     
     # Tea
-    tea_id = db.create_product("Black Tea", "Kericho Gold", "Beverages", "6234567890123", supplier2_id)
-    db.create_variant(tea_id, "250g", 180.00, "6234567890124", 35, 8)
-    db.create_variant(tea_id, "500g", 340.00, "6234567890125", 20, 5)
+    tea_id = create_product("Black Tea", "Kericho Gold", "Beverages", supplier2_id)
+    create_variant(tea_id, "250g", 180.00, "6234567890124", 35, 8)
+    create_variant(tea_id, "500g", 340.00, "6234567890125", 20, 5)
     
     # Soap
-    soap_id = db.create_product("Laundry Soap", "Omo", "Cleaning", "7234567890123", supplier2_id)
-    db.create_variant(soap_id, "500g", 85.00, "7234567890124", 40, 10)
-    db.create_variant(soap_id, "1kg", 160.00, "7234567890125", 25, 8)
+    soap_id = create_product("Laundry Soap", "Omo", "Cleaning", supplier2_id)
+    create_variant(soap_id, "500g", 85.00, "7234567890124", 40, 10)
+    create_variant(soap_id, "1kg", 160.00, "7234567890125", 25, 8)
     
     # Set some items to low stock for testing reorder feature
-    db.update_stock(1, -45)  # Rice 1kg: 50 - 45 = 5 (below reorder level of 10)
-    db.update_stock(7, -12)  # Bread 400g: 20 - 12 = 8 (below reorder level of 15)
+    db.update_stock(rice_1kg_id, -45)  # Rice 1kg: 50 - 45 = 5 (below reorder level of 10)
+    db.update_stock(bread_400g_id, -12)  # Bread 400g: 20 - 12 = 8 (below reorder level of 15)
     
     print("✓ Sample data created successfully!")
     print("Sample products added with low stock items for testing reorder feature.")
 
+def create_dataset(profile, db_path):
+    """Generate a synthetic store history at the given scale"""
+    from sample_data import PROFILES, generate_dataset
+    
+    if profile not in PROFILES:
+        print(f"✗ Unknown profile '{profile}'. Choose from: {', '.join(PROFILES)}")
+        return False
+    
+    print(f"Generating {profile} dataset into {db_path}...")
+    
+    def report(done, total):
+        if done % 30 == 0 or done == total:
+            print(f"  {done}/{total} days")
+    
+    try:
+        counts = generate_dataset(db_path, profile, progress=report)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return False
+    print(f"✓ Created {counts['variants']:,} variants, {counts['sales']:,} sales and "
+          f"{counts['sale_items']:,} sale lines in {counts['elapsed']:.1f}s")
+    print("Cashier logins: cashier01, cashier02, ... (password: cashier123)")
+    return True
+
 def cleanup_build_files():
     """Clean up build files"""
     print("Cleaning up build files...")
@@ -151,10 +185,13 @@ def run_tests():
     print("Running basic tests...")
     
     try:
-        from db import POSDatabase
+        import tempfile
+        from db import POSDatabase, MEMORY_DATABASE
         
-        # Test database initialization
-        db = POSDatabase(":memory:")  # Use in-memory database for testing
+        # Test database initialization; every connection of an in-memory POSDatabase shares one database
+        db = POSDatabase(MEMORY_DATABASE)
+        db.init_database()
+        db.init_default_data()
         
         # Test user creation
         result = db.create_user("testuser", "testpass", "cashier")
@@ -166,16 +203,35 @@ def run_tests():
         assert user['username'] == "testuser", "Wrong user returned"
         
         # Test supplier creation
-        supplier_id = db.create_supplier("Test Supplier", "123-456-7890", "test@supplier.com", "Test Address")
+        supplier_id = db.add_supplier("Test Supplier", "123-456-7890", "test@supplier.com", "Test Address")
         assert supplier_id > 0, "Supplier creation failed"
         
         # Test product creation
-        product_id = db.create_product("Test Product", "Test Brand", "Test Category", "1111111111111", supplier_id)
+        product_id = db.add_product("Test Product", db.add_category("Test Category"), db.add_brand("Test Brand"), supplier_id)
         assert product_id > 0, "Product creation failed"
         
         # Test variant creation
-        variant_id = db.create_variant(product_id, "Test Variant", 10.99, "2222222222222", 100, 10)
+        variant_id = db.add_product_variant(product_id, "Test Variant", 10.99, 8.00, "2222222222222", 100, 10)
         assert variant_id > 0, "Variant creation failed"
+        product = db.find_by_barcode("2222222222222")
+        assert product is not None and product['variant_id'] == variant_id, "Barcode lookup failed"
+        
+        # Test a sale: stock goes down and the report sees it
+        shift_id = db.start_shift(user['id'], 100.0)
+        items = [{'product_id': product_id, 'variant_id': variant_id, 'qty': 2, 'price': 10.99, 'subtotal': 21.98}]
+        sale_id = db.commit_sale(shift_id, 21.98, 0, 0, [{'method': 'Cash', 'amount': 21.98}], items)
+        assert sale_id > 0, "Sale commit failed"
+        assert db.find_by_barcode("2222222222222")['stock_quantity'] == 98, "Stock not updated by sale"
+        assert abs(db.get_total_sales("2000-01-01", "2999-12-31") - 21.98) < 0.01, "Sale missing from report"
+        
+        # Test cloning a database file into memory
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "clone_source.db")
+            db.backup_database(path)
+            clone = POSDatabase(MEMORY_DATABASE, load_from=path)
+            assert clone.find_by_barcode("2222222222222")['stock_quantity'] == 98, "In-memory clone failed"
+            clone.close()
+        db.close()
         
         print("✓ All tests passed!")
         return True
@@ -195,6 +251,8 @@ def main():
         print("  install     - Install requirements")
         print("  build       - Create executable")
         print("  sample      - Create sample data")
+        print("  sample <small|medium|large> [database]")
+        print("              - Generate a synthetic store history (default database: pos_system.db)")
         print("  clean       - Clean build files")
         print("  structure   - Create project structure")
         print("  test        - Run basic tests")
@@ -209,7 +267,10 @@ def main():
         if install_requirements():
             create_executable()
     elif command == "sample":
-        create_sample_data()
+        if len(sys.argv) > 2:
+            create_sample_data(sys.argv[2].lower(), sys.argv[3] if len(sys.argv) > 3 else "pos_system.db")
+        else:
+            create_sample_data()
     elif command == "clean":
         cleanup_build_files()
     elif command == "structure":
@@ -0,0 +1,254 @@
+"""
+Main-thread stall watchdog.
+
+A heartbeat QTimer on the GUI thread stamps the time on every tick, and a
+daemon thread checks the stamp. When the heartbeat is overdue by
+WATCHDOG_CONFIG['stall_threshold_ms'], the main thread's Python stack is
+sampled through sys._current_frames() along with the last user input
+(or the action named with note_action()). When the loop recovers the stall
+is recorded in STALLS, which aggregates offenders for the diagnostics view,
+and appended to a rotating JSON-lines stall log. A stall that is still going
+after 'hang_log_ms' is logged straight away with a fresh stack, so a register
+that never recovers still leaves a trace.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from PySide6.QtCore import QEvent, QObject, Qt, QTimer
+from PySide6.QtWidgets import QAbstractButton, QApplication, QTabBar, QWidget
+
+from config import WATCHDOG_CONFIG
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames in these modules are attributed to the UI code that called them
+_PASS_THROUGH = {os.path.join(APP_DIR, name) for name in ('db.py', 'query_stats.py', 'stall_watchdog.py')}
+
+_current_action = None
+
+
+def note_action(description: str):
+    """Name what the user is doing; recorded with any stall that follows"""
+    global _current_action
+    _current_action = description
+
+
+def current_action() -> Optional[str]:
+    return _current_action
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(APP_DIR + os.sep):
+        return os.path.relpath(filename, APP_DIR)
+    return os.path.basename(filename)
+
+
+def capture_stack(thread_id: int) -> List[Dict]:
+    """Sample a thread's Python stack, outermost frame first, without reading source files"""
+    frame = sys._current_frames().get(thread_id)
+    if frame is None:
+        return []
+    summary = traceback.StackSummary.extract(traceback.walk_stack(frame), limit=WATCHDOG_CONFIG['max_stack_depth'],
+                                             lookup_lines=False)
+    summary.reverse()
+    return [{'file': os.path.abspath(f.filename), 'line': f.lineno, 'function': f.name} for f in summary]
+
+
+def find_offender(stack: List[Dict]) -> str:
+    """The innermost application frame outside the data layer, e.g. 'main.py:update_reports'"""
+    for frame in reversed(stack):
+        if frame['file'].startswith(APP_DIR + os.sep) and frame['file'] not in _PASS_THROUGH:
+            return f"{_short_path(frame['file'])}:{frame['function']}"
+    if stack:
+        return f"{_short_path(stack[-1]['file'])}:{stack[-1]['function']}"
+    return '<no Python frame>'
+
+
+def format_stack(stack: List[Dict]) -> List[str]:
+    return [f"{_short_path(f['file'])}:{f['line']} in {f['function']}" for f in stack]
+
+
+class StallStats:
+    """Thread-safe record of recent stalls, aggregated by offending function"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._logger = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.recent = deque(maxlen=WATCHDOG_CONFIG['max_recent_stalls'])
+            self.offenders: Dict[str, Dict] = {}
+            self.started_at = datetime.now()
+
+    def _log(self, entry: Dict):
+        if self._logger is None:
+            logger = logging.getLogger('pos.stalls')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            path = WATCHDOG_CONFIG['log_path']
+            try:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    path, maxBytes=WATCHDOG_CONFIG['log_max_bytes'],
+                    backupCount=WATCHDOG_CONFIG['log_backup_count'], encoding='utf-8')
+            except OSError:
+                handler = logging.NullHandler()  # The in-memory copy is still available in diagnostics
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            self._logger = logger
+        self._logger.info(json.dumps(entry, default=str))
+
+    def record(self, entry: Dict):
+        with self._lock:
+            self.recent.append(entry)
+            offender = self.offenders.get(entry['offender'])
+            if offender is None:
+                offender = self.offenders[entry['offender']] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            offender['count'] += 1
+            offender['total_ms'] += entry['blocked_ms']
+            offender['max_ms'] = max(offender['max_ms'], entry['blocked_ms'])
+            offender['last_action'] = entry['action']
+            offender['last_at'] = entry['at']
+        self._log(entry)
+
+    def log_hang(self, entry: Dict):
+        """Log a stall that has not ended yet; it is recorded in full once the loop recovers"""
+        self._log(dict(entry, ongoing=True))
+
+    def summary(self) -> List[Dict]:
+        """Offenders, most total blocked time first"""
+        with self._lock:
+            rows = [dict(entry, offender=name) for name, entry in self.offenders.items()]
+        rows.sort(key=lambda r: r['total_ms'], reverse=True)
+        return rows
+
+    def get_recent(self) -> List[Dict]:
+        with self._lock:
+            return list(reversed(self.recent))
+
+
+STALLS = StallStats()
+
+
+class InputTracker(QObject):
+    """Application-wide event filter that remembers the last click or key press"""
+
+    _INPUT_EVENTS = (QEvent.MouseButtonPress, QEvent.KeyPress)
+
+    def __init__(self):
+        super().__init__()
+        self._last_input = None
+
+    def eventFilter(self, obj, event):
+        if event.type() in self._INPUT_EVENTS and isinstance(obj, QWidget):
+            # Unhandled input propagates to the parents; keep the innermost widget
+            key = (event.type(), event.timestamp())
+            if key != self._last_input:
+                self._last_input = key
+                note_action(self.describe(obj, event))
+        return False
+
+    @staticmethod
+    def describe(widget: QWidget, event) -> str:
+        if widget.objectName() == 'qt_scrollarea_viewport' and widget.parentWidget():
+            widget = widget.parentWidget()
+        if isinstance(widget, QTabBar) and event.type() == QEvent.MouseButtonPress:
+            index = widget.tabAt(event.position().toPoint())
+            target = f"'{widget.tabText(index)}' tab" if index >= 0 else "tab bar"
+        elif isinstance(widget, QAbstractButton) and widget.text():
+            target = f"'{widget.text()}' button"
+        else:
+            target = widget.objectName() or type(widget).__name__
+        if event.type() == QEvent.KeyPress:
+            verb = "Enter in" if event.key() in (Qt.Key_Return, Qt.Key_Enter) else "typing in"
+        else:
+            verb = "click"
+        window = widget.window().windowTitle()
+        return f"{verb} {target}" + (f" ({window})" if window else "")
+
+
+class Watchdog:
+    """Heartbeat on the GUI thread plus a thread that notices when it stops"""
+
+    def __init__(self, app: QApplication):
+        self.app = app
+        self.interval_ms = WATCHDOG_CONFIG['heartbeat_ms']
+        self.threshold_s = WATCHDOG_CONFIG['stall_threshold_ms'] / 1000
+        self.hang_s = WATCHDOG_CONFIG['hang_log_ms'] / 1000
+        self.main_thread_id = threading.main_thread().ident
+        self.heartbeat = QTimer()
+        self.heartbeat.setInterval(self.interval_ms)
+        self.heartbeat.timeout.connect(self._beat)
+        self.tracker = InputTracker()
+        self._last_beat = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.app.installEventFilter(self.tracker)
+        self._last_beat = time.perf_counter()
+        self.heartbeat.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name='stall-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.heartbeat.stop()
+        self.app.removeEventFilter(self.tracker)
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _beat(self):
+        self._last_beat = time.perf_counter()
+
+    def _overdue(self, last_beat: float) -> float:
+        return time.perf_counter() - last_beat - self.interval_ms / 1000
+
+    def _watch(self):
+        stall = None
+        poll_s = min(self.interval_ms / 1000, self.threshold_s / 3)
+        while not self._stop.wait(poll_s):
+            last_beat = self._last_beat
+            if stall is not None and last_beat != stall['last_beat']:
+                # The loop is back; it was blocked from one expected beat to the next
+                entry = stall['entry']
+                entry['blocked_ms'] = round((last_beat - stall['last_beat']) * 1000 - self.interval_ms, 1)
+                STALLS.record(entry)
+                stall = None
+                continue
+            overdue = self._overdue(last_beat)
+            if stall is None and overdue >= self.threshold_s:
+                stack = capture_stack(self.main_thread_id)
+                stall = {'last_beat': last_beat, 'hang_logged': False, 'entry': {
+                    'at': datetime.now().isoformat(timespec='milliseconds'),
+                    'action': current_action(),
+                    'offender': find_offender(stack),
+                    'stack': format_stack(stack),
+                }}
+            elif stall is not None and not stall['hang_logged'] and overdue >= self.hang_s:
+                stall['hang_logged'] = True
+                stack = capture_stack(self.main_thread_id)
+                STALLS.log_hang(dict(stall['entry'], blocked_ms=round(overdue * 1000, 1),
+                                     offender=find_offender(stack), stack=format_stack(stack)))
+
+
+def start_watchdog(app: QApplication) -> Optional[Watchdog]:
+    """Start the watchdog if it is enabled in config"""
+    if not WATCHDOG_CONFIG['enabled']:
+        return None
+    watchdog = Watchdog(app)
+    watchdog.start()
+    return watchdog
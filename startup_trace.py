@@ -0,0 +1,175 @@
+"""
+Opt-in startup timeline tracer.
+
+Enabled by running with --profile-startup (or POS_PROFILE_STARTUP=1, or
+config.ENABLE_PROFILING once config has been imported). Each startup phase
+is recorded with phase()/traced(), and module imports are timed through an
+import hook installed as early as possible and removed once the main window
+is ready. write_report() saves the timeline as a text report and a Chrome
+trace JSON file (open it in chrome://tracing or https://ui.perfetto.dev).
+
+This module only uses the standard library so it can be imported before
+anything else, including config.
+"""
+
+import builtins
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+IMPORT_REPORT_MIN_MS = 1.0  # Imports faster than this are left out of the text report
+
+_origin = time.perf_counter()
+_enabled = '--profile-startup' in sys.argv or os.environ.get('POS_PROFILE_STARTUP') == '1'
+_events = []  # (name, category, start, end, depth)
+_depth = threading.local()
+_original_import = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable():
+    """Start tracing late, e.g. when config.ENABLE_PROFILING is set"""
+    global _enabled
+    if not _enabled:
+        _enabled = True
+        trace_imports()
+
+
+def _get_depth() -> int:
+    return getattr(_depth, 'value', 0)
+
+
+@contextmanager
+def phase(name: str, category: str = 'startup'):
+    """Record the time spent in a block; phases may nest"""
+    if not _enabled or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    depth = _get_depth()
+    _depth.value = depth + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _depth.value = depth
+        _events.append((name, category, start, time.perf_counter(), depth))
+
+
+def traced(name: str = None, category: str = 'startup'):
+    """Decorator form of phase()"""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with phase(label, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _tracing_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    with phase(f"import {name}", 'import'):
+        return _original_import(name, globals, locals, fromlist, level)
+
+
+def trace_imports():
+    """Time first imports of every module from here on"""
+    global _original_import
+    if _enabled and _original_import is None:
+        _original_import = builtins.__import__
+        builtins.__import__ = _tracing_import
+
+
+def stop_tracing_imports():
+    """Remove the import hook once startup is over"""
+    global _original_import
+    if _original_import is not None:
+        builtins.__import__ = _original_import
+        _original_import = None
+
+
+def _format_report(events) -> str:
+    total = max(end for _, _, _, end, _ in events) - _origin
+    waits = sum(end - start for _, category, start, end, depth in events if category == 'wait' and depth == 0)
+    lines = [
+        f"Startup trace {datetime.now():%Y-%m-%d %H:%M:%S}",
+        f"Total: {total * 1000:.0f} ms ({(total - waits) * 1000:.0f} ms excluding {waits * 1000:.0f} ms waiting for the user)",
+        "",
+        f"{'start ms':>9} {'duration ms':>12}  phase",
+    ]
+    for name, category, start, end, depth in sorted(events, key=lambda e: (e[2], e[4])):
+        duration = (end - start) * 1000
+        if category == 'import' and duration < IMPORT_REPORT_MIN_MS:
+            continue
+        suffix = "  (waiting)" if category == 'wait' else ""
+        lines.append(f"{(start - _origin) * 1000:9.1f} {duration:12.1f}  {'  ' * depth}{name}{suffix}")
+
+    imports = {}
+    for name, category, start, end, depth in events:
+        if category == 'import':
+            # Self time, so nested imports are not counted twice
+            imports[name] = imports.get(name, 0) + (end - start)
+    for name, category, start, end, depth in events:
+        if category == 'import' and depth > 0:
+            parent = next((e for e in events if e[1] == 'import' and e[4] == depth - 1
+                           and e[2] <= start and e[3] >= end), None)
+            if parent:
+                imports[parent[0]] -= end - start
+    lines += ["", "Slowest imports (self time):"]
+    for name, seconds in sorted(imports.items(), key=lambda item: item[1], reverse=True)[:15]:
+        lines.append(f"{seconds * 1000:9.1f} ms  {name}")
+    return "\n".join(lines) + "\n"
+
+
+def _chrome_trace(events) -> dict:
+    pid = os.getpid()
+    return {
+        'traceEvents': [
+            {
+                'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': 1,
+                'ts': round((start - _origin) * 1e6), 'dur': round((end - start) * 1e6),
+            }
+            for name, category, start, end, depth in events
+        ],
+        'displayTimeUnit': 'ms',
+    }
+
+
+def write_report(directory: str = None):
+    """
+    Write the timeline recorded so far; safe to call again as more phases run.
+
+    Returns:
+        Optional[tuple]: (report_path, trace_path), or None when tracing is off
+    """
+    if not _enabled or not _events:
+        return None
+    if directory is None:
+        from config import LOGS_DIR
+        directory = LOGS_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    events = list(_events)
+    report_path = os.path.join(directory, 'startup_profile.txt')
+    trace_path = os.path.join(directory, 'startup_trace.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(_format_report(events))
+    with open(trace_path, 'w', encoding='utf-8') as f:
+        json.dump(_chrome_trace(events), f)
+    return report_path, trace_path
+
+
+trace_imports()
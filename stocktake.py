@@ -0,0 +1,162 @@
+"""
+Stocktake sessions: scan-rate counting with a crash-safe journal.
+
+Barcodes are resolved against an in-memory index loaded once per session, so
+a scan never touches the database. Every scan is appended to a journal file
+that is fsynced periodically; after a crash the session is rebuilt by
+replaying the journal; counts for variants deleted in the meantime are left
+out and listed in removed_variants. Counts are written to the database in one
+transaction when the session is committed.
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from config import STOCKTAKE_CONFIG
+from db import POSDatabase
+
+
+class StocktakeSession:
+    def __init__(self, db: POSDatabase, journal_path: str = None):
+        self.db = db
+        self.journal_path = journal_path or STOCKTAKE_CONFIG['journal_path']
+        self.items: Dict[int, Dict] = {}
+        self.barcodes: Dict[str, int] = {}
+        for item in db.get_variant_lookup():
+            self.items[item['variant_id']] = item
+            if item['barcode']:
+                self.barcodes[item['barcode']] = item['variant_id']
+
+        self.counts: Dict[int, int] = {}
+        self.unknown_barcodes: Dict[str, int] = {}
+        self.removed_variants: Dict[int, int] = {}  # Journalled variant id -> scans, for variants since deleted
+        self.scan_count = 0
+        self._journal = None
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def has_pending_journal(journal_path: str = None) -> bool:
+        """Check whether an uncommitted session was left behind"""
+        path = journal_path or STOCKTAKE_CONFIG['journal_path']
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+    def start(self, resume: bool = False):
+        """Open the journal, replaying it first when resuming"""
+        if resume and os.path.exists(self.journal_path):
+            self._replay()
+        os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+        self._journal = open(self.journal_path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _replay(self):
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+                if 'v' in entry and entry['v'] not in self.items:
+                    self.removed_variants[entry['v']] = self.removed_variants.get(entry['v'], 0) + 1
+                elif 'set' in entry:
+                    self._apply_set(entry['v'], entry['set'])
+                elif 'v' in entry:
+                    self._apply_scan(entry['v'], entry['q'])
+                elif 'b' in entry:
+                    self.unknown_barcodes[entry['b']] = self.unknown_barcodes.get(entry['b'], 0) + entry['q']
+
+    def _apply_scan(self, variant_id: int, qty: int):
+        self.counts[variant_id] = self.counts.get(variant_id, 0) + qty
+        self.scan_count += 1
+
+    def _apply_set(self, variant_id: int, qty: int):
+        self.counts[variant_id] = qty
+
+    def _write(self, entry: Dict):
+        self._journal.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._unflushed += 1
+        if (self._unflushed >= STOCKTAKE_CONFIG['flush_every_scans'] or
+                (time.monotonic() - self._last_flush) * 1000 >= STOCKTAKE_CONFIG['flush_interval_ms']):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Force buffered journal entries to disk"""
+        if self._journal and self._unflushed:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def scan(self, barcode: str, qty: int = 1) -> Optional[Dict]:
+        """
+        Count a scanned barcode.
+
+        Returns:
+            Optional[Dict]: The matched item, or None for an unknown barcode
+        """
+        variant_id = self.barcodes.get(barcode)
+        if variant_id is None:
+            self.unknown_barcodes[barcode] = self.unknown_barcodes.get(barcode, 0) + qty
+            self._write({'b': barcode, 'q': qty})
+            return None
+        self._apply_scan(variant_id, qty)
+        self._write({'v': variant_id, 'q': qty})
+        return self.items[variant_id]
+
+    def set_count(self, variant_id: int, qty: int):
+        """Overwrite the count for a variant, e.g. after a manual recount"""
+        self._apply_set(variant_id, qty)
+        self._write({'v': variant_id, 'set': qty})
+
+    def get_variances(self, zero_uncounted: bool = False) -> List[Dict]:
+        """Get counted vs expected stock for every variant that differs"""
+        variant_ids = self.items.keys() if zero_uncounted else self.counts.keys()
+        variances = []
+        for variant_id in variant_ids:
+            item = self.items[variant_id]
+            expected = item['stock_quantity'] or 0
+            counted = self.counts.get(variant_id, 0)
+            if counted == expected:
+                continue
+            variances.append({
+                'variant_id': variant_id,
+                'product_name': item['product_name'],
+                'variant_name': item['variant_name'],
+                'barcode': item['barcode'],
+                'expected': expected,
+                'counted': counted,
+                'difference': counted - expected,
+                'cost_difference': (counted - expected) * float(item['purchase_price'] or 0),
+            })
+        variances.sort(key=lambda v: abs(v['cost_difference']), reverse=True)
+        return variances
+
+    def commit(self, zero_uncounted: bool = False) -> int:
+        """
+        Apply all counts in one transaction and discard the journal.
+
+        Returns:
+            int: Number of variants whose stock changed
+        """
+        counts = dict(self.counts)
+        if zero_uncounted:
+            for variant_id in self.items:
+                counts.setdefault(variant_id, 0)
+        changed = self.db.apply_stocktake(counts)
+        self.discard()
+        return changed
+
+    def discard(self):
+        """Close and delete the journal"""
+        self.close()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def close(self):
+        """Flush and close the journal, keeping it for a later resume"""
+        if self._journal:
+            self.checkpoint()
+            self._journal.close()
+            self._journal = None
@@ -2,15 +2,25 @@
 import os
 import platform
 import json
-from cryptography.fernet import Fernet
-from getmac import get_mac_address as gma
-import requests
+import logging
 
 # Generate a key for encryption. This should be stored securely.
 # For simplicity, we're generating it here. In a real app, you might
 # want to store this key in a more secure way.
+logger = logging.getLogger(__name__)
+
 ENCRYPTION_KEY = b'KYQI7JBlCHvRAXaCj3hMpSETthP-1ZLSzQr74KEQcjU='
-CIPHER_SUITE = Fernet(ENCRYPTION_KEY)
+
+# cryptography, getmac and requests are imported on first use; the common
+# startup path only checks that the config file exists.
+_cipher_suite = None
+
+def get_cipher_suite():
+    global _cipher_suite
+    if _cipher_suite is None:
+        from cryptography.fernet import Fernet
+        _cipher_suite = Fernet(ENCRYPTION_KEY)
+    return _cipher_suite
 
 def get_syscfg_path():
     """
@@ -39,7 +49,7 @@ def write_syscfg_file(phone_number, machine_fingerprint):
         "phone_number": phone_number,
         "machine_fingerprint": machine_fingerprint
     }
-    encrypted_data = CIPHER_SUITE.encrypt(json.dumps(data).encode())
+    encrypted_data = get_cipher_suite().encrypt(json.dumps(data).encode())
     with open(path, 'wb') as f:
         f.write(encrypted_data)
 
@@ -51,16 +61,17 @@ def read_syscfg_file():
     try:
         with open(path, 'rb') as f:
             encrypted_data = f.read()
-        decrypted_data = CIPHER_SUITE.decrypt(encrypted_data)
+        decrypted_data = get_cipher_suite().decrypt(encrypted_data)
         return json.loads(decrypted_data.decode())
     except Exception as e:
-        print(f"Error reading or decrypting syscfg.dbx: {e}")
+        logger.error(f"Error reading or decrypting syscfg.dbx: {e}")
         return None
 
 def get_machine_fingerprint():
     """
     Generates a unique machine fingerprint.
     """
+    from getmac import get_mac_address as gma
     return gma()
 
 def send_activation_request(name, phone):
@@ -70,6 +81,7 @@ def send_activation_request(name, phone):
     url = "https://patanews.co.ke/pos/request_code.php"
     payload = {"name": name, "phone": phone}
     headers = {'Content-Type': 'application/json'}
+    import requests
     try:
         response = requests.post(url, data=json.dumps(payload), headers=headers)
         return response.json()
@@ -83,6 +95,7 @@ def verify_otp(phone, otp):
     url = "https://patanews.co.ke/pos/verify_code.php"
     payload = {"phone": phone, "otp": otp}
     headers = {'Content-Type': 'application/json'}
+    import requests
     try:
         response = requests.post(url, data=json.dumps(payload), headers=headers)
         return response.json()